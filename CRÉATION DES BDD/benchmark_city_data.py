@@ -0,0 +1,167 @@
+"""
+Benchmark du chargement des villes (load_city_data).
+
+Sur un fichier synthétique de N communes (35000 par défaut, environ le nombre
+de communes françaises) aux colonnes de BIG DATA/city_data.csv, mesure :
+- le prétraitement : extraction du code postal par re.search ligne par ligne
+  (ancien preprocess_data) contre la version par colonne, résultats comparés ;
+- la préparation des lignes : boucle iterrows (ancienne boucle de
+  load_city_data) contre dataframe_to_rows ;
+- le chargement : load_city_data en mode "per_row" et "executemany", sur une
+  table vide (insertions) puis une seconde fois (mises à jour).
+
+Le chargement utilise une base dédiée (immobilier_fnaim_benchmark par défaut),
+créée par les migrations et vidée avant chaque méthode, avec les variables
+d'environnement MYSQL_HOST, MYSQL_USER et MYSQL_PASSWORD. Avec --no-mysql, seuls
+le prétraitement et la préparation sont mesurés.
+
+Usage :
+    python benchmark_city_data.py [--rows N] [--batch-size N] [--database NOM] [--no-mysql]
+"""
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+
+import pandas as pd
+
+from load_city_data import preprocess_data
+from mysql_bulk_loader import CITIES_COLUMNS, dataframe_to_rows
+
+PREFIXES_POSTAUX = ["35", "29", "22", "56", "44", "75", "69", "13", "20", "97"]
+REGIONS = ["arrondissement de Rennes", "arrondissement de Brest", "arrondissement de Lyon", None]
+
+####
+#    DONNÉES SYNTHÉTIQUES    #
+####
+def synthetic_city_csv(rows, path, seed=0):
+    """Écrit un fichier au format de city_data.csv (codes postaux simples, multiples ou absents)."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        code_postal = f"{rng.choice(PREFIXES_POSTAUX)}{rng.randint(0, 999):03d}"
+        tirage = rng.random()
+        if tirage < 0.1:
+            code_postal = f"{code_postal}, {int(code_postal) + 10}"
+        elif tirage < 0.15:
+            code_postal = None
+        population = rng.randint(50, 200000)
+        surface = round(rng.uniform(1, 200), 2)
+        records.append({
+            'ville': f"Commune {i}",
+            'population': population,
+            'surface': surface,
+            'date': "2022-01-01T00:00:00Z",
+            'densité': population / surface,
+            'villes_voisines': ", ".join(f"Commune {rng.randint(0, rows - 1)}" for _ in range(rng.randint(0, 8))),
+            'code_postale': code_postal,
+            'coordonnees': f"Point({rng.uniform(-5, 8):.9f} {rng.uniform(42, 51):.9f})",
+            'demonym': rng.choice(["Rennais", "Brestois", None]),
+            'region_label': rng.choice(REGIONS),
+        })
+    pd.DataFrame.from_records(records).to_csv(path, index=False)
+
+####
+#    MESURES    #
+####
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def legacy_postal_codes(df):
+    """Ancienne extraction du code postal de preprocess_data : deux re.search par ligne."""
+    return df['code_postale'].astype(object).apply(
+        lambda x: re.search(r'\d{5}', str(x)).group(0) if re.search(r'\d{5}', str(x)) else None
+    )
+
+def rows_per_row(df):
+    """Préparation des lignes de l'ancienne boucle de load_city_data."""
+    rows = []
+    for _, row in df.iterrows():
+        rows.append((
+            row.get('ville', ''),
+            row.get('population', None),
+            row.get('surface', None),
+            row.get('date', None),
+            row.get('densite', None),
+            row.get('villes_voisines', None),
+            row.get('code_postal', None),
+            row.get('coordonnees', None),
+            row.get('demonym', None),
+            row.get('region_label', None)
+        ))
+    return rows
+
+def benchmark_preprocessing(path):
+    df = pd.read_csv(path)
+
+    legacy, legacy_seconds = timed(legacy_postal_codes, df)
+    processed_df, seconds = timed(preprocess_data, df)
+    assert [None if pd.isna(x) else x for x in legacy] == processed_df['code_postal'].tolist()
+    print(f"Code postal re.search  : {legacy_seconds:8.3f}s")
+    print(f"preprocess_data        : {seconds:8.3f}s (complet, {len(df) / seconds:10.0f} lignes/s)")
+
+    legacy_rows, legacy_seconds = timed(rows_per_row, processed_df)
+    rows, seconds = timed(dataframe_to_rows, processed_df, CITIES_COLUMNS)
+    assert len(legacy_rows) == len(rows)
+    print(f"Préparation iterrows   : {legacy_seconds:8.3f}s ({len(rows) / legacy_seconds:10.0f} lignes/s)")
+    print(f"Préparation vectorisée : {seconds:8.3f}s ({len(rows) / seconds:10.0f} lignes/s)"
+          f"  x{legacy_seconds / seconds:.1f}")
+
+####
+#    CHARGEMENT MYSQL    #
+####
+def benchmark_mysql(path, rows, database, batch_size):
+    import mysql.connector
+    from load_city_data import load_city_data
+    from migrate import apply_migrations
+
+    connection = mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", "")
+    )
+    results = []
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+        cursor.close()
+        connection.database = database
+        apply_migrations(connection)
+
+        for method in ("per_row", "executemany"):
+            cursor = connection.cursor()
+            cursor.execute("TRUNCATE TABLE cities")
+            cursor.close()
+
+            for phase in ("insertion", "mise à jour"):
+                _, seconds = timed(load_city_data, path, connection, method=method, batch_size=batch_size)
+                results.append((method, phase, seconds))
+    finally:
+        connection.close()
+
+    print()
+    for method, phase, seconds in results:
+        print(f"{method:12s} {phase:12s}: {seconds:8.2f}s ({rows / seconds:10.0f} lignes/s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark du chargement des villes dans MySQL")
+    parser.add_argument("--rows", type=int, default=35000, help="Nombre de communes synthétiques")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Taille des lots executemany")
+    parser.add_argument("--database", default="immobilier_fnaim_benchmark", help="Base MySQL du benchmark (vidée)")
+    parser.add_argument("--no-mysql", action="store_true", help="Mesurer uniquement le prétraitement et la préparation")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(prefix="city_data_", suffix=".csv")
+    os.close(fd)
+    try:
+        synthetic_city_csv(args.rows, path)
+        print(f"{args.rows} communes synthétiques")
+        benchmark_preprocessing(path)
+        if not args.no_mysql:
+            benchmark_mysql(path, args.rows, args.database, args.batch_size)
+    finally:
+        os.remove(path)
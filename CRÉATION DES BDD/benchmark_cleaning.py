@@ -0,0 +1,136 @@
+"""
+Benchmark du nettoyage des annonces et des agences (module cleaning).
+
+Sur un DataFrame synthétique de N annonces brutes (tel que lu dans
+annonces_fnaim.csv), compare pour chaque colonne le nettoyage cellule par
+cellule (Series.apply du nettoyeur scalaire) à sa version par colonne, vérifie
+que les résultats sont identiques (valeurs et types) et mesure les durées.
+
+Usage :
+    python benchmark_cleaning.py [--rows N] [--seed N]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from cleaning import (
+    clean_dpe_letter,
+    clean_dpe_letter_series,
+    clean_dpe_value,
+    clean_dpe_value_series,
+    clean_phone,
+    clean_phone_series,
+    clean_postal_code,
+    clean_postal_code_series,
+    clean_price,
+    clean_price_series,
+    clean_rooms,
+    clean_rooms_series,
+    clean_siret,
+    clean_siret_series,
+    clean_surface,
+    clean_surface_series,
+    extract_department,
+    extract_department_series,
+    extract_location_from_url,
+    extract_location_series,
+)
+from data_processing_V2 import preprocess_annonces_dataframe
+
+VILLES = ["rennes-35000", "saint-malo-35400", "paris-75011", "ajaccio-20000", "saint-denis-97400", "ille-et-vilaine-35"]
+
+####
+#    DONNÉES SYNTHÉTIQUES    #
+####
+def synthetic_raw_annonces(rows, seed=0):
+    """Colonnes brutes du scraper, avec des valeurs vides et manquantes."""
+    rng = np.random.default_rng(seed)
+
+    def pick(values, size=rows):
+        return np.array(values, dtype=object)[rng.integers(0, len(values), size)]
+
+    prix = pd.Series([f"{p:,} €".replace(",", " ") for p in rng.integers(50, 2000, rows) * 1000], dtype=object)
+    prix[rng.random(rows) < 0.03] = None
+    surface = pd.Series([f"{s:.1f} m²".replace(".", ",") for s in rng.uniform(10, 300, rows)], dtype=object)
+    surface[rng.random(rows) < 0.05] = ""
+    ids = rng.integers(10_000_000, 99_999_999, rows)
+    return pd.DataFrame({
+        'titre': pick(["Appartement T3", "Maison 5 pièces", "Studio"]),
+        'prix': prix,
+        'surface': surface,
+        'nb_pieces': pick(["1 pièce", "2 pièces", "3 pièces", "T4", None, ""]),
+        'nb_chambres': pick(["1", "2", "3", None]),
+        'dpe_consumption': pick(["85 kWh/m²/an", "245 kWh/m²/an", "412", None, "Non communiqué"]),
+        'ges_emission': pick(["5 kg CO2/m²/an", "42", None]),
+        'dpe_rating': pick(["a", "B", "C ", "D", "e", "F", "G", "Vierge", None, ""]),
+        'ges_rating': pick(["A", "B", "C", "D", "E", "F", "G", None]),
+        'url': [f"https://www.fnaim.fr/annonce-immobiliere/{i}/4333-acheter-appartement-{v}.htm"
+                for i, v in zip(ids, pick(VILLES))],
+        'date_publication': pick(["2024-03-01", "2024-11-15", None]),
+        'code_postal': pick(["35000", "35400", "75011", "20000", "20200", "97400", "CP 69003", None]),
+        'agency_phone': pick(["02 99 12 34 56", "+33 2 99 12 34 56", "0299", None]),
+        'agency_siret': pick(["123 456 789 00012", "12345678900012", "123", None]),
+    })
+
+####
+#    MESURES    #
+####
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def legacy_locations(urls):
+    """Ancienne extraction : apply ligne par ligne avec un retour en Series."""
+    def extract_all_location(url):
+        cp, dept, ville = extract_location_from_url(url)
+        return pd.Series([cp, dept, ville])
+    locations = urls.apply(extract_all_location)
+    locations.columns = ['code_postal', 'departement', 'ville']
+    return locations
+
+def benchmark_column(name, series, scalar, vectorized):
+    legacy, legacy_seconds = timed(series.apply, scalar)
+    result, seconds = timed(vectorized, series)
+    pd.testing.assert_series_equal(legacy, result, check_names=False)
+    print(f"{name:16s} apply: {legacy_seconds:7.2f}s  vectorisé: {seconds:7.2f}s  x{legacy_seconds / seconds:6.1f}")
+    return legacy_seconds, seconds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark du nettoyage par colonne des annonces et des agences")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Nombre d'annonces synthétiques")
+    parser.add_argument("--seed", type=int, default=0, help="Graine du générateur")
+    args = parser.parse_args()
+
+    df = synthetic_raw_annonces(args.rows, args.seed)
+    print(f"{len(df)} annonces synthétiques")
+
+    totals = [
+        benchmark_column('prix', df['prix'], clean_price, clean_price_series),
+        benchmark_column('surface', df['surface'], clean_surface, clean_surface_series),
+        benchmark_column('nb_pieces', df['nb_pieces'], clean_rooms, clean_rooms_series),
+        benchmark_column('nb_chambres', df['nb_chambres'], clean_rooms, clean_rooms_series),
+        benchmark_column('dpe_consumption', df['dpe_consumption'], clean_dpe_value, clean_dpe_value_series),
+        benchmark_column('ges_emission', df['ges_emission'], clean_dpe_value, clean_dpe_value_series),
+        benchmark_column('dpe_rating', df['dpe_rating'], clean_dpe_letter, clean_dpe_letter_series),
+        benchmark_column('ges_rating', df['ges_rating'], clean_dpe_letter, clean_dpe_letter_series),
+        benchmark_column('code_postal', df['code_postal'], clean_postal_code, clean_postal_code_series),
+        benchmark_column('departement', df['code_postal'].apply(clean_postal_code), extract_department, extract_department_series),
+        benchmark_column('agency_phone', df['agency_phone'], clean_phone, clean_phone_series),
+        benchmark_column('agency_siret', df['agency_siret'], clean_siret, clean_siret_series),
+    ]
+
+    legacy, legacy_seconds = timed(legacy_locations, df['url'])
+    result, seconds = timed(extract_location_series, df['url'])
+    pd.testing.assert_frame_equal(legacy, result)
+    print(f"{'url -> lieu':16s} apply: {legacy_seconds:7.2f}s  vectorisé: {seconds:7.2f}s  x{legacy_seconds / seconds:6.1f}")
+    totals.append((legacy_seconds, seconds))
+
+    legacy_total = sum(t[0] for t in totals)
+    total = sum(t[1] for t in totals)
+    print(f"{'Total':16s} apply: {legacy_total:7.2f}s  vectorisé: {total:7.2f}s  x{legacy_total / total:6.1f}")
+
+    _, seconds = timed(preprocess_annonces_dataframe, df)
+    print(f"preprocess_annonces_dataframe complet: {seconds:.2f}s ({len(df) / seconds:.0f} annonces/s)")
@@ -0,0 +1,239 @@
+"""
+Benchmark du chargement des annonces et des agences dans MySQL.
+
+Compare, sur N annonces synthétiques déjà prétraitées :
+- la préparation des lignes : boucle iterrows + pd.isna par champ (ancienne
+  boucle de insert_annonces_into_mysql) contre dataframe_to_rows (vectorisée) ;
+- le chargement : insert_annonces_into_mysql en mode "per_row", "executemany"
+  et "load_data", d'abord sur une table vide (insertions) puis une seconde fois
+  (mises à jour par ON DUPLICATE KEY UPDATE) ;
+- le chargement des agences : insert_agences_into_mysql en mode "per_row" et
+  "staging" pour chaque taille de --agences (10000 et 100000 par défaut), sur
+  une table vide puis avec 10 % d'agences modifiées.
+
+Le chargement utilise une base dédiée (immobilier_fnaim_benchmark par défaut),
+créée par les migrations (avec les index des filtres de l'API) et vidée avant
+chaque méthode, avec les variables d'environnement MYSQL_HOST,
+MYSQL_USER et MYSQL_PASSWORD. Avec --no-mysql, seule la préparation est mesurée.
+
+Usage :
+    python benchmark_mysql_bulk.py [--rows N] [--agences N [N ...]] [--batch-size N] [--database NOM] [--no-mysql]
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from mysql_bulk_loader import ANNONCES_COLUMNS, dataframe_to_rows
+
+TYPES = ["Appartement", "Maison", "Terrain", "Parking", "Local commercial"]
+VILLES = [("35000", "35", "Rennes"), ("75011", "75", "Paris"), ("69003", "69", "Lyon"),
+          ("13008", "13", "Marseille"), ("44000", "44", "Nantes")]
+LETTRES = ["A", "B", "C", "D", "E", "F", "G", None]
+
+####
+#    DONNÉES SYNTHÉTIQUES    #
+####
+def synthetic_annonces(rows, seed=0):
+    """DataFrame d'annonces tel que produit par preprocess_annonces_dataframe (avec des valeurs manquantes)."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        code_postal, departement, ville = rng.choice(VILLES)
+        prix = float(rng.randint(50, 900) * 1000)
+        surface = float(rng.randint(15, 250)) if rng.random() > 0.05 else np.nan
+        records.append({
+            'titre': f"Vente {rng.choice(TYPES).lower()} {ville} - annonce {i}",
+            'prix': prix,
+            'surface': surface,
+            'nb_pieces': float(rng.randint(1, 8)) if rng.random() > 0.1 else np.nan,
+            'nb_chambres': float(rng.randint(0, 5)) if rng.random() > 0.2 else np.nan,
+            'type_habitation': rng.choice(TYPES),
+            'code_postal': code_postal,
+            'departement': departement,
+            'ville': ville,
+            'dpe_consumption': float(rng.randint(40, 450)) if rng.random() > 0.3 else np.nan,
+            'dpe_rating': rng.choice(LETTRES),
+            'ges_emission': float(rng.randint(2, 90)) if rng.random() > 0.3 else np.nan,
+            'ges_rating': rng.choice(LETTRES),
+            'prix_m2': prix / surface if surface == surface else np.nan,
+            'date_publication': pd.Timestamp("2024-01-01") + pd.Timedelta(days=rng.randint(0, 365)),
+            'reference': f"BENCH-{i:08d}",
+            'url': f"https://www.fnaim.fr/annonce-immobiliere/{i}/bench-{ville.lower()}-{code_postal}.htm",
+            'agency_id': rng.randint(1, 2000),
+        })
+    return pd.DataFrame.from_records(records)
+
+def synthetic_agences(rows, seed=0):
+    """DataFrame d'agences tel que produit par preprocess_agences_dataframe."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        code_postal, _, ville = rng.choice(VILLES)
+        records.append({
+            'agency_id': i + 1,
+            'agency_name': f"Agence {ville} {i}",
+            'agency_address': f"{rng.randint(1, 120)} rue de la République {code_postal} {ville}",
+            'agency_url': f"https://www.fnaim.fr/agence-immobiliere/{i + 1}/agence.htm",
+            'agency_phone': f"0{rng.randint(100000000, 999999999)}",
+            'agency_siret': f"{rng.randint(10 ** 13, 10 ** 14 - 1)}" if rng.random() > 0.2 else None,
+            'agency_card_number': f"CPI {rng.randint(1000, 9999)} {rng.randint(2015, 2024)} 000 {rng.randint(100, 999)}",
+            'agency_legal_reps': rng.choice(["M. Martin", "Mme Durand", None]),
+            'date_scrape': pd.Timestamp("2024-06-01") + pd.Timedelta(minutes=i),
+        })
+    return pd.DataFrame.from_records(records)
+
+def modified_agences(df, share=0.1, seed=1):
+    """Copie des agences dont une part `share` a changé de téléphone."""
+    rng = np.random.default_rng(seed)
+    modified = df.copy()
+    mask = rng.random(len(df)) < share
+    modified.loc[mask, 'agency_phone'] = "0299000000"
+    return modified
+
+####
+#    PRÉPARATION DES LIGNES    #
+####
+def rows_per_row(df):
+    """Préparation des lignes de l'ancienne boucle de insert_annonces_into_mysql."""
+    rows = []
+    for _, row in df.iterrows():
+        data = []
+        for field in ANNONCES_COLUMNS:
+            value = row.get(field, None)
+            if pd.isna(value):
+                value = None
+            data.append(value)
+        rows.append(tuple(data))
+    return rows
+
+def benchmark_conversion(df):
+    start = time.perf_counter()
+    legacy = rows_per_row(df)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = dataframe_to_rows(df, ANNONCES_COLUMNS)
+    vectorized_seconds = time.perf_counter() - start
+
+    assert len(legacy) == len(vectorized)
+    for old, new in zip(legacy, vectorized):
+        assert [v is None for v in old] == [v is None for v in new], (old, new)
+
+    print(f"Préparation iterrows      : {legacy_seconds:8.3f}s ({len(df) / legacy_seconds:10.0f} lignes/s)")
+    print(f"Préparation vectorisée    : {vectorized_seconds:8.3f}s ({len(df) / vectorized_seconds:10.0f} lignes/s)"
+          f"  x{legacy_seconds / vectorized_seconds:.1f}")
+
+####
+#    CHARGEMENT MYSQL    #
+####
+def benchmark_mysql(df, database, batch_size):
+    import mysql.connector
+    from data_processing_V2 import insert_annonces_into_mysql
+    from migrate import apply_migrations
+
+    connection = mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", ""),
+        allow_local_infile=True
+    )
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+        cursor.close()
+        connection.database = database
+        apply_migrations(connection)
+
+        results = []
+        for method in ("per_row", "executemany", "load_data"):
+            cursor = connection.cursor()
+            cursor.execute("TRUNCATE TABLE annonces")
+            cursor.close()
+
+            timings = []
+            for phase in ("insertion", "mise à jour"):
+                start = time.perf_counter()
+                insert_annonces_into_mysql(df, connection, method=method, batch_size=batch_size)
+                timings.append((phase, time.perf_counter() - start))
+            results.append((method, timings))
+
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM annonces")
+        count = cursor.fetchone()[0]
+        cursor.close()
+        assert count == len(df), f"{count} annonces en base pour {len(df)} lignes"
+    finally:
+        connection.close()
+
+    print()
+    for method, timings in results:
+        for phase, seconds in timings:
+            print(f"{method:12s} {phase:12s}: {seconds:8.2f}s ({len(df) / seconds:10.0f} lignes/s)")
+
+def benchmark_agences(sizes, database, batch_size):
+    import mysql.connector
+    from data_processing_V2 import insert_agences_into_mysql
+    from migrate import apply_migrations
+
+    connection = mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", "")
+    )
+    results = []
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+        cursor.close()
+        connection.database = database
+        apply_migrations(connection)
+
+        for size in sizes:
+            df = synthetic_agences(size)
+            updated = modified_agences(df)
+            for method in ("per_row", "staging"):
+                cursor = connection.cursor()
+                cursor.execute("TRUNCATE TABLE agences")
+                cursor.close()
+
+                for phase, frame in (("insertion", df), ("10 % modifiées", updated)):
+                    start = time.perf_counter()
+                    insert_agences_into_mysql(frame, connection, method=method, batch_size=batch_size)
+                    results.append((size, method, phase, time.perf_counter() - start))
+
+                cursor = connection.cursor()
+                cursor.execute("SELECT COUNT(*) FROM agences")
+                count = cursor.fetchone()[0]
+                cursor.close()
+                assert count == size, f"{count} agences en base pour {size} lignes"
+    finally:
+        connection.close()
+
+    print()
+    for size, method, phase, seconds in results:
+        print(f"{size:7d} agences {method:8s} {phase:15s}: {seconds:8.2f}s ({size / seconds:10.0f} lignes/s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark du chargement des annonces dans MySQL")
+    parser.add_argument("--rows", type=int, default=20000, help="Nombre d'annonces synthétiques")
+    parser.add_argument("--agences", type=int, nargs="*", default=[10000, 100000], help="Nombres d'agences synthétiques")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Taille des lots executemany")
+    parser.add_argument("--database", default="immobilier_fnaim_benchmark", help="Base MySQL du benchmark (vidée)")
+    parser.add_argument("--no-mysql", action="store_true", help="Mesurer uniquement la préparation des lignes")
+    args = parser.parse_args()
+
+    df = synthetic_annonces(args.rows)
+    # Même forme que la sortie de preprocess_annonces_dataframe
+    for col in df.columns:
+        df[col] = df[col].where(pd.notna(df[col]), None)
+
+    print(f"{args.rows} annonces synthétiques")
+    benchmark_conversion(df)
+    if not args.no_mysql:
+        benchmark_mysql(df, args.database, args.batch_size)
+        if args.agences:
+            benchmark_agences(args.agences, args.database, args.batch_size)
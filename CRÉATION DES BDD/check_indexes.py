@@ -0,0 +1,203 @@
+"""
+Vérifie par EXPLAIN que chaque requête de l'API utilise un index.
+
+Les requêtes reprennent celles de CREATION API/API_APP_V3.py (mêmes clauses
+WHERE, dans le même ordre), avec des valeurs prises dans la base quand elle
+en contient (code postal, type de bien, code INSEE) et des critères de
+recherche courants (budget, surface, nombre de pièces, DPE), pas des valeurs
+choisies pour ne sélectionner que quelques lignes.
+
+Le plan choisi par MySQL dépend de la sélectivité du filtre : chaque ligne
+d'EXPLAIN est donc affichée avec la part de la table que la clause WHERE
+sélectionne réellement (COUNT). Une requête échoue si EXPLAIN annonce un
+parcours complet de table (type ALL) ou aucun index alors que son filtre
+sélectionne moins de --max-selectivity de la table ; au-delà, un parcours
+complet peut être le meilleur plan et la requête est seulement signalée.
+
+Sur une table presque vide, MySQL préfère souvent un parcours complet, moins
+coûteux qu'un index : la vérification n'a de sens qu'une fois les données
+chargées. Les tables de moins de --min-rows lignes sont signalées.
+
+Usage :
+    python check_indexes.py [--database NOM] [--min-rows N] [--max-selectivity 0.2]
+"""
+import argparse
+import os
+import re
+
+import mysql.connector
+from dotenv import load_dotenv
+
+TABLES = ('annonces', 'agences', 'cities', 'dv3f_indicateurs_commune', 'dv3f_mutations')
+
+# Lignes d'EXPLAIN sans accès à une table : rien à indexer
+NO_TABLE_ACCESS = ('Select tables optimized away', 'no matching row in const table', 'Impossible WHERE')
+
+# Table et clause WHERE d'une requête de l'API (pour mesurer la sélectivité du filtre)
+WHERE_PATTERN = re.compile(r"\bFROM (\w+) WHERE (.*?)(?= GROUP BY| ORDER BY| LIMIT|$)", re.DOTALL)
+
+####
+#    REQUÊTES DE L'API    #
+####
+def _sample(cursor, query, default):
+    cursor.execute(query)
+    row = cursor.fetchone()
+    cursor.fetchall()
+    return row[0] if row and row[0] is not None else default
+
+def api_queries(cursor):
+    """Requêtes de l'API (nom de la route, requête, paramètres) avec des valeurs de la base et des critères courants."""
+    code_postal = _sample(cursor, "SELECT code_postal FROM annonces WHERE code_postal IS NOT NULL LIMIT 1", "35000")
+    type_habitation = _sample(cursor, "SELECT type_habitation FROM annonces WHERE type_habitation IS NOT NULL LIMIT 1", "Appartement")
+    reference = _sample(cursor, "SELECT reference FROM annonces WHERE reference IS NOT NULL LIMIT 1", "0")
+    city_code_postal = _sample(cursor, "SELECT code_postal FROM cities WHERE code_postal IS NOT NULL LIMIT 1", "35000")
+    code_insee = _sample(cursor, "SELECT code_insee FROM dv3f_mutations WHERE code_insee IS NOT NULL LIMIT 1", "35238")
+    annee = _sample(cursor, "SELECT MAX(annee) FROM dv3f_indicateurs_commune", "2022")
+    limit = [20, 0]
+
+    properties = "SELECT * FROM annonces WHERE 1=1"
+    mutations = "SELECT * FROM dv3f_mutations WHERE 1=1"
+    return [
+        ("/properties code_postal",
+         properties + " AND code_postal = %s LIMIT %s OFFSET %s", [code_postal] + limit),
+        ("/properties code_postal + prix + type",
+         properties + " AND code_postal = %s AND prix >= %s AND prix <= %s AND type_habitation = %s LIMIT %s OFFSET %s",
+         [code_postal, 150000, 350000, type_habitation] + limit),
+        ("/properties prix + type",
+         properties + " AND prix >= %s AND prix <= %s AND type_habitation = %s LIMIT %s OFFSET %s",
+         [150000, 350000, type_habitation] + limit),
+        ("/properties prix + surface",
+         properties + " AND prix >= %s AND prix <= %s AND surface >= %s LIMIT %s OFFSET %s",
+         [200000, 400000, 60] + limit),
+        ("/properties surface",
+         properties + " AND surface >= %s LIMIT %s OFFSET %s", [50] + limit),
+        ("/properties nb_pieces + dpe",
+         properties + " AND nb_pieces >= %s AND dpe_rating <= %s LIMIT %s OFFSET %s", [3, 'D'] + limit),
+        ("/properties dpe",
+         properties + " AND dpe_rating <= %s LIMIT %s OFFSET %s", ['C'] + limit),
+        ("/properties/{reference}",
+         "SELECT * FROM annonces WHERE reference = %s", [reference]),
+        ("/stats/prix-moyen",
+         "SELECT AVG(prix) AS prix_moyen, COUNT(*) AS nombre_proprietes FROM annonces "
+         "WHERE prix IS NOT NULL AND code_postal = %s AND type_habitation = %s", [code_postal, type_habitation]),
+        ("/stats/distribution-prix",
+         "SELECT CASE WHEN prix < 100000 THEN 'Moins de 100K€' ELSE 'Plus de 100K€' END AS tranche_prix, COUNT(*) AS nombre "
+         "FROM annonces WHERE prix IS NOT NULL AND code_postal = %s GROUP BY tranche_prix", [code_postal]),
+        ("/agencies/{agency_id}",
+         "SELECT * FROM agences WHERE id = %s", [1]),
+        ("/cities code_postal",
+         "SELECT * FROM cities WHERE 1=1 AND code_postal = %s LIMIT %s OFFSET %s", [city_code_postal] + limit),
+        ("/cities/{code_postal}",
+         "SELECT * FROM cities WHERE code_postal = %s LIMIT 1", [city_code_postal]),
+        ("/dv3f/indicateurs",
+         "SELECT * FROM dv3f_indicateurs_commune WHERE 1=1 AND code_insee = %s AND annee = %s", [code_insee, annee]),
+        ("/dv3f/mutations code_insee + dates + type",
+         mutations + " AND code_insee = %s AND datemut >= %s AND datemut <= %s AND libtypbien LIKE %s LIMIT %s OFFSET %s",
+         [code_insee, '2020-01-01', '2020-12-31', '%MAISON%'] + limit),
+        ("/dv3f/mutations dates",
+         mutations + " AND datemut >= %s AND datemut <= %s LIMIT %s OFFSET %s", ['2020-01-01', '2020-12-31'] + limit),
+        ("/dv3f/stats/evolution-prix",
+         "SELECT annee, prix_median_cod111 FROM dv3f_indicateurs_commune WHERE code_insee = %s ORDER BY annee", [code_insee]),
+        ("/dv3f/stats/comparaison-communes (année)",
+         "SELECT MAX(annee) as derniere_annee FROM dv3f_indicateurs_commune", []),
+        ("/dv3f/stats/comparaison-communes",
+         "SELECT code_insee, nom_commune, annee FROM dv3f_indicateurs_commune WHERE code_insee IN (%s, %s) AND annee = %s",
+         [code_insee, '75056', annee]),
+    ]
+
+####
+#    VÉRIFICATION    #
+####
+def explain(cursor, query, params):
+    """Lignes d'EXPLAIN de la requête (une par table lue)."""
+    cursor.execute("EXPLAIN " + query, params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def uses_index(plan_row):
+    """True si la ligne d'EXPLAIN lit la table par un index (ou n'a aucune table à lire)."""
+    extra = plan_row.get('Extra') or ''
+    if plan_row.get('table') is None or any(text in extra for text in NO_TABLE_ACCESS):
+        return True
+    return plan_row.get('type') != 'ALL' and plan_row.get('key') is not None
+
+def selectivity(cursor, query, params, sizes):
+    """Part des lignes de la table sélectionnées par la clause WHERE de la requête (None sans WHERE)."""
+    match = WHERE_PATTERN.search(query)
+    if not match or not sizes.get(match.group(1)):
+        return None
+    table, where = match.groups()
+    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params[:where.count('%s')])
+    return cursor.fetchone()[0] / sizes[table]
+
+def table_sizes(cursor):
+    sizes = {}
+    for table in TABLES:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        sizes[table] = cursor.fetchone()[0]
+    return sizes
+
+def check_indexes(connection, min_rows=1000, max_selectivity=0.2):
+    """
+    Affiche le plan de chaque requête de l'API avec la sélectivité de son filtre.
+
+    Returns:
+        int: Nombre de requêtes sans index dont le filtre sélectionne moins de max_selectivity de la table
+    """
+    cursor = connection.cursor()
+    try:
+        sizes = table_sizes(cursor)
+        for table, size in sizes.items():
+            if size < min_rows:
+                print(f"Attention: {table} ne contient que {size} lignes, MySQL peut y préférer un parcours complet.")
+
+        queries = api_queries(cursor)
+        failures = 0
+        for name, query, params in queries:
+            plan = explain(cursor, query, params)
+            share = selectivity(cursor, query, params, sizes)
+            if all(uses_index(row) for row in plan):
+                status = 'OK '
+            elif share is not None and share > max_selectivity:
+                # Filtre peu sélectif : un parcours complet peut être le meilleur plan
+                status = '-- '
+            else:
+                status = 'KO '
+                failures += 1
+            share_text = f"{share:.1%}" if share is not None else "-"
+            for row in plan:
+                print(f"{status} {name:45s} sélectivité={share_text:7s} {str(row.get('table')):26s} "
+                      f"type={str(row.get('type')):6s} index={str(row.get('key')):35s} lignes={row.get('rows')} "
+                      f"{row.get('Extra') or ''}")
+        print(f"{failures} requête(s) sélective(s) sans index sur {len(queries)} "
+              f"('--' : filtre sélectionnant plus de {max_selectivity:.0%} de la table).")
+        return failures
+    finally:
+        cursor.close()
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Vérification par EXPLAIN des index utilisés par l'API")
+    parser.add_argument("--database", default=os.getenv("MYSQL_DATABASE", "immobilier_fnaim"), help="Base MySQL")
+    parser.add_argument("--min-rows", type=int, default=1000, help="Taille en dessous de laquelle une table est signalée")
+    parser.add_argument("--max-selectivity", type=float, default=0.2,
+                        help="Part de la table au-delà de laquelle un parcours complet n'est pas compté comme un échec")
+    args = parser.parse_args()
+
+    try:
+        connection = mysql.connector.connect(
+            host=os.getenv("MYSQL_HOST", "localhost"),
+            user=os.getenv("MYSQL_USER", "root"),
+            password=os.getenv("MYSQL_PASSWORD", ""),
+            database=args.database
+        )
+    except mysql.connector.Error as e:
+        print(f"Erreur de connexion à MySQL: {e}")
+        exit(1)
+
+    try:
+        failures = check_indexes(connection, args.min_rows, args.max_selectivity)
+    finally:
+        connection.close()
+    exit(1 if failures else 0)
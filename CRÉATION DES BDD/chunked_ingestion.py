@@ -0,0 +1,215 @@
+"""
+Ingestion par blocs des fichiers du scraper.
+
+process_annonces_data / process_agences_data lisaient tout le fichier, le
+copiaient au prétraitement puis gardaient le DataFrame complet pendant les
+chargements MySQL et MongoDB. Ici, le fichier est lu par blocs de `chunksize`
+lignes (pd.read_csv(chunksize=...) pour un CSV, lecteur par lots pyarrow pour un
+fichier Parquet ou Arrow IPC) et chaque bloc est prétraité puis chargé dans les
+bases avant de lire le suivant : la mémoire reste bornée par la taille d'un bloc.
+
+Un fichier de progression (<fichier>.progress.json) enregistre, après chaque
+bloc chargé dans toutes les bases, le nombre de lignes du fichier déjà traitées.
+Une ingestion interrompue reprend au bloc suivant le dernier bloc validé ; si le
+fichier source a changé (taille ou date de modification), elle repart du début.
+
+Par défaut, chaque bloc est chargé simultanément dans MySQL et MongoDB (voir
+sink_fanout) pendant que le bloc suivant est lu et prétraité.
+"""
+import datetime
+import json
+import os
+import time
+
+import pandas as pd
+
+from sink_fanout import FanOutLoader
+
+DEFAULT_CHUNKSIZE = 50000
+
+####
+#    LECTURE PAR BLOCS    #
+####
+def _read_chunks(file_path, chunksize):
+    """Blocs successifs du fichier (CSV, Parquet ou Arrow IPC), d'au plus chunksize lignes."""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in ('.parquet', '.arrow'):
+        yield from pd.read_csv(file_path, chunksize=chunksize)
+        return
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow est requis pour lire les fichiers Parquet/Arrow : pip install pyarrow")
+
+    if extension == '.parquet':
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        with pa.memory_map(file_path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                for offset in range(0, batch.num_rows, chunksize):
+                    yield batch.slice(offset, chunksize).to_pandas()
+
+def iter_file_chunks(file_path, chunksize=DEFAULT_CHUNKSIZE, start_row=0):
+    """
+    Parcourt le fichier par blocs à partir de la ligne start_row.
+    Produit (première ligne du bloc, DataFrame) ; l'index du DataFrame est le numéro de ligne dans le fichier.
+    """
+    row = 0
+    for chunk in _read_chunks(file_path, chunksize):
+        first, row = row, row + len(chunk)
+        if row <= start_row:
+            continue
+        chunk.index = pd.RangeIndex(first, row)
+        if first < start_row:
+            chunk = chunk.loc[start_row:]
+            first = start_row
+        yield first, chunk
+
+####
+#    PROGRESSION    #
+####
+class IngestionProgress:
+    """
+    Progression de l'ingestion d'un fichier, réécrite de façon atomique après chaque bloc.
+
+    Args:
+        file_path (str): Fichier ingéré
+        progress_path (str): Fichier de progression (défaut: <file_path>.progress.json)
+    """
+    def __init__(self, file_path, progress_path=None):
+        self.file_path = file_path
+        self.progress_path = progress_path or f"{file_path}.progress.json"
+        stat = os.stat(file_path)
+        self.state = {
+            'file': os.path.abspath(file_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'rows_done': 0,
+            'chunks_done': 0,
+            'complete': False,
+        }
+
+    def load(self):
+        """Reprend la progression précédente si elle concerne le même fichier. Retourne la ligne de reprise."""
+        try:
+            with open(self.progress_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"Fichier de progression illisible ({e}), ingestion depuis le début.")
+            return 0
+
+        same_file = all(saved.get(key) == self.state[key] for key in ('file', 'size', 'mtime_ns'))
+        if not same_file:
+            print("Le fichier a changé depuis la dernière ingestion, reprise depuis le début.")
+            return 0
+        if saved.get('complete'):
+            return 0
+
+        self.state.update(rows_done=saved.get('rows_done', 0), chunks_done=saved.get('chunks_done', 0))
+        return self.state['rows_done']
+
+    def _write(self):
+        self.state['updated_at'] = datetime.datetime.now().isoformat()
+        tmp_path = f"{self.progress_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.progress_path)
+
+    def commit(self, rows_done):
+        """Valide un bloc : toutes les lignes avant rows_done sont chargées."""
+        self.state['rows_done'] = rows_done
+        self.state['chunks_done'] += 1
+        self._write()
+
+    def finish(self):
+        """Marque l'ingestion complète : la suivante repartira du début."""
+        self.state['complete'] = True
+        self._write()
+
+####
+#    INGESTION    #
+####
+def ingest_in_chunks(file_path, preprocess, loaders, chunksize=DEFAULT_CHUNKSIZE, resume=True,
+                     progress_path=None, label="Données", parallel=True, max_pending=2):
+    """
+    Lit le fichier par blocs et, pour chaque bloc, appelle preprocess puis chaque loader.
+
+    Args:
+        file_path (str): Fichier CSV, Parquet ou Arrow IPC
+        preprocess (callable): DataFrame brut -> DataFrame prétraité
+        loaders (dict): Nom de la base -> fonction loader(df) -> bool ; un bloc n'est validé que si toutes réussissent
+        chunksize (int): Nombre de lignes du fichier par bloc
+        resume (bool): Reprendre après le dernier bloc validé d'une ingestion interrompue
+        progress_path (str): Fichier de progression (défaut: <file_path>.progress.json)
+        label (str): Libellé des messages
+        parallel (bool): Charger chaque bloc dans toutes les bases en parallèle (voir sink_fanout) ;
+            le bloc suivant est lu et prétraité pendant le chargement
+        max_pending (int): Nombre maximal de blocs en attente par base en mode parallèle
+
+    Returns:
+        bool: True si tout le fichier a été chargé
+    """
+    if not loaders:
+        # Sans base de destination, chaque bloc serait validé sans avoir été chargé nulle part
+        raise ValueError(f"{label} - Aucune base de destination : ingestion annulée")
+
+    progress = IngestionProgress(file_path, progress_path)
+    start_row = progress.load() if resume else 0
+    if start_row:
+        print(f"{label} - Reprise de l'ingestion à la ligne {start_row} ({progress.state['chunks_done']} blocs déjà chargés).")
+
+    start = time.perf_counter()
+    totals = {'read': 0, 'loaded': 0}
+
+    def commit(first, rows_read, rows_loaded):
+        progress.commit(first + rows_read)
+        totals['read'] += rows_read
+        totals['loaded'] += rows_loaded
+        seconds = time.perf_counter() - start
+        print(f"{label} - Bloc {progress.state['chunks_done']} chargé: lignes {first}-{first + rows_read - 1}, "
+              f"{rows_loaded} après nettoyage ({totals['read'] / seconds:.0f} lignes/s)")
+
+    def failed(first):
+        print(f"{label} - Échec du chargement du bloc commençant à la ligne {first}. "
+              f"Relancer l'ingestion pour reprendre à ce bloc.")
+        return False
+
+    if parallel:
+        fan_out = FanOutLoader(loaders, max_pending=max_pending)
+        try:
+            # Les blocs sont validés dans l'ordre ; après un échec, les blocs suivants
+            # ne sont plus soumis et ceux déjà chargés seront rechargés à la reprise.
+            for first, chunk in iter_file_chunks(file_path, chunksize, start_row):
+                processed_df = preprocess(chunk)
+                fan_out.submit(processed_df, meta=(first, len(chunk), len(processed_df)))
+                for batch in fan_out.completed():
+                    if not batch.ok:
+                        fan_out.drain()
+                        return failed(batch.meta[0])
+                    commit(*batch.meta)
+            for batch in fan_out.drain():
+                if not batch.ok:
+                    return failed(batch.meta[0])
+                commit(*batch.meta)
+        finally:
+            fan_out.close()
+            fan_out.report(label)
+    else:
+        for first, chunk in iter_file_chunks(file_path, chunksize, start_row):
+            processed_df = preprocess(chunk)
+            if not all(loader(processed_df) for loader in loaders.values()):
+                return failed(first)
+            commit(first, len(chunk), len(processed_df))
+
+    progress.finish()
+    print(f"{label} - Ingestion par blocs terminée: {totals['read']} lignes lues, {totals['loaded']} chargées "
+          f"en {time.perf_counter() - start:.1f}s.")
+    return True
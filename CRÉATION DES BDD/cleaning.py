@@ -0,0 +1,338 @@
+"""
+Nettoyage des données du scraper, partagé par data_processing_V2 et data_processing_BDD.
+
+Les deux chargeurs avaient chacun leur copie des nettoyeurs, qui recompilaient
+leurs expressions régulières (re.sub / re.search) à chaque appel. Ici :
+- les motifs sont compilés une fois au chargement du module ;
+- les valeurs très répétées (codes postaux, départements, libellés DPE/GES,
+  nombres de pièces) sont normalisées par des fonctions mémoïsées (lru_cache) ;
+- chaque nettoyeur scalaire a une version par colonne (`*_series`) qui donne le
+  même résultat (valeurs et types) que Series.apply du nettoyeur, sans boucle
+  Python sur les lignes.
+
+La localisation des annonces (code postal, département, ville) est lue à la fin
+de l'URL puis résolue dans l'index des communes (voir commune_index).
+"""
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from commune_index import department_from_postal_code, resolve_location
+
+# Taille des caches des valeurs répétées
+CACHE_SIZE = 65536
+
+####
+#    MOTIFS COMPILÉS    #
+####
+NON_DIGIT_PATTERN = re.compile(r'[^\d]')
+SURFACE_PATTERN = re.compile(r'(\d+[.,]?\d*)')
+INTEGER_PATTERN = re.compile(r'(\d+)')
+POSTAL_CODE_PATTERN = re.compile(r'(\d{5})')
+DPE_LETTER_PATTERN = re.compile(r'[A-G]')
+
+# Fin d'URL d'annonce : texte éventuel puis code postal à 5 chiffres (ex: rennes-35000.htm)
+# ou numéro de département (ex: ille-et-vilaine-35.htm)
+URL_LOCATION_PATTERN = re.compile(r'[-/](?:([a-zA-Z-]+)-)?(\d{5}|\d{1,2})\.htm$')
+
+####
+#    NORMALISATION MÉMOÏSÉE    #
+####
+@lru_cache(maxsize=CACHE_SIZE)
+def _first_integer(text):
+    match = INTEGER_PATTERN.search(text)
+    return int(match.group(1)) if match else None
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _postal_code(text):
+    match = POSTAL_CODE_PATTERN.search(text)
+    return match.group(1) if match else None
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _department(postal_code):
+    return department_from_postal_code(postal_code)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _dpe_letter(text):
+    match = DPE_LETTER_PATTERN.search(text.upper())
+    return match.group(0) if match else None
+
+####
+#    NETTOYEURS SCALAIRES    #
+####
+def clean_price(price_str):
+    """Nettoie et convertit une chaîne de prix en valeur numérique."""
+    if pd.isna(price_str) or price_str == '':
+        return None
+
+    # Extraction des chiffres uniquement
+    if isinstance(price_str, str):
+        price_digits = NON_DIGIT_PATTERN.sub('', price_str)
+        if price_digits:
+            return int(price_digits)
+    elif isinstance(price_str, (int, float)):
+        return price_str
+
+    return None
+
+def clean_surface(surface_str):
+    """Nettoie et convertit une chaîne de surface en valeur numérique."""
+    if pd.isna(surface_str) or surface_str == '':
+        return None
+
+    if isinstance(surface_str, (int, float)):
+        return float(surface_str)
+
+    # Extraction des chiffres avec virgule ou point
+    if isinstance(surface_str, str):
+        match = SURFACE_PATTERN.search(surface_str.replace(',', '.'))
+        if match:
+            return float(match.group(1).replace(',', '.'))
+
+    return None
+
+def clean_rooms(rooms_str):
+    """Nettoie et convertit une chaîne de nombre de pièces en valeur numérique."""
+    if pd.isna(rooms_str) or rooms_str == '':
+        return None
+
+    if isinstance(rooms_str, (int, float)):
+        return int(rooms_str)
+
+    # Extraction des chiffres uniquement
+    if isinstance(rooms_str, str):
+        return _first_integer(rooms_str)
+
+    return None
+
+def clean_postal_code(postal_code):
+    """Nettoie et valide un code postal français."""
+    if pd.isna(postal_code) or postal_code == '':
+        return None
+
+    if isinstance(postal_code, int):
+        postal_code = str(postal_code)
+
+    if isinstance(postal_code, str):
+        # Extraction d'un code postal à 5 chiffres
+        return _postal_code(postal_code)
+
+    return None
+
+def extract_department(postal_code):
+    """Extrait le département à partir du code postal."""
+    if pd.isna(postal_code) or postal_code == '':
+        return None
+
+    return _department(str(postal_code))
+
+def clean_dpe_value(dpe_str):
+    """Nettoie et convertit une valeur DPE en valeur numérique."""
+    if pd.isna(dpe_str) or dpe_str == '':
+        return None
+
+    if isinstance(dpe_str, (int, float)):
+        return int(dpe_str)
+
+    if isinstance(dpe_str, str):
+        # Extraction des chiffres uniquement
+        return _first_integer(dpe_str)
+
+    return None
+
+def clean_dpe_letter(dpe_str):
+    """Extrait la lettre de classification DPE."""
+    if pd.isna(dpe_str) or dpe_str == '':
+        return None
+
+    if isinstance(dpe_str, str):
+        # Extraction d'une lettre de A à G
+        return _dpe_letter(dpe_str)
+
+    return None
+
+def clean_phone(phone_str):
+    """Nettoie et formate un numéro de téléphone."""
+    if pd.isna(phone_str) or phone_str == '':
+        return None
+
+    if isinstance(phone_str, (int, float)):
+        phone_str = str(int(phone_str))
+
+    if isinstance(phone_str, str):
+        # Extraction des chiffres uniquement
+        digits = NON_DIGIT_PATTERN.sub('', phone_str)
+        if len(digits) >= 10:
+            return digits[:10]  # Garder les 10 premiers chiffres
+
+    return None
+
+def clean_siret(siret_str):
+    """Nettoie et valide un numéro SIRET."""
+    if pd.isna(siret_str) or siret_str == '':
+        return None
+
+    if isinstance(siret_str, (int, float)):
+        siret_str = str(int(siret_str))
+
+    if isinstance(siret_str, str):
+        # Extraction des chiffres uniquement
+        digits = NON_DIGIT_PATTERN.sub('', siret_str)
+        if len(digits) == 14:  # Un SIRET valide a 14 chiffres
+            return digits
+
+    return None
+
+def extract_location_from_url(url):
+    """
+    Extrait le code postal, le département et la ville à partir de l'URL de l'annonce.
+    Exemples d'URL:
+    - https://www.fnaim.fr/annonce-immobiliere/52367367/4333-acheter-appartement-rennes-35000.htm
+    - https://www.fnaim.fr/annonce-immobiliere/52203849/4333-acheter-appartement-ille-et-vilaine-35.htm
+    """
+    if not url or not isinstance(url, str):
+        return None, None, None
+
+    match = URL_LOCATION_PATTERN.search(url)
+    if match is None:
+        return None, None, None
+
+    code_postal, _, departement, ville = resolve_location(match.group(2), match.group(1))
+    return code_postal, departement, ville
+
+####
+#    NETTOYAGE PAR COLONNE    #
+####
+# Chaque fonction traite une colonne entière et donne le même résultat (valeurs et types)
+# que Series.apply du nettoyeur correspondant ci-dessus.
+def _column_kind(series):
+    """Nature d'une colonne : 'string' (textes et valeurs manquantes), 'numeric' ou 'mixed'."""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return 'numeric'
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred in ('string', 'empty'):
+        return 'string'
+    if inferred in ('integer', 'floating', 'mixed-integer-float'):
+        return 'numeric'
+    return 'mixed'
+
+def _string_values(series):
+    """Textes de la colonne en chaînes Arrow quand pyarrow est installé (opérations .str plus rapides)."""
+    try:
+        return series.astype(pd.StringDtype('pyarrow'))
+    except ImportError:
+        return series
+
+def _like_apply(values, as_int=False):
+    """
+    Types du résultat de Series.apply : entiers sans valeur manquante en int64,
+    colonne entièrement vide en None (object), textes en str.
+    """
+    if as_int and values.notna().all():
+        values = values.astype('int64')
+    result = values.astype(object)
+    return result.where(result.notna(), None).infer_objects()
+
+def _clean_distinct(series, clean_value):
+    """
+    Nettoie une colonne de textes très répétés (codes postaux, lettres DPE) :
+    seules les valeurs distinctes passent par le nettoyeur, puis sont réparties.
+    """
+    if _column_kind(series) != 'string':
+        # Les nombres ne sont pas regroupés : 35000 et 35000.0 n'ont pas le même nettoyage
+        return series.apply(clean_value)
+    codes, uniques = pd.factorize(series)
+    cleaned = np.array([clean_value(value) for value in uniques] + [None], dtype=object)
+    return _like_apply(pd.Series(cleaned[codes], index=series.index, dtype=object))
+
+def clean_price_series(series):
+    """Version par colonne de clean_price."""
+    kind = _column_kind(series)
+    if kind == 'mixed':
+        return series.apply(clean_price)
+    if kind == 'numeric':
+        values = pd.to_numeric(series)
+        return _like_apply(values, as_int=pd.api.types.is_integer_dtype(values))
+
+    digits = _string_values(series).str.replace(NON_DIGIT_PATTERN.pattern, '', regex=True)
+    return _like_apply(digits.where(digits != '').astype('float64'), as_int=True)
+
+def clean_surface_series(series):
+    """Version par colonne de clean_surface."""
+    kind = _column_kind(series)
+    if kind == 'mixed':
+        return series.apply(clean_surface)
+    if kind == 'numeric':
+        return _like_apply(pd.to_numeric(series).astype('float64'))
+
+    surface = _string_values(series).str.replace(',', '.', regex=False).str.extract(SURFACE_PATTERN.pattern, expand=False)
+    return _like_apply(surface.astype('float64'))
+
+def _clean_integer_series(series, clean_value):
+    """Premier nombre entier d'une chaîne (clean_rooms, clean_dpe_value), nombres tronqués."""
+    kind = _column_kind(series)
+    if kind == 'mixed':
+        return series.apply(clean_value)
+    if kind == 'numeric':
+        return _like_apply(np.trunc(pd.to_numeric(series)), as_int=True)
+
+    number = _string_values(series).str.extract(INTEGER_PATTERN.pattern, expand=False)
+    return _like_apply(number.astype('float64'), as_int=True)
+
+def clean_rooms_series(series):
+    """Version par colonne de clean_rooms."""
+    return _clean_integer_series(series, clean_rooms)
+
+def clean_dpe_value_series(series):
+    """Version par colonne de clean_dpe_value."""
+    return _clean_integer_series(series, clean_dpe_value)
+
+def clean_dpe_letter_series(series):
+    """Version par colonne de clean_dpe_letter (quelques valeurs distinctes seulement)."""
+    return _clean_distinct(series, clean_dpe_letter)
+
+def clean_postal_code_series(series):
+    """Version par colonne de clean_postal_code."""
+    return _clean_distinct(series, clean_postal_code)
+
+def extract_department_series(series):
+    """Version par colonne de extract_department."""
+    return _clean_distinct(series, extract_department)
+
+def _clean_digits_series(series, clean_value, keep):
+    """Chiffres d'une chaîne (clean_phone, clean_siret) ; keep(chiffres) -> chiffres gardés ou NaN."""
+    if _column_kind(series) != 'string':
+        return series.apply(clean_value)
+    digits = _string_values(series).str.replace(NON_DIGIT_PATTERN.pattern, '', regex=True)
+    return _like_apply(keep(digits))
+
+def clean_phone_series(series):
+    """Version par colonne de clean_phone."""
+    return _clean_digits_series(series, clean_phone, lambda digits: digits.str[:10].where(digits.str.len() >= 10))
+
+def clean_siret_series(series):
+    """Version par colonne de clean_siret."""
+    return _clean_digits_series(series, clean_siret, lambda digits: digits.where(digits.str.len() == 14))
+
+def extract_location_series(urls):
+    """Version par colonne de extract_location_from_url : DataFrame (code_postal, departement, ville)."""
+    if _column_kind(urls) != 'string':
+        locations = [extract_location_from_url(url) for url in urls]
+        locations = pd.DataFrame(locations, index=urls.index, columns=['code_postal', 'departement', 'ville'])
+        return locations.apply(_like_apply)
+
+    # Les fins d'URL distinctes (nombre, texte) sont résolues une seule fois
+    parts = _string_values(urls).str.extract(URL_LOCATION_PATTERN.pattern)
+    keys = parts[1] + '/' + parts[0].fillna('')
+    codes, uniques = pd.factorize(keys)
+    resolved = [resolve_location(*key.split('/', 1)) for key in uniques] + [(None, None, None, None)]
+    resolved = np.array(resolved, dtype=object)[codes]
+
+    locations = pd.DataFrame({
+        'code_postal': resolved[:, 0],
+        'departement': resolved[:, 2],
+        'ville': resolved[:, 3],
+    }, index=urls.index)
+    return locations.apply(_like_apply)
@@ -0,0 +1,281 @@
+"""
+Index en mémoire des codes postaux, codes INSEE, communes et départements.
+
+extract_location_from_url devinait la ville en mettant en forme la fin de l'URL
+(« 4333-acheter-appartement-rennes-35000.htm » donnait « Acheter Appartement
+Rennes ») et prenait les deux premiers chiffres du code postal comme département
+(faux pour la Corse et l'outre-mer). Ici, la fin de l'URL est résolue dans un
+index chargé une seule fois, à partir de deux fichiers livrés :
+- data/departements.csv : code et nom des départements ;
+- data/communes_index.csv.gz : code postal, code INSEE et nom officiel de chaque
+  commune (et des arrondissements de Paris, Lyon et Marseille).
+
+Le fichier des communes se régénère à partir de la base officielle des codes
+postaux de La Poste (et, en option, du code officiel géographique de l'INSEE
+pour les noms accentués), ou des extraits du paquet data-france qui agrègent
+ces deux sources :
+
+    python commune_index.py build laposte_hexasmal.csv [--cog v_commune_2024.csv]
+    python commune_index.py build-data-france chemin/vers/data_france/data
+"""
+import argparse
+import csv
+import gzip
+import io
+import lzma
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+COMMUNES_PATH = os.getenv("COMMUNES_INDEX_PATH", os.path.join(DATA_DIR, 'communes_index.csv.gz'))
+DEPARTEMENTS_PATH = os.path.join(DATA_DIR, 'departements.csv')
+
+# Taille du cache des résolutions (code postal ou département, fin d'URL)
+CACHE_SIZE = 65536
+
+NON_ALNUM_PATTERN = re.compile(r'[^a-z0-9]+')
+
+####
+#    NORMALISATION    #
+####
+def slugify(name):
+    """Forme d'un nom dans les URL : minuscules sans accents, mots séparés par des tirets."""
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return NON_ALNUM_PATTERN.sub('-', name.lower()).strip('-')
+
+def department_from_postal_code(postal_code):
+    """Département déduit d'un code postal (sans index)."""
+    # Cas particuliers pour les DOM-TOM
+    if postal_code.startswith('97'):
+        return postal_code[:3]
+    # Cas particulier pour la Corse
+    elif postal_code.startswith('20'):
+        if int(postal_code) >= 20200:
+            return '2B'  # Haute-Corse
+        else:
+            return '2A'  # Corse-du-Sud
+    # Cas général
+    else:
+        return postal_code[:2]
+
+def department_from_insee(code_insee):
+    """Département d'une commune : 3 caractères du code INSEE en outre-mer, 2 sinon (2A/2B en Corse)."""
+    return code_insee[:3] if code_insee.startswith('97') else code_insee[:2]
+
+####
+#    INDEX    #
+####
+class CommuneIndex:
+    """
+    Index des communes par code postal et par département, avec les noms des départements.
+
+    Args:
+        communes (iterable): Tuples (code_postal, code_insee, nom de la commune)
+        departements (dict): Code du département -> nom
+    """
+    def __init__(self, communes, departements):
+        self.departements = dict(departements)
+        self.department_slugs = {slugify(name): code for code, name in self.departements.items()}
+        # code postal -> {slug: (code_postal, code_insee, nom)}
+        self.by_postal_code = {}
+        # département -> {slug: (code_postal, code_insee, nom)}, plus petit code postal de la commune
+        self.by_department = {}
+        self.size = 0
+
+        for code_postal, code_insee, nom in communes:
+            commune = (code_postal, code_insee, nom)
+            slug = slugify(nom)
+            self.by_postal_code.setdefault(code_postal, {})[slug] = commune
+            in_department = self.by_department.setdefault(department_from_insee(code_insee), {})
+            if slug not in in_department or code_postal < in_department[slug][0]:
+                in_department[slug] = commune
+            self.size += 1
+
+    @classmethod
+    def load(cls, communes_path=COMMUNES_PATH, departements_path=DEPARTEMENTS_PATH):
+        """Charge l'index depuis les fichiers livrés ; sans fichier des communes, seuls les départements sont indexés."""
+        with open(departements_path, 'r', encoding='utf-8', newline='') as f:
+            departements = {row['code_departement']: row['nom_departement'] for row in csv.DictReader(f, delimiter=';')}
+
+        communes = []
+        if os.path.exists(communes_path):
+            with gzip.open(communes_path, 'rt', encoding='utf-8', newline='') as f:
+                communes = [(row['code_postal'], row['code_insee'], row['commune'])
+                            for row in csv.DictReader(f, delimiter=';')]
+        else:
+            print(f"Index des communes absent ({communes_path}) : seuls les départements seront résolus. "
+                  f"Voir 'python commune_index.py build' ou 'build-data-france'.")
+        return cls(communes, departements)
+
+    @staticmethod
+    def _match(candidates, url_slug):
+        """Commune dont le nom termine la fin d'URL (la correspondance la plus longue l'emporte)."""
+        if not candidates or not url_slug:
+            return None
+        words = url_slug.split('-')
+        for i in range(len(words)):
+            commune = candidates.get('-'.join(words[i:]))
+            if commune:
+                return commune
+        return None
+
+    def resolve(self, number, url_slug=None):
+        """
+        Résout la fin d'une URL d'annonce.
+
+        Args:
+            number (str): Code postal (5 chiffres) ou numéro de département (1 ou 2 chiffres)
+            url_slug (str): Texte qui précède ce nombre dans l'URL (ex: "acheter-appartement-rennes")
+
+        Returns:
+            tuple: (code_postal, code_insee, departement, ville)
+        """
+        url_slug = url_slug.lower() if url_slug else None
+
+        if len(number) == 5:
+            candidates = self.by_postal_code.get(number)
+            commune = self._match(candidates, url_slug)
+            if commune is None and candidates and len(candidates) == 1:
+                # Code postal d'une seule commune (ex: arrondissements de Paris)
+                commune = next(iter(candidates.values()))
+            if commune:
+                code_postal, code_insee, nom = commune
+                return number, code_insee, department_from_insee(code_insee), nom
+            return number, None, department_from_postal_code(number), title_from_slug(url_slug)
+
+        departement = number.zfill(2)
+        commune = self._match(self.by_department.get(departement), url_slug)
+        if commune:
+            code_postal, code_insee, nom = commune
+            return code_postal, code_insee, departement, nom
+        if self._match(self.department_slugs, url_slug) == departement:
+            # L'URL ne désigne que le département (ex: ille-et-vilaine-35.htm)
+            return f"{departement}000", None, departement, None
+        return f"{departement}000", None, departement, title_from_slug(url_slug)
+
+def title_from_slug(url_slug):
+    """Ville déduite de la fin d'URL quand l'index ne la connaît pas."""
+    return url_slug.replace('-', ' ').title() if url_slug else None
+
+@lru_cache(maxsize=1)
+def get_commune_index():
+    """Index chargé au premier appel puis partagé."""
+    return CommuneIndex.load()
+
+@lru_cache(maxsize=CACHE_SIZE)
+def resolve_location(number, url_slug=None):
+    """CommuneIndex.resolve sur l'index partagé, mémoïsé (les mêmes fins d'URL reviennent dans chaque lot)."""
+    return get_commune_index().resolve(number, url_slug)
+
+####
+#    CONSTRUCTION DU FICHIER DES COMMUNES    #
+####
+def _read_semicolon_csv(path):
+    """Lignes d'un CSV séparé par des ';' (UTF-8 ou Latin-1), en-têtes en minuscules sans '#'."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    try:
+        text = raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = raw.decode('latin-1')
+    delimiter = ';' if ';' in text.split('\n', 1)[0] else ','
+    reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
+    for row in reader:
+        yield {key.strip().lstrip('#').lower(): (value or '').strip() for key, value in row.items() if key}
+
+def _write_commune_index(communes, output_path):
+    """Écrit le fichier compact des communes (CSV gzip trié : code_postal;code_insee;commune)."""
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    # mtime fixé : le fichier produit ne change que si les communes changent
+    with gzip.GzipFile(output_path, 'wb', mtime=0) as raw, \
+            io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=';', lineterminator='\n')
+        writer.writerow(['code_postal', 'code_insee', 'commune'])
+        writer.writerows(sorted(communes))
+
+    print(f"{len(communes)} couples (code postal, commune) écrits dans {output_path}")
+    return len(communes)
+
+def build_commune_index(postal_codes_path, output_path=COMMUNES_PATH, cog_path=None):
+    """
+    Produit le fichier compact des communes à partir de la base officielle des codes postaux.
+
+    Args:
+        postal_codes_path (str): Base officielle des codes postaux de La Poste
+            (colonnes Code_commune_INSEE, Nom_de_la_commune, Code_postal)
+        output_path (str): Fichier produit (CSV gzip : code_postal;code_insee;commune)
+        cog_path (str): Code officiel géographique de l'INSEE (colonnes TYPECOM, COM, LIBELLE),
+            pour remplacer les noms en majuscules de La Poste par les noms officiels
+
+    Returns:
+        int: Nombre de couples (code postal, commune) écrits
+    """
+    names = {}
+    if cog_path:
+        for row in _read_semicolon_csv(cog_path):
+            # Communes et arrondissements municipaux (Paris, Lyon, Marseille)
+            if row.get('typecom') in ('COM', 'ARM'):
+                names[row['com']] = row['libelle']
+
+    communes = set()
+    for row in _read_semicolon_csv(postal_codes_path):
+        code_insee = row.get('code_commune_insee', '')
+        code_postal = row.get('code_postal', '').zfill(5)
+        nom = names.get(code_insee) or row.get('nom_de_la_commune', '').title()
+        if code_insee and code_postal.isdigit() and nom:
+            communes.add((code_postal, code_insee, nom))
+
+    return _write_commune_index(communes, output_path)
+
+def build_commune_index_from_data_france(data_dir, output_path=COMMUNES_PATH):
+    """
+    Produit le fichier compact des communes à partir des extraits du paquet data-france
+    (code officiel géographique de l'INSEE et base des codes postaux de La Poste).
+
+    Args:
+        data_dir (str): Dossier data_france/data (communes.csv.lzma, codes_postaux.csv.lzma,
+            codes_postaux_communes.csv.lzma)
+        output_path (str): Fichier produit (CSV gzip : code_postal;code_insee;commune)
+
+    Returns:
+        int: Nombre de couples (code postal, commune) écrits
+    """
+    def read_lzma_csv(name):
+        with lzma.open(os.path.join(data_dir, name), 'rt', encoding='utf-8', newline='') as f:
+            yield from csv.DictReader(f)
+
+    # Le fichier des communes contient les contours géographiques : champs très longs
+    csv.field_size_limit(1 << 30)
+    names = {row['id']: (row['code'], row['nom']) for row in read_lzma_csv('communes.csv.lzma')
+             if row['type'] in ('COM', 'ARM')}
+    postal_codes = {row['id']: row['code'] for row in read_lzma_csv('codes_postaux.csv.lzma')}
+
+    communes = set()
+    for row in read_lzma_csv('codes_postaux_communes.csv.lzma'):
+        commune = names.get(row['commune_id'])
+        code_postal = postal_codes.get(row['codepostal_id'])
+        if commune and code_postal:
+            communes.add((code_postal, *commune))
+
+    return _write_commune_index(communes, output_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index des codes postaux et des communes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Construire data/communes_index.csv.gz")
+    build.add_argument("postal_codes", help="Base officielle des codes postaux de La Poste (CSV)")
+    build.add_argument("--cog", help="Code officiel géographique de l'INSEE (CSV des communes)")
+    build.add_argument("--output", default=COMMUNES_PATH, help="Fichier produit")
+    build_data_france = subparsers.add_parser("build-data-france",
+                                              help="Construire data/communes_index.csv.gz depuis le paquet data-france")
+    build_data_france.add_argument("data_dir", help="Dossier data_france/data")
+    build_data_france.add_argument("--output", default=COMMUNES_PATH, help="Fichier produit")
+    args = parser.parse_args()
+
+    if args.command == "build-data-france":
+        build_commune_index_from_data_france(args.data_dir, args.output)
+    else:
+        build_commune_index(args.postal_codes, args.output, args.cog)
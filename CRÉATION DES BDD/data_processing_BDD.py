@@ -9,6 +9,19 @@ import os
 from dotenv import load_dotenv
 from datetime import datetime
 
+from cleaning import (
+    clean_dpe_letter_series,
+    clean_dpe_value_series,
+    clean_phone_series,
+    clean_postal_code_series,
+    clean_price_series,
+    clean_rooms_series,
+    clean_siret_series,
+    clean_surface_series,
+    extract_department_series,
+)
+from migrate import MigrationError, apply_migrations
+
 # Charger les variables d'environnement
 load_dotenv()
 
@@ -31,8 +44,11 @@ def create_mysql_connection():
         # Se reconnecter avec la base de données spécifiée
         connection.database = "immobilier_fnaim"
         
+        # Création ou mise à jour du schéma (voir migrations/)
+        apply_migrations(connection)
+        
         return connection
-    except mysql.connector.Error as e:
+    except (mysql.connector.Error, MigrationError) as e:
         print(f"Erreur de connexion à MySQL: {e}")
         return None
 
@@ -59,151 +75,6 @@ def create_mongodb_connection():
         print(f"Erreur de connexion à MongoDB: {e}")
         return None, None
 
-# Fonctions de nettoyage des données pour les annonces
-def clean_price(price_str):
-    """Nettoie et convertit une chaîne de prix en valeur numérique."""
-    if pd.isna(price_str) or price_str == '':
-        return None
-    
-    # Extraction des chiffres uniquement
-    if isinstance(price_str, str):
-        price_digits = re.sub(r'[^\d]', '', price_str)
-        if price_digits:
-            return int(price_digits)
-    elif isinstance(price_str, (int, float)):
-        return price_str
-    
-    return None
-
-def clean_surface(surface_str):
-    """Nettoie et convertit une chaîne de surface en valeur numérique."""
-    if pd.isna(surface_str) or surface_str == '':
-        return None
-    
-    if isinstance(surface_str, (int, float)):
-        return float(surface_str)
-    
-    # Extraction des chiffres avec virgule ou point
-    if isinstance(surface_str, str):
-        match = re.search(r'(\d+[.,]?\d*)', surface_str.replace(',', '.'))
-        if match:
-            return float(match.group(1).replace(',', '.'))
-    
-    return None
-
-def clean_rooms(rooms_str):
-    """Nettoie et convertit une chaîne de nombre de pièces en valeur numérique."""
-    if pd.isna(rooms_str) or rooms_str == '':
-        return None
-    
-    if isinstance(rooms_str, (int, float)):
-        return int(rooms_str)
-    
-    # Extraction des chiffres uniquement
-    if isinstance(rooms_str, str):
-        match = re.search(r'(\d+)', rooms_str)
-        if match:
-            return int(match.group(1))
-    
-    return None
-
-def clean_postal_code(postal_code):
-    """Nettoie et valide un code postal français."""
-    if pd.isna(postal_code) or postal_code == '':
-        return None
-    
-    if isinstance(postal_code, int):
-        postal_code = str(postal_code)
-    
-    if isinstance(postal_code, str):
-        # Extraction d'un code postal à 5 chiffres
-        match = re.search(r'(\d{5})', postal_code)
-        if match:
-            return match.group(1)
-    
-    return None
-
-def extract_department(postal_code):
-    """Extrait le département à partir du code postal."""
-    if pd.isna(postal_code) or postal_code == '':
-        return None
-    
-    postal_code = str(postal_code)
-    
-    # Cas particuliers pour les DOM-TOM
-    if postal_code.startswith('97'):
-        return postal_code[:3]
-    # Cas particulier pour la Corse
-    elif postal_code.startswith('20'):
-        if int(postal_code) >= 20200:
-            return '2B'  # Haute-Corse
-        else:
-            return '2A'  # Corse-du-Sud
-    # Cas général
-    else:
-        return postal_code[:2]
-
-def clean_dpe_value(dpe_str):
-    """Nettoie et convertit une valeur DPE en valeur numérique."""
-    if pd.isna(dpe_str) or dpe_str == '':
-        return None
-    
-    if isinstance(dpe_str, (int, float)):
-        return int(dpe_str)
-    
-    if isinstance(dpe_str, str):
-        # Extraction des chiffres uniquement
-        match = re.search(r'(\d+)', dpe_str)
-        if match:
-            return int(match.group(1))
-    
-    return None
-
-def clean_dpe_letter(dpe_str):
-    """Extrait la lettre de classification DPE."""
-    if pd.isna(dpe_str) or dpe_str == '':
-        return None
-    
-    if isinstance(dpe_str, str):
-        # Extraction d'une lettre de A à G
-        match = re.search(r'[A-G]', dpe_str.upper())
-        if match:
-            return match.group(0)
-    
-    return None
-
-def clean_phone(phone_str):
-    """Nettoie et formate un numéro de téléphone."""
-    if pd.isna(phone_str) or phone_str == '':
-        return None
-    
-    if isinstance(phone_str, (int, float)):
-        phone_str = str(int(phone_str))
-    
-    if isinstance(phone_str, str):
-        # Extraction des chiffres uniquement
-        digits = re.sub(r'[^\d]', '', phone_str)
-        if len(digits) >= 10:
-            return digits[:10]  # Garder les 10 premiers chiffres
-    
-    return None
-
-def clean_siret(siret_str):
-    """Nettoie et valide un numéro SIRET."""
-    if pd.isna(siret_str) or siret_str == '':
-        return None
-    
-    if isinstance(siret_str, (int, float)):
-        siret_str = str(int(siret_str))
-    
-    if isinstance(siret_str, str):
-        # Extraction des chiffres uniquement
-        digits = re.sub(r'[^\d]', '', siret_str)
-        if len(digits) == 14:  # Un SIRET valide a 14 chiffres
-            return digits
-    
-    return None
-
 # Prétraitement des données d'annonces
 def preprocess_annonces_dataframe(df):
     """Prétraite le DataFrame d'annonces avant insertion dans les bases de données."""
@@ -212,33 +83,33 @@ def preprocess_annonces_dataframe(df):
     
     # Nettoyage des colonnes principales
     if 'prix' in processed_df.columns:
-        processed_df['prix'] = processed_df['prix'].apply(clean_price)
+        processed_df['prix'] = clean_price_series(processed_df['prix'])
     
     if 'surface' in processed_df.columns:
-        processed_df['surface'] = processed_df['surface'].apply(clean_surface)
+        processed_df['surface'] = clean_surface_series(processed_df['surface'])
     
     if 'nb_pieces' in processed_df.columns:
-        processed_df['nb_pieces'] = processed_df['nb_pieces'].apply(clean_rooms)
+        processed_df['nb_pieces'] = clean_rooms_series(processed_df['nb_pieces'])
     
     if 'nb_chambres' in processed_df.columns:
-        processed_df['nb_chambres'] = processed_df['nb_chambres'].apply(clean_rooms)
+        processed_df['nb_chambres'] = clean_rooms_series(processed_df['nb_chambres'])
     
     if 'code_postal' in processed_df.columns:
-        processed_df['code_postal'] = processed_df['code_postal'].apply(clean_postal_code)
-        processed_df['departement'] = processed_df['code_postal'].apply(extract_department)
+        processed_df['code_postal'] = clean_postal_code_series(processed_df['code_postal'])
+        processed_df['departement'] = extract_department_series(processed_df['code_postal'])
     
     # Nettoyage des données DPE/GES
     if 'dpe_consumption' in processed_df.columns:
-        processed_df['dpe_consumption'] = processed_df['dpe_consumption'].apply(clean_dpe_value)
+        processed_df['dpe_consumption'] = clean_dpe_value_series(processed_df['dpe_consumption'])
     
     if 'ges_emission' in processed_df.columns:
-        processed_df['ges_emission'] = processed_df['ges_emission'].apply(clean_dpe_value)
+        processed_df['ges_emission'] = clean_dpe_value_series(processed_df['ges_emission'])
     
     if 'dpe_rating' in processed_df.columns:
-        processed_df['dpe_rating'] = processed_df['dpe_rating'].apply(clean_dpe_letter)
+        processed_df['dpe_rating'] = clean_dpe_letter_series(processed_df['dpe_rating'])
     
     if 'ges_rating' in processed_df.columns:
-        processed_df['ges_rating'] = processed_df['ges_rating'].apply(clean_dpe_letter)
+        processed_df['ges_rating'] = clean_dpe_letter_series(processed_df['ges_rating'])
     
     # Calcul du prix au m²
     if 'prix' in processed_df.columns and 'surface' in processed_df.columns:
@@ -273,14 +144,15 @@ def preprocess_agences_dataframe(df):
         processed_df['agency_id'] = processed_df['agency_id'].apply(lambda x: int(x) if pd.notna(x) and x != '' else None)
     
     if 'agency_phone' in processed_df.columns:
-        processed_df['agency_phone'] = processed_df['agency_phone'].apply(clean_phone)
+        processed_df['agency_phone'] = clean_phone_series(processed_df['agency_phone'])
     
     if 'agency_siret' in processed_df.columns:
-        processed_df['agency_siret'] = processed_df['agency_siret'].apply(clean_siret)
+        processed_df['agency_siret'] = clean_siret_series(processed_df['agency_siret'])
     
     # Conversion des dates
-    if 'date_scrape' in processed_df.columns:
-        processed_df['date_scrape'] = pd.to_datetime(processed_df['date_scrape'], errors='coerce')
+    for col in ['date_scrape', 'details_fetched_at']:
+        if col in processed_df.columns:
+            processed_df[col] = pd.to_datetime(processed_df[col], errors='coerce')
     
     # Nettoyage des chaînes de caractères
     for col in processed_df.columns:
@@ -305,32 +177,6 @@ def insert_annonces_into_mysql(df, connection):
     try:
         cursor = connection.cursor()
         
-        # Création de la table si elle n'existe pas
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS annonces (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            titre VARCHAR(255),
-            prix DECIMAL(12, 2),
-            surface DECIMAL(8, 2),
-            nb_pieces INT,
-            nb_chambres INT,
-            type_habitation VARCHAR(50),
-            code_postal VARCHAR(10),
-            departement VARCHAR(3),
-            ville VARCHAR(100),
-            dpe_consumption INT,
-            dpe_rating CHAR(1),
-            ges_emission INT,
-            ges_rating CHAR(1),
-            prix_m2 DECIMAL(10, 2),
-            date_publication DATE,
-            reference VARCHAR(50),
-            url VARCHAR(255),
-            agency_id INT,
-            UNIQUE KEY unique_annonce (reference)
-        )
-        ''')
-        
         # Compteurs pour le suivi
         records_processed = 0
         records_inserted = 0
@@ -427,23 +273,6 @@ def insert_agences_into_mysql(df, connection):
     try:
         cursor = connection.cursor()
         
-        # Création de la table si elle n'existe pas
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS agences (
-            id INT PRIMARY KEY,
-            nom VARCHAR(255),
-            adresse TEXT,
-            code_postal VARCHAR(10),
-            ville VARCHAR(100),
-            telephone VARCHAR(20),
-            siret VARCHAR(14),
-            carte_pro VARCHAR(50),
-            representant_legal VARCHAR(255),
-            url VARCHAR(255),
-            date_scrape DATETIME
-        )
-        ''')
-        
         # Compteurs pour le suivi
         records_processed = 0
         records_inserted = 0
@@ -476,14 +305,16 @@ def insert_agences_into_mysql(df, connection):
                     row.get('agency_card_number', None),
                     row.get('agency_legal_reps', None),
                     row.get('agency_url', None),
-                    row.get('date_scrape', None)
+                    row.get('date_scrape', None),
+                    row.get('details_fetched_at', None)
                 )
                 
                 # Requête d'insertion
                 query = '''
                 INSERT INTO agences 
-                (id, nom, adresse, code_postal, ville, telephone, siret, carte_pro, representant_legal, url, date_scrape)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                (id, nom, adresse, code_postal, ville, telephone, siret, carte_pro, representant_legal, url, date_scrape,
+                details_fetched_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 ON DUPLICATE KEY UPDATE
                 nom = VALUES(nom),
                 adresse = VALUES(adresse),
@@ -494,7 +325,8 @@ def insert_agences_into_mysql(df, connection):
                 carte_pro = VALUES(carte_pro),
                 representant_legal = VALUES(representant_legal),
                 url = VALUES(url),
-                date_scrape = VALUES(date_scrape)
+                date_scrape = VALUES(date_scrape),
+                details_fetched_at = VALUES(details_fetched_at)
                 '''
                 
                 cursor.execute(query, data)
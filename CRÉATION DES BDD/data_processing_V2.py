@@ -6,11 +6,56 @@ import re
 import json
 import os
 from dotenv import load_dotenv
-from datetime import datetime
+
+from chunked_ingestion import ingest_in_chunks
+from cleaning import (
+    clean_dpe_letter_series,
+    clean_dpe_value_series,
+    clean_phone_series,
+    clean_price_series,
+    clean_rooms_series,
+    clean_siret_series,
+    clean_surface_series,
+    extract_department_series,
+    extract_location_series,
+)
+from migrate import MigrationError, apply_migrations
+from mongodb_delta_loader import delta_upsert
+from mysql_bulk_loader import bulk_insert_annonces, bulk_upsert_agences
+from sink_fanout import load_in_parallel
 
 # Charger les variables d'environnement
 load_dotenv()
 
+# Lecture des fichiers produits par le scraper
+def read_scraper_output(file_path):
+    """
+    Lit un fichier de sortie du scraper : CSV, ou Parquet / Arrow IPC typé
+    (voir SCRAPPING/SCRIPT_OK/fnaim_output.py), lu par memory-mapping sans re-parsing.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in ('.parquet', '.arrow'):
+        return pd.read_csv(file_path)
+    
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow est requis pour lire les fichiers Parquet/Arrow : pip install pyarrow")
+    
+    if extension == '.parquet':
+        table = pq.read_table(file_path, memory_map=True)
+    else:
+        with pa.memory_map(file_path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas()
+
+def to_document_value(value):
+    """Valeur d'un champ pour MongoDB : listes (ex: images) conservées, NaN convertis en None."""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return list(value)
+    return None if pd.isna(value) else value
+
 # Configuration des connexions aux bases de données
 def create_mysql_connection():
     """Établit une connexion à la base de données MySQL."""
@@ -30,8 +75,11 @@ def create_mysql_connection():
         # Se reconnecter avec la base de données spécifiée
         connection.database = "immobilier_fnaim"
         
+        # Création ou mise à jour du schéma (voir migrations/)
+        apply_migrations(connection)
+        
         return connection
-    except mysql.connector.Error as e:
+    except (mysql.connector.Error, MigrationError) as e:
         print(f"Erreur de connexion à MySQL: {e}")
         return None
 
@@ -58,196 +106,7 @@ def create_mongodb_connection():
         print(f"Erreur de connexion à MongoDB: {e}")
         return None, None
 
-# Fonctions de nettoyage des données pour les annonces
-def clean_price(price_str):
-    """Nettoie et convertit une chaîne de prix en valeur numérique."""
-    if pd.isna(price_str) or price_str == '':
-        return None
-    
-    # Extraction des chiffres uniquement
-    if isinstance(price_str, str):
-        price_digits = re.sub(r'[^\d]', '', price_str)
-        if price_digits:
-            return int(price_digits)
-    elif isinstance(price_str, (int, float)):
-        return price_str
-    
-    return None
-
-def clean_surface(surface_str):
-    """Nettoie et convertit une chaîne de surface en valeur numérique."""
-    if pd.isna(surface_str) or surface_str == '':
-        return None
-    
-    if isinstance(surface_str, (int, float)):
-        return float(surface_str)
-    
-    # Extraction des chiffres avec virgule ou point
-    if isinstance(surface_str, str):
-        match = re.search(r'(\d+[.,]?\d*)', surface_str.replace(',', '.'))
-        if match:
-            return float(match.group(1).replace(',', '.'))
-    
-    return None
-
-def clean_rooms(rooms_str):
-    """Nettoie et convertit une chaîne de nombre de pièces en valeur numérique."""
-    if pd.isna(rooms_str) or rooms_str == '':
-        return None
-    
-    if isinstance(rooms_str, (int, float)):
-        return int(rooms_str)
-    
-    # Extraction des chiffres uniquement
-    if isinstance(rooms_str, str):
-        match = re.search(r'(\d+)', rooms_str)
-        if match:
-            return int(match.group(1))
-    
-    return None
-
-def clean_postal_code(postal_code):
-    """Nettoie et valide un code postal français."""
-    if pd.isna(postal_code) or postal_code == '':
-        return None
-    
-    if isinstance(postal_code, int):
-        postal_code = str(postal_code)
-    
-    if isinstance(postal_code, str):
-        # Extraction d'un code postal à 5 chiffres
-        match = re.search(r'(\d{5})', postal_code)
-        if match:
-            return match.group(1)
-    
-    return None
-
-def extract_department(postal_code):
-    """Extrait le département à partir du code postal."""
-    if pd.isna(postal_code) or postal_code == '':
-        return None
-    
-    postal_code = str(postal_code)
-    
-    # Cas particuliers pour les DOM-TOM
-    if postal_code.startswith('97'):
-        return postal_code[:3]
-    # Cas particulier pour la Corse
-    elif postal_code.startswith('20'):
-        if int(postal_code) >= 20200:
-            return '2B'  # Haute-Corse
-        else:
-            return '2A'  # Corse-du-Sud
-    # Cas général
-    else:
-        return postal_code[:2]
-
-def clean_dpe_value(dpe_str):
-    """Nettoie et convertit une valeur DPE en valeur numérique."""
-    if pd.isna(dpe_str) or dpe_str == '':
-        return None
-    
-    if isinstance(dpe_str, (int, float)):
-        return int(dpe_str)
-    
-    if isinstance(dpe_str, str):
-        # Extraction des chiffres uniquement
-        match = re.search(r'(\d+)', dpe_str)
-        if match:
-            return int(match.group(1))
-    
-    return None
-
-def clean_dpe_letter(dpe_str):
-    """Extrait la lettre de classification DPE."""
-    if pd.isna(dpe_str) or dpe_str == '':
-        return None
-    
-    if isinstance(dpe_str, str):
-        # Extraction d'une lettre de A à G
-        match = re.search(r'[A-G]', dpe_str.upper())
-        if match:
-            return match.group(0)
-    
-    return None
-
-def clean_phone(phone_str):
-    """Nettoie et formate un numéro de téléphone."""
-    if pd.isna(phone_str) or phone_str == '':
-        return None
-    
-    if isinstance(phone_str, (int, float)):
-        phone_str = str(int(phone_str))
-    
-    if isinstance(phone_str, str):
-        # Extraction des chiffres uniquement
-        digits = re.sub(r'[^\d]', '', phone_str)
-        if len(digits) >= 10:
-            return digits[:10]  # Garder les 10 premiers chiffres
-    
-    return None
-
-def clean_siret(siret_str):
-    """Nettoie et valide un numéro SIRET."""
-    if pd.isna(siret_str) or siret_str == '':
-        return None
-    
-    if isinstance(siret_str, (int, float)):
-        siret_str = str(int(siret_str))
-    
-    if isinstance(siret_str, str):
-        # Extraction des chiffres uniquement
-        digits = re.sub(r'[^\d]', '', siret_str)
-        if len(digits) == 14:  # Un SIRET valide a 14 chiffres
-            return digits
-    
-    return None
-
-def extract_location_from_url(url):
-    """
-    Extrait le code postal et la ville à partir de l'URL de l'annonce.
-    Exemples d'URL:
-    - https://www.fnaim.fr/annonce-immobiliere/52367367/4333-acheter-appartement-rennes-35000.htm
-    - https://www.fnaim.fr/annonce-immobiliere/52203849/4333-acheter-appartement-ille-et-vilaine-35.htm
-    """
-    if not url or not isinstance(url, str):
-        return None, None, None
-    
-    # Pattern pour extraire le code postal à la fin de l'URL (ex: rennes-35000.htm)
-    cp_pattern = r'[-/](\d{5})\.htm$'
-    cp_match = re.search(cp_pattern, url)
-    
-    if cp_match:
-        # Cas simple: code postal à 5 chiffres trouvé à la fin
-        code_postal = cp_match.group(1)
-        departement = code_postal[:2]
-        
-        # Extraction de la ville
-        ville_pattern = r'[-/]([a-zA-Z-]+)-\d{5}\.htm$'
-        ville_match = re.search(ville_pattern, url)
-        ville = ville_match.group(1).replace('-', ' ').title() if ville_match else None
-        
-        return code_postal, departement, ville
-    else:
-        # Cas plus complexe: chercher un département à 2 chiffres à la fin (ex: ille-et-vilaine-35.htm)
-        dept_pattern = r'[-/](\d{1,2})\.htm$'
-        dept_match = re.search(dept_pattern, url)
-        
-        if dept_match:
-            departement = dept_match.group(1)
-            # Pas de code postal précis, on utilise le département suivi de 000
-            code_postal = f"{departement.zfill(2)}000"
-            
-            # Extraction de la région/ville (si présente)
-            region_pattern = r'[-/]([a-zA-Z-]+)-\d{1,2}\.htm$'
-            region_match = re.search(region_pattern, url)
-            ville = region_match.group(1).replace('-', ' ').title() if region_match else None
-            
-            return code_postal, departement, ville
-    
-    # Si aucun pattern ne correspond
-    return None, None, None
-
+# Prétraitement des données d'annonces
 def preprocess_annonces_dataframe(df):
     """Prétraite le DataFrame d'annonces avant insertion dans les bases de données."""
     # Copie du DataFrame pour éviter de modifier l'original
@@ -255,26 +114,22 @@ def preprocess_annonces_dataframe(df):
     
     # Nettoyage des colonnes principales
     if 'prix' in processed_df.columns:
-        processed_df['prix'] = processed_df['prix'].apply(clean_price)
+        processed_df['prix'] = clean_price_series(processed_df['prix'])
     
     if 'surface' in processed_df.columns:
-        processed_df['surface'] = processed_df['surface'].apply(clean_surface)
+        processed_df['surface'] = clean_surface_series(processed_df['surface'])
     
     if 'nb_pieces' in processed_df.columns:
-        processed_df['nb_pieces'] = processed_df['nb_pieces'].apply(clean_rooms)
+        processed_df['nb_pieces'] = clean_rooms_series(processed_df['nb_pieces'])
     
     if 'nb_chambres' in processed_df.columns:
-        processed_df['nb_chambres'] = processed_df['nb_chambres'].apply(clean_rooms)
+        processed_df['nb_chambres'] = clean_rooms_series(processed_df['nb_chambres'])
     
     # Extraction du code postal et du département à partir de l'URL
     if 'url' in processed_df.columns:
-        # Créer une fonction temporaire pour appliquer extract_location_from_url et obtenir les 3 valeurs
-        def extract_all_location(url):
-            cp, dept, ville = extract_location_from_url(url)
-            return pd.Series([cp, dept, ville])
-        
-        # Appliquer la fonction et assigner les résultats aux colonnes correspondantes
-        processed_df[['code_postal', 'departement', 'ville']] = processed_df['url'].apply(extract_all_location)
+        # Extraction vectorisée sur toute la colonne
+        locations = extract_location_series(processed_df['url'])
+        processed_df[['code_postal', 'departement', 'ville']] = locations
         
         # Backup: si code_postal est vide mais existe dans les données originales, le conserver
         if 'code_postal' in df.columns:
@@ -282,20 +137,20 @@ def preprocess_annonces_dataframe(df):
             processed_df.loc[mask, 'code_postal'] = df.loc[mask, 'code_postal']
             
             # Recalculer le département à partir du code postal de backup
-            processed_df.loc[mask, 'departement'] = processed_df.loc[mask, 'code_postal'].apply(extract_department)
+            processed_df.loc[mask, 'departement'] = extract_department_series(processed_df.loc[mask, 'code_postal'])
     
     # Nettoyage des données DPE/GES
     if 'dpe_consumption' in processed_df.columns:
-        processed_df['dpe_consumption'] = processed_df['dpe_consumption'].apply(clean_dpe_value)
+        processed_df['dpe_consumption'] = clean_dpe_value_series(processed_df['dpe_consumption'])
     
     if 'ges_emission' in processed_df.columns:
-        processed_df['ges_emission'] = processed_df['ges_emission'].apply(clean_dpe_value)
+        processed_df['ges_emission'] = clean_dpe_value_series(processed_df['ges_emission'])
     
     if 'dpe_rating' in processed_df.columns:
-        processed_df['dpe_rating'] = processed_df['dpe_rating'].apply(clean_dpe_letter)
+        processed_df['dpe_rating'] = clean_dpe_letter_series(processed_df['dpe_rating'])
     
     if 'ges_rating' in processed_df.columns:
-        processed_df['ges_rating'] = processed_df['ges_rating'].apply(clean_dpe_letter)
+        processed_df['ges_rating'] = clean_dpe_letter_series(processed_df['ges_rating'])
     
     # Calcul du prix au m²
     if 'prix' in processed_df.columns and 'surface' in processed_df.columns:
@@ -327,14 +182,15 @@ def preprocess_agences_dataframe(df):
         processed_df['agency_id'] = processed_df['agency_id'].apply(lambda x: int(x) if pd.notna(x) and x != '' else None)
     
     if 'agency_phone' in processed_df.columns:
-        processed_df['agency_phone'] = processed_df['agency_phone'].apply(clean_phone)
+        processed_df['agency_phone'] = clean_phone_series(processed_df['agency_phone'])
     
     if 'agency_siret' in processed_df.columns:
-        processed_df['agency_siret'] = processed_df['agency_siret'].apply(clean_siret)
+        processed_df['agency_siret'] = clean_siret_series(processed_df['agency_siret'])
     
     # Conversion des dates
-    if 'date_scrape' in processed_df.columns:
-        processed_df['date_scrape'] = pd.to_datetime(processed_df['date_scrape'], errors='coerce')
+    for col in ['date_scrape', 'details_fetched_at']:
+        if col in processed_df.columns:
+            processed_df[col] = pd.to_datetime(processed_df[col], errors='coerce')
     
     # Remplacer toutes les valeurs NaN par None pour éviter les problèmes avec MySQL
     for col in processed_df.columns:
@@ -347,8 +203,13 @@ def preprocess_agences_dataframe(df):
     return processed_df
 
 # Fonctions d'insertion dans les bases de données pour les annonces
-def insert_annonces_into_mysql(df, connection):
-    """Insère les données d'annonces dans la base MySQL."""
+def insert_annonces_into_mysql(df, connection, method="executemany", batch_size=1000):
+    """
+    Insère les données d'annonces dans la base MySQL.
+    method: "executemany" (lots de batch_size lignes), "load_data" (LOAD DATA LOCAL INFILE,
+    voir mysql_bulk_loader) ou "per_row" (une requête par ligne).
+    En chargement en masse, retourne False si des lignes n'ont pas pu être chargées.
+    """
     if connection is None:
         print("Pas de connexion MySQL disponible.")
         return False
@@ -356,31 +217,14 @@ def insert_annonces_into_mysql(df, connection):
     try:
         cursor = connection.cursor()
         
-        # Création de la table avec un champ département plus grand (VARCHAR(10) au lieu de VARCHAR(3))
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS annonces (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            titre VARCHAR(255),
-            prix DECIMAL(12, 2),
-            surface DECIMAL(8, 2),
-            nb_pieces INT,
-            nb_chambres INT,
-            type_habitation VARCHAR(50),
-            code_postal VARCHAR(10),
-            departement VARCHAR(10),
-            ville VARCHAR(100),
-            dpe_consumption INT,
-            dpe_rating CHAR(1),
-            ges_emission INT,
-            ges_rating CHAR(1),
-            prix_m2 DECIMAL(10, 2),
-            date_publication DATE,
-            reference VARCHAR(50),
-            url VARCHAR(255),
-            agency_id INT,
-            UNIQUE KEY unique_annonce (reference)
-        )
-        ''')
+        # Chargement en masse
+        if method != "per_row":
+            stats = bulk_insert_annonces(df, connection, batch_size=batch_size, method=method)
+            # Chargement partiel : des lignes ont été écartées lors de la reprise ligne par ligne
+            if stats['errors']:
+                print(f"MySQL Annonces - Chargement partiel: {stats['errors']} ligne(s) non chargée(s) sur {stats['rows']}")
+                return False
+            return True
         
         # Compteurs pour le suivi
         records_processed = 0
@@ -458,8 +302,12 @@ def insert_annonces_into_mysql(df, connection):
         if 'cursor' in locals() and cursor:
             cursor.close()
 
-def insert_agences_into_mysql(df, connection):
-    """Insère les données d'agences dans la base MySQL."""
+def insert_agences_into_mysql(df, connection, method="staging", batch_size=1000):
+    """
+    Insère les données d'agences dans la base MySQL.
+    method: "staging" (table temporaire puis une seule fusion, voir mysql_bulk_loader)
+    ou "per_row" (une requête par ligne).
+    """
     if connection is None:
         print("Pas de connexion MySQL disponible.")
         return False
@@ -467,22 +315,10 @@ def insert_agences_into_mysql(df, connection):
     try:
         cursor = connection.cursor()
         
-        # Création de la table si elle n'existe pas
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS agences (
-            id INT PRIMARY KEY,
-            nom VARCHAR(255),
-            adresse TEXT,
-            code_postal VARCHAR(10),
-            ville VARCHAR(100),
-            telephone VARCHAR(20),
-            siret VARCHAR(14),
-            carte_pro VARCHAR(50),
-            representant_legal VARCHAR(255),
-            url VARCHAR(255),
-            date_scrape DATETIME
-        )
-        ''')
+        # Chargement par table temporaire
+        if method == "staging":
+            bulk_upsert_agences(df, connection, batch_size=batch_size)
+            return True
         
         # Compteurs pour le suivi
         records_processed = 0
@@ -517,7 +353,8 @@ def insert_agences_into_mysql(df, connection):
                     ('agency_card_number', row.get('agency_card_number', None)),
                     ('agency_legal_reps', row.get('agency_legal_reps', None)),
                     ('agency_url', row.get('agency_url', None)),
-                    ('date_scrape', row.get('date_scrape', None))
+                    ('date_scrape', row.get('date_scrape', None)),
+                    ('details_fetched_at', row.get('details_fetched_at', None))
                 ]:
                     # Convertir explicitement les NaN en None
                     if pd.isna(value):
@@ -527,8 +364,9 @@ def insert_agences_into_mysql(df, connection):
                 # Requête d'insertion
                 query = '''
                 INSERT INTO agences 
-                (id, nom, adresse, code_postal, ville, telephone, siret, carte_pro, representant_legal, url, date_scrape)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                (id, nom, adresse, code_postal, ville, telephone, siret, carte_pro, representant_legal, url, date_scrape,
+                details_fetched_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 ON DUPLICATE KEY UPDATE
                 nom = VALUES(nom),
                 adresse = VALUES(adresse),
@@ -539,7 +377,8 @@ def insert_agences_into_mysql(df, connection):
                 carte_pro = VALUES(carte_pro),
                 representant_legal = VALUES(representant_legal),
                 url = VALUES(url),
-                date_scrape = VALUES(date_scrape)
+                date_scrape = VALUES(date_scrape),
+                details_fetched_at = VALUES(details_fetched_at)
                 '''
                 
                 cursor.execute(query, tuple(data))
@@ -572,8 +411,12 @@ def insert_agences_into_mysql(df, connection):
         if 'cursor' in locals() and cursor:
             cursor.close()
 
-def insert_annonces_into_mongodb(df, db):
-    """Insère les données d'annonces dans la base MongoDB."""
+def insert_annonces_into_mongodb(df, db, batch_size=1000):
+    """
+    Insère les données d'annonces dans la base MongoDB.
+    Seuls les documents nouveaux ou modifiés (champ content_hash) sont écrits, voir mongodb_delta_loader.
+    Retourne False si des documents n'ont pas pu être écrits.
+    """
     if db is None:
         print("Pas de connexion MongoDB disponible.")
         return False
@@ -589,10 +432,7 @@ def insert_annonces_into_mongodb(df, db):
         documents = []
         for record in records:
             # Conversion des valeurs NaN en None
-            document = {k: (None if pd.isna(v) else v) for k, v in record.items()}
-            
-            # Ajout d'un timestamp de mise à jour
-            document['updated_at'] = datetime.now()
+            document = {k: to_document_value(v) for k, v in record.items()}
             
             # Utilisation de la référence comme _id si disponible
             if 'reference' in document and document['reference']:
@@ -600,16 +440,13 @@ def insert_annonces_into_mongodb(df, db):
             
             documents.append(document)
         
-        # Insertion des documents
+        # Écriture des seuls documents nouveaux ou modifiés
         if documents:
-            result = collection.bulk_write([
-                pymongo.ReplaceOne(
-                    {'_id': doc['_id']}, doc, upsert=True
-                ) if '_id' in doc else pymongo.InsertOne(doc)
-                for doc in documents
-            ])
-            
-            print(f"MongoDB Annonces - Importation terminée. Insérés: {result.upserted_count}, Modifiés: {result.modified_count}")
+            stats = delta_upsert(collection, documents, batch_size=batch_size, label="MongoDB Annonces")
+            # Chargement partiel : des écritures du bulk_write ont échoué
+            if stats['errors']:
+                print(f"MongoDB Annonces - Chargement partiel: {stats['errors']} document(s) non écrit(s) sur {stats['documents']}")
+                return False
         else:
             print("Aucun document à insérer dans MongoDB.")
         
@@ -619,8 +456,12 @@ def insert_annonces_into_mongodb(df, db):
         print(f"Erreur MongoDB: {e}")
         return False
 
-def insert_agences_into_mongodb(df, db):
-    """Insère les données d'agences dans la base MongoDB."""
+def insert_agences_into_mongodb(df, db, batch_size=1000):
+    """
+    Insère les données d'agences dans la base MongoDB.
+    Seuls les documents nouveaux ou modifiés (champ content_hash) sont écrits, voir mongodb_delta_loader.
+    Retourne False si des documents n'ont pas pu être écrits.
+    """
     if db is None:
         print("Pas de connexion MongoDB disponible.")
         return False
@@ -636,10 +477,7 @@ def insert_agences_into_mongodb(df, db):
         documents = []
         for record in records:
             # Conversion des valeurs NaN en None
-            document = {k: (None if pd.isna(v) else v) for k, v in record.items()}
-            
-            # Ajout d'un timestamp de mise à jour
-            document['updated_at'] = datetime.now()
+            document = {k: to_document_value(v) for k, v in record.items()}
             
             # Utilisation de l'ID d'agence comme _id si disponible
             if 'agency_id' in document and document['agency_id']:
@@ -647,16 +485,13 @@ def insert_agences_into_mongodb(df, db):
             
             documents.append(document)
         
-        # Insertion des documents
+        # Écriture des seuls documents nouveaux ou modifiés
         if documents:
-            result = collection.bulk_write([
-                pymongo.ReplaceOne(
-                    {'_id': doc['_id']}, doc, upsert=True
-                ) if '_id' in doc else pymongo.InsertOne(doc)
-                for doc in documents
-            ])
-            
-            print(f"MongoDB Agences - Importation terminée. Insérés: {result.upserted_count}, Modifiés: {result.modified_count}")
+            stats = delta_upsert(collection, documents, batch_size=batch_size, label="MongoDB Agences")
+            # Chargement partiel : des écritures du bulk_write ont échoué
+            if stats['errors']:
+                print(f"MongoDB Agences - Chargement partiel: {stats['errors']} document(s) non écrit(s) sur {stats['documents']}")
+                return False
         else:
             print("Aucun document à insérer dans MongoDB.")
         
@@ -666,13 +501,79 @@ def insert_agences_into_mongodb(df, db):
         print(f"Erreur MongoDB: {e}")
         return False
 
+def delete_annonces_from_mysql(urls, connection):
+    """Supprime de MySQL les annonces dont l'URL a disparu des résultats FNAIM."""
+    if connection is None:
+        print("Pas de connexion MySQL disponible.")
+        return False
+    
+    try:
+        cursor = connection.cursor()
+        cursor.executemany("DELETE FROM annonces WHERE url = %s", [(url,) for url in urls])
+        connection.commit()
+        print(f"MySQL Annonces - Suppression terminée. Supprimées: {cursor.rowcount}")
+        return True
+        
+    except mysql.connector.Error as e:
+        print(f"Erreur MySQL: {e}")
+        return False
+    finally:
+        if 'cursor' in locals() and cursor:
+            cursor.close()
+
+def delete_annonces_from_mongodb(urls, db):
+    """Supprime de MongoDB les annonces dont l'URL a disparu des résultats FNAIM."""
+    if db is None:
+        print("Pas de connexion MongoDB disponible.")
+        return False
+    
+    try:
+        result = db["annonces"].delete_many({'url': {'$in': list(urls)}})
+        print(f"MongoDB Annonces - Suppression terminée. Supprimées: {result.deleted_count}")
+        return True
+        
+    except pymongo.errors.PyMongoError as e:
+        print(f"Erreur MongoDB: {e}")
+        return False
+
+def chunk_loaders(mysql_conn, mongo_db, load_mysql, load_mongodb):
+    """
+    Fonctions de chargement par blocs dans MySQL et MongoDB.
+    Lève une ConnectionError si l'une des bases est injoignable : la progression de
+    l'ingestion ne doit avancer que pour des blocs écrits dans les deux bases.
+    """
+    missing = [name for name, connected in (('MySQL', bool(mysql_conn)), ('MongoDB', mongo_db is not None))
+               if not connected]
+    if missing:
+        raise ConnectionError(f"Connexion impossible à {', '.join(missing)} : ingestion par blocs annulée, "
+                              f"aucun bloc validé")
+    return {
+        'MySQL': lambda chunk: load_mysql(chunk, mysql_conn),
+        'MongoDB': lambda chunk: load_mongodb(chunk, mongo_db),
+    }
+
 # Fonction principale pour traiter les annonces
-def process_annonces_data(file_path):
-    """Traite les données d'annonces du fichier CSV et les insère dans les bases de données."""
+def process_annonces_data(file_path, chunksize=None, resume=True):
+    """
+    Traite les données d'annonces du fichier CSV et les insère dans les bases de données.
+    Avec chunksize, le fichier est traité par blocs de chunksize lignes (voir chunked_ingestion) :
+    mémoire bornée, et reprise au dernier bloc chargé si resume est vrai.
+    """
     try:
-        # Lecture du fichier CSV
+        if chunksize:
+            # Connexion aux bases de données
+            mysql_conn = create_mysql_connection()
+            mongo_client, mongo_db = create_mongodb_connection()
+            
+            loaders = chunk_loaders(mysql_conn, mongo_db, insert_annonces_into_mysql, insert_annonces_into_mongodb)
+            
+            print(f"Ingestion par blocs de {chunksize} lignes du fichier d'annonces {file_path}...")
+            return ingest_in_chunks(file_path, preprocess_annonces_dataframe, loaders, chunksize=chunksize,
+                                    resume=resume, label="Annonces")
+        
+        # Lecture du fichier (CSV, ou Parquet/Arrow typé)
         print(f"Lecture du fichier d'annonces {file_path}...")
-        df = pd.read_csv(file_path)
+        df = read_scraper_output(file_path)
         print(f"Fichier chargé avec succès. {len(df)} lignes trouvées.")
         
         # Prétraitement des données
@@ -684,15 +585,14 @@ def process_annonces_data(file_path):
         mysql_conn = create_mysql_connection()
         mongo_client, mongo_db = create_mongodb_connection()
         
-        # Insertion dans MySQL
+        # Insertion simultanée dans MySQL et MongoDB
+        loaders = {}
         if mysql_conn:
-            print("Insertion des annonces dans MySQL...")
-            insert_annonces_into_mysql(processed_df, mysql_conn)
-        
-        # Insertion dans MongoDB
+            loaders['MySQL'] = lambda df: insert_annonces_into_mysql(df, mysql_conn)
         if mongo_db is not None:
-            print("Insertion des annonces dans MongoDB...")
-            insert_annonces_into_mongodb(processed_df, mongo_db)
+            loaders['MongoDB'] = lambda df: insert_annonces_into_mongodb(df, mongo_db)
+        print(f"Insertion des annonces dans {', '.join(loaders) or 'aucune base'}...")
+        load_in_parallel(processed_df, loaders, label="Annonces")
         
         print("Traitement des données d'annonces terminé avec succès.")
         return True
@@ -711,12 +611,27 @@ def process_annonces_data(file_path):
             print("Connexion MongoDB fermée.")
 
 # Fonction principale pour traiter les agences
-def process_agences_data(file_path):
-    """Traite les données d'agences du fichier CSV et les insère dans les bases de données."""
+def process_agences_data(file_path, chunksize=None, resume=True):
+    """
+    Traite les données d'agences du fichier CSV et les insère dans les bases de données.
+    Avec chunksize, le fichier est traité par blocs de chunksize lignes (voir chunked_ingestion) :
+    mémoire bornée, et reprise au dernier bloc chargé si resume est vrai.
+    """
     try:
-        # Lecture du fichier CSV
+        if chunksize:
+            # Connexion aux bases de données
+            mysql_conn = create_mysql_connection()
+            mongo_client, mongo_db = create_mongodb_connection()
+            
+            loaders = chunk_loaders(mysql_conn, mongo_db, insert_agences_into_mysql, insert_agences_into_mongodb)
+            
+            print(f"Ingestion par blocs de {chunksize} lignes du fichier d'agences {file_path}...")
+            return ingest_in_chunks(file_path, preprocess_agences_dataframe, loaders, chunksize=chunksize,
+                                    resume=resume, label="Agences")
+        
+        # Lecture du fichier (CSV, ou Parquet/Arrow typé)
         print(f"Lecture du fichier d'agences {file_path}...")
-        df = pd.read_csv(file_path)
+        df = read_scraper_output(file_path)
         print(f"Fichier chargé avec succès. {len(df)} lignes trouvées.")
         
         # Prétraitement des données
@@ -728,15 +643,14 @@ def process_agences_data(file_path):
         mysql_conn = create_mysql_connection()
         mongo_client, mongo_db = create_mongodb_connection()
         
-        # Insertion dans MySQL
+        # Insertion simultanée dans MySQL et MongoDB
+        loaders = {}
         if mysql_conn:
-            print("Insertion des agences dans MySQL...")
-            insert_agences_into_mysql(processed_df, mysql_conn)
-        
-        # Insertion dans MongoDB
+            loaders['MySQL'] = lambda df: insert_agences_into_mysql(df, mysql_conn)
         if mongo_db is not None:
-            print("Insertion des agences dans MongoDB...")
-            insert_agences_into_mongodb(processed_df, mongo_db)
+            loaders['MongoDB'] = lambda df: insert_agences_into_mongodb(df, mongo_db)
+        print(f"Insertion des agences dans {', '.join(loaders) or 'aucune base'}...")
+        load_in_parallel(processed_df, loaders, label="Agences")
         
         print("Traitement des données d'agences terminé avec succès.")
         return True
@@ -754,20 +668,69 @@ def process_agences_data(file_path):
             mongo_client.close()
             print("Connexion MongoDB fermée.")
 
+# Fonction principale pour traiter les annonces supprimées
+def process_annonces_supprimees(file_path):
+    """
+    Supprime des bases de données les annonces listées dans le fichier CSV
+    produit par un re-crawl incrémental (annonces_supprimees_fnaim.csv).
+    """
+    try:
+        print(f"Lecture du fichier d'annonces supprimées {file_path}...")
+        urls = pd.read_csv(file_path)['url'].dropna().tolist()
+        print(f"Fichier chargé avec succès. {len(urls)} annonces supprimées.")
+        if not urls:
+            return True
+        
+        # Connexion aux bases de données
+        mysql_conn = create_mysql_connection()
+        mongo_client, mongo_db = create_mongodb_connection()
+        
+        if mysql_conn:
+            delete_annonces_from_mysql(urls, mysql_conn)
+        
+        if mongo_db is not None:
+            delete_annonces_from_mongodb(urls, mongo_db)
+        
+        return True
+        
+    except Exception as e:
+        print(f"Erreur lors de la suppression des annonces: {e}")
+        return False
+    finally:
+        # Fermeture des connexions
+        if 'mysql_conn' in locals() and mysql_conn:
+            mysql_conn.close()
+            print("Connexion MySQL fermée.")
+        
+        if 'mongo_client' in locals() and mongo_client:
+            mongo_client.close()
+            print("Connexion MongoDB fermée.")
+
 if __name__ == "__main__":
     # Chemins directs vers les fichiers CSV
     annonces_file_path = r"C:\Users\Utilisateur\Documents\Simplon (Bloc 1)\Estimateur Immobilier\SCRAPPING\SCRIPT_OK\annonces_fnaim.csv"
     agences_file_path = r"C:\Users\Utilisateur\Documents\Simplon (Bloc 1)\Estimateur Immobilier\SCRAPPING\SCRIPT_OK\agences_fnaim.csv"
     
+    # Utiliser la sortie Parquet typée du scraper si elle existe
+    if os.path.exists(annonces_file_path.replace('.csv', '.parquet')):
+        annonces_file_path = annonces_file_path.replace('.csv', '.parquet')
+    if os.path.exists(agences_file_path.replace('.csv', '.parquet')):
+        agences_file_path = agences_file_path.replace('.csv', '.parquet')
+    
     # Vérifier que les fichiers existent
     if not os.path.exists(annonces_file_path):
         print(f"Erreur: Le fichier {annonces_file_path} n'existe pas.")
     else:
-        # Traitement des données d'annonces
-        process_annonces_data(annonces_file_path)
+        # Traitement des données d'annonces, par blocs de 50000 lignes
+        process_annonces_data(annonces_file_path, chunksize=50000)
     
     if not os.path.exists(agences_file_path):
         print(f"Erreur: Le fichier {agences_file_path} n'existe pas.")
     else:
-        # Traitement des données d'agences
-        process_agences_data(agences_file_path)
\ No newline at end of file
+        # Traitement des données d'agences, par blocs de 50000 lignes
+        process_agences_data(agences_file_path, chunksize=50000)
+    
+    # Annonces disparues des résultats depuis le crawl précédent
+    supprimees_file_path = os.path.join(os.path.dirname(annonces_file_path), "annonces_supprimees_fnaim.csv")
+    if os.path.exists(supprimees_file_path):
+        process_annonces_supprimees(supprimees_file_path)
@@ -3,10 +3,13 @@ import pandas as pd
 import mysql.connector
 from mysql.connector import Error
 import os
-import re
 import json
 from dotenv import load_dotenv
 
+from cleaning import POSTAL_CODE_PATTERN
+from migrate import MigrationError, apply_migrations
+from mysql_bulk_loader import bulk_upsert_cities
+
 # Charger les variables d'environnement
 load_dotenv()
 
@@ -24,35 +27,6 @@ def create_connection():
         print(f"Erreur de connexion à MySQL: {e}")
         return None
 
-def create_cities_table(connection):
-    """Crée la table 'cities' si elle n'existe pas déjà."""
-    try:
-        cursor = connection.cursor()
-        
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS cities (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            ville VARCHAR(100) NOT NULL,
-            population INT,
-            surface FLOAT,
-            date VARCHAR(50),
-            densite FLOAT,
-            villes_voisines TEXT,
-            code_postal VARCHAR(10),
-            coordonnees TEXT,
-            demonym VARCHAR(100),
-            region_label VARCHAR(100),
-            UNIQUE KEY unique_city (ville, code_postal)
-        )
-        ''')
-        
-        connection.commit()
-        print("Table 'cities' créée ou déjà existante")
-        return True
-    except Error as e:
-        print(f"Erreur lors de la création de la table: {e}")
-        return False
-
 def preprocess_data(df):
     """Prétraite les données avant insertion dans la base de données."""
     # Copie du DataFrame pour éviter de modifier l'original
@@ -85,10 +59,9 @@ def preprocess_data(df):
     
     # Traitement des codes postaux
     if 'code_postal' in processed_df.columns:
-        # Extraction du premier code postal si plusieurs sont présents
-        processed_df['code_postal'] = processed_df['code_postal'].astype(str).apply(
-            lambda x: re.search(r'\d{5}', x).group(0) if re.search(r'\d{5}', x) else None
-        )
+        # Extraction du premier code postal si plusieurs sont présents (sur toute la colonne)
+        code_postal = processed_df['code_postal'].astype(str).str.extract(POSTAL_CODE_PATTERN.pattern, expand=False)
+        processed_df['code_postal'] = code_postal.astype(object).where(code_postal.notna(), None)
     
     # Traitement des coordonnées
     if 'coordonnees' in processed_df.columns:
@@ -108,8 +81,13 @@ def preprocess_data(df):
     
     return processed_df
 
-def load_city_data(file_path, connection):
-    """Charge les données de city_data.csv dans la table 'cities'."""
+def load_city_data(file_path, connection, method="executemany", batch_size=1000):
+    """
+    Charge les données de city_data.csv dans la table 'cities'.
+    method: "executemany" (lots de batch_size lignes, voir mysql_bulk_loader)
+    ou "per_row" (une requête par ligne).
+    En chargement en masse, retourne False si des lignes n'ont pas pu être chargées.
+    """
     try:
         # Lire le fichier CSV
         df = pd.read_csv(file_path)
@@ -120,6 +98,15 @@ def load_city_data(file_path, connection):
         # Vérifier les colonnes existantes dans le DataFrame
         print(f"Colonnes dans le DataFrame prétraité: {', '.join(processed_df.columns)}")
         
+        # Chargement en masse
+        if method != "per_row":
+            stats = bulk_upsert_cities(processed_df, connection, batch_size=batch_size)
+            # Chargement partiel : des lignes ont été écartées lors de la reprise ligne par ligne
+            if stats['errors']:
+                print(f"MySQL Villes - Chargement partiel: {stats['errors']} ligne(s) non chargée(s) sur {stats['rows']}")
+                return False
+            return True
+        
         # Créer un curseur pour exécuter les requêtes SQL
         cursor = connection.cursor()
         
@@ -206,10 +193,12 @@ if __name__ == "__main__":
         exit(1)
     
     try:
-        # Créer la table si elle n'existe pas
-        if create_cities_table(conn):
-            # Charger les données
-            load_city_data(file_path, conn)
+        # Créer ou mettre à jour le schéma (voir migrations/)
+        apply_migrations(conn)
+        # Charger les données
+        load_city_data(file_path, conn)
+    except (Error, MigrationError) as e:
+        print(f"Erreur lors de la création du schéma: {e}")
     finally:
         # Fermer la connexion
         if conn.is_connected():
@@ -0,0 +1,203 @@
+"""
+Migrations versionnées du schéma MySQL.
+
+Les CREATE TABLE étaient exécutés par les chargeurs eux-mêmes (à chaque appel de
+insert_annonces_into_mysql, insert_agences_into_mysql, create_cities_table et
+create_tables du script DV3F), sans index pour les filtres de l'API. Le schéma
+est désormais décrit par les fichiers migrations/NNNN_nom.sql, appliqués une
+seule fois et dans l'ordre. Chaque migration appliquée est enregistrée dans la
+table schema_migrations (version, nom, empreinte du fichier, date).
+
+Un verrou MySQL (GET_LOCK) évite que deux chargeurs lancés en même temps
+appliquent les mêmes migrations.
+
+Usage :
+    python migrate.py [status|up] [--database NOM]
+"""
+import argparse
+import datetime
+import hashlib
+import os
+import re
+
+import mysql.connector
+from dotenv import load_dotenv
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d{4})_(\w+)\.sql$')
+LOCK_NAME = 'schema_migrations'
+LOCK_TIMEOUT = 60
+
+class MigrationError(Exception):
+    """Migrations incohérentes (numéros en double, verrou non obtenu)."""
+
+####
+#    FICHIERS DE MIGRATION    #
+####
+def list_migrations(directory=MIGRATIONS_DIR):
+    """Migrations du répertoire, triées : liste de (version, nom, chemin)."""
+    migrations = {}
+    for file_name in os.listdir(directory):
+        match = MIGRATION_FILE_PATTERN.match(file_name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Deux migrations portent le numéro {version:04d}: "
+                                 f"{os.path.basename(migrations[version][2])} et {file_name}")
+        migrations[version] = (version, match.group(2), os.path.join(directory, file_name))
+    return [migrations[version] for version in sorted(migrations)]
+
+def file_checksum(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def split_statements(sql):
+    """Découpe un script SQL en requêtes (séparées par ';', hors chaînes et commentaires '--')."""
+    statements = []
+    current = []
+    quote = None
+    i = 0
+    while i < len(sql):
+        char = sql[i]
+        if quote:
+            current.append(char)
+            if char == quote:
+                # Guillemet doublé ('') : toujours dans la chaîne
+                if sql[i + 1:i + 2] == quote:
+                    current.append(quote)
+                    i += 1
+                else:
+                    quote = None
+        elif char in ("'", '"', '`'):
+            quote = char
+            current.append(char)
+        elif sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = len(sql) if end == -1 else end
+            continue
+        elif char == ';':
+            statements.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+####
+#    APPLICATION    #
+####
+def _ensure_migrations_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        nom VARCHAR(255) NOT NULL,
+        checksum CHAR(40) NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+    ''')
+
+def applied_migrations(connection):
+    """Migrations déjà appliquées : version -> (nom, empreinte, date)."""
+    cursor = connection.cursor()
+    try:
+        _ensure_migrations_table(cursor)
+        cursor.execute("SELECT version, nom, checksum, applied_at FROM schema_migrations")
+        return {version: (nom, checksum, applied_at) for version, nom, checksum, applied_at in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+def apply_migrations(connection, directory=MIGRATIONS_DIR):
+    """
+    Applique, dans l'ordre, les migrations pas encore enregistrées dans schema_migrations.
+
+    Les requêtes DDL de MySQL ne sont pas transactionnelles : une migration en
+    échec n'est pas enregistrée et l'erreur est propagée, les requêtes déjà
+    exécutées de ce fichier restent appliquées.
+
+    Returns:
+        list: Versions appliquées par cet appel
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+    if cursor.fetchall()[0][0] != 1:
+        cursor.close()
+        raise MigrationError(f"Verrou '{LOCK_NAME}' non obtenu en {LOCK_TIMEOUT}s : migrations en cours ailleurs ?")
+
+    applied = []
+    try:
+        done = applied_migrations(connection)
+        for version, name, path in list_migrations(directory):
+            checksum = file_checksum(path)
+            if version in done:
+                if done[version][1] != checksum:
+                    print(f"Attention: la migration {version:04d}_{name} a été modifiée depuis son application.")
+                continue
+
+            print(f"Application de la migration {version:04d}_{name}...")
+            with open(path, 'r', encoding='utf-8') as f:
+                statements = split_statements(f.read())
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, nom, checksum, applied_at) VALUES (%s, %s, %s, %s)",
+                (version, name, checksum, datetime.datetime.now())
+            )
+            connection.commit()
+            applied.append(version)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cursor.fetchall()
+        cursor.close()
+
+    if applied:
+        print(f"{len(applied)} migration(s) appliquée(s).")
+    return applied
+
+def migration_status(connection, directory=MIGRATIONS_DIR):
+    """Affiche l'état de chaque migration. Retourne le nombre de migrations en attente."""
+    done = applied_migrations(connection)
+    pending = 0
+    for version, name, path in list_migrations(directory):
+        if version in done:
+            modified = " (modifiée depuis)" if done[version][1] != file_checksum(path) else ""
+            print(f"{version:04d}_{name:30s} appliquée le {done[version][2]}{modified}")
+        else:
+            pending += 1
+            print(f"{version:04d}_{name:30s} en attente")
+    return pending
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Migrations du schéma MySQL")
+    parser.add_argument("command", nargs="?", choices=["status", "up"], default="up",
+                        help="status: état des migrations, up: appliquer les migrations en attente")
+    parser.add_argument("--database", default=os.getenv("MYSQL_DATABASE", "immobilier_fnaim"), help="Base MySQL")
+    args = parser.parse_args()
+
+    try:
+        connection = mysql.connector.connect(
+            host=os.getenv("MYSQL_HOST", "localhost"),
+            user=os.getenv("MYSQL_USER", "root"),
+            password=os.getenv("MYSQL_PASSWORD", "")
+        )
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {args.database}")
+        cursor.close()
+        connection.database = args.database
+    except mysql.connector.Error as e:
+        print(f"Erreur de connexion à MySQL: {e}")
+        exit(1)
+
+    try:
+        if args.command == "status":
+            migration_status(connection)
+        elif not apply_migrations(connection):
+            print("Aucune migration en attente.")
+    except (mysql.connector.Error, MigrationError) as e:
+        print(f"Erreur lors des migrations: {e}")
+        exit(1)
+    finally:
+        connection.close()
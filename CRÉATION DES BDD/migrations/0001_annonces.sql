@@ -0,0 +1,24 @@
+-- Table des annonces (reprise de insert_annonces_into_mysql)
+-- Champ département en VARCHAR(10) pour les codes d'outre-mer (ex: 974)
+CREATE TABLE IF NOT EXISTS annonces (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    titre VARCHAR(255),
+    prix DECIMAL(12, 2),
+    surface DECIMAL(8, 2),
+    nb_pieces INT,
+    nb_chambres INT,
+    type_habitation VARCHAR(50),
+    code_postal VARCHAR(10),
+    departement VARCHAR(10),
+    ville VARCHAR(100),
+    dpe_consumption INT,
+    dpe_rating CHAR(1),
+    ges_emission INT,
+    ges_rating CHAR(1),
+    prix_m2 DECIMAL(10, 2),
+    date_publication DATE,
+    reference VARCHAR(50),
+    url VARCHAR(255),
+    agency_id INT,
+    UNIQUE KEY unique_annonce (reference)
+);
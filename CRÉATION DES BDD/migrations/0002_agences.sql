@@ -0,0 +1,14 @@
+-- Table des agences (reprise de insert_agences_into_mysql)
+CREATE TABLE IF NOT EXISTS agences (
+    id INT PRIMARY KEY,
+    nom VARCHAR(255),
+    adresse TEXT,
+    code_postal VARCHAR(10),
+    ville VARCHAR(100),
+    telephone VARCHAR(20),
+    siret VARCHAR(14),
+    carte_pro VARCHAR(50),
+    representant_legal VARCHAR(255),
+    url VARCHAR(255),
+    date_scrape DATETIME
+);
@@ -0,0 +1,15 @@
+-- Table des villes (reprise de load_city_data.create_cities_table)
+CREATE TABLE IF NOT EXISTS cities (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    ville VARCHAR(100) NOT NULL,
+    population INT,
+    surface FLOAT,
+    date VARCHAR(50),
+    densite FLOAT,
+    villes_voisines TEXT,
+    code_postal VARCHAR(10),
+    coordonnees TEXT,
+    demonym VARCHAR(100),
+    region_label VARCHAR(100),
+    UNIQUE KEY unique_city (ville, code_postal)
+);
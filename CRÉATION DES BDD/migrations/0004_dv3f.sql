@@ -0,0 +1,36 @@
+-- Tables DV3F (reprise de Recuperation_donnees_API_DV3F.create_tables)
+
+-- Indicateurs annuels par commune
+CREATE TABLE IF NOT EXISTS dv3f_indicateurs_commune (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    code_insee VARCHAR(10) NOT NULL,
+    nom_commune VARCHAR(100),
+    annee VARCHAR(4) NOT NULL,
+    nbtrans_cod111 INT COMMENT 'Nombre de ventes de maisons individuelles',
+    nbtrans_cod121 INT COMMENT 'Nombre de ventes d''appartements individuels',
+    prix_median_cod111 DECIMAL(12, 2) COMMENT 'Prix médian des maisons individuelles',
+    prix_median_cod121 DECIMAL(12, 2) COMMENT 'Prix médian des appartements individuels',
+    surface_median_cod111 DECIMAL(8, 2) COMMENT 'Surface médiane des maisons individuelles',
+    surface_median_cod121 DECIMAL(8, 2) COMMENT 'Surface médiane des appartements individuels',
+    prix_m2_median_cod111 DECIMAL(10, 2) COMMENT 'Prix au m² médian des maisons individuelles',
+    prix_m2_median_cod121 DECIMAL(10, 2) COMMENT 'Prix au m² médian des appartements individuels',
+    date_import TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_indicateur (code_insee, annee)
+);
+
+-- Mutations géolocalisées
+CREATE TABLE IF NOT EXISTS dv3f_mutations (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    id_mutation VARCHAR(50) NOT NULL,
+    code_insee VARCHAR(10),
+    commune VARCHAR(100),
+    datemut DATE,
+    libtypbien VARCHAR(100),
+    valeurfonc DECIMAL(15, 2),
+    sbati DECIMAL(10, 2),
+    sterr DECIMAL(10, 2),
+    latitude DECIMAL(10, 8),
+    longitude DECIMAL(11, 8),
+    date_import TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_mutation (id_mutation)
+);
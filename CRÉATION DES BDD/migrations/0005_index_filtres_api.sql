@@ -0,0 +1,30 @@
+-- Index secondaires des filtres de l'API (CREATION API/API_APP_V3.py)
+-- Colonnes en égalité d'abord, puis la colonne filtrée par intervalle.
+
+-- /properties et /stats/prix-moyen : code_postal = ?, type_habitation = ?, prix >= ? / <= ? ;
+-- /stats/distribution-prix : code_postal = ? (prix lu dans l'index)
+CREATE INDEX idx_annonces_cp_type_prix ON annonces (code_postal, type_habitation, prix);
+
+-- /properties sans code postal : type_habitation = ?, prix entre deux bornes
+CREATE INDEX idx_annonces_type_prix ON annonces (type_habitation, prix);
+
+-- /properties sur le seul budget : prix entre deux bornes, surface >= ? filtrée dans l'index
+CREATE INDEX idx_annonces_prix_surface ON annonces (prix, surface);
+
+-- /properties sur les seuls critères de surface, de pièces ou de DPE
+CREATE INDEX idx_annonces_surface ON annonces (surface);
+CREATE INDEX idx_annonces_nb_pieces_dpe ON annonces (nb_pieces, dpe_rating);
+CREATE INDEX idx_annonces_dpe_rating ON annonces (dpe_rating);
+
+-- /cities/{code_postal} et /cities?code_postal= (unique_city commence par ville)
+CREATE INDEX idx_cities_code_postal ON cities (code_postal);
+
+-- /dv3f/mutations : code_insee = ?, datemut entre deux bornes ; libtypbien LIKE '%...%'
+-- ne peut pas être cherché dans un index mais il est filtré dans l'index, sans lire les lignes écartées
+CREATE INDEX idx_dv3f_mutations_insee_date_type ON dv3f_mutations (code_insee, datemut, libtypbien);
+
+-- /dv3f/mutations sur la seule période
+CREATE INDEX idx_dv3f_mutations_datemut ON dv3f_mutations (datemut);
+
+-- /dv3f/stats/comparaison-communes : MAX(annee) lu dans l'index
+CREATE INDEX idx_dv3f_indicateurs_annee ON dv3f_indicateurs_commune (annee);
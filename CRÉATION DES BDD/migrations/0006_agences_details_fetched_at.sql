@@ -0,0 +1,5 @@
+-- Date de récupération des détails d'une agence (téléphone, SIRET, carte professionnelle,
+-- représentants légaux). date_scrape est la date du crawl, renouvelée à chaque passage même
+-- quand les détails viennent du cache : la politique de fraîcheur des agences
+-- (SCRAPPING/SCRIPT_OK/fnaim_agency_freshness.py) lit cette colonne.
+ALTER TABLE agences ADD COLUMN details_fetched_at DATETIME NULL;
@@ -0,0 +1,118 @@
+"""
+Chargement différentiel des documents dans MongoDB.
+
+insert_annonces_into_mongodb construisait un ReplaceOne(upsert=True) pour chaque
+document à chaque exécution, avec updated_at = datetime.now() : tous les
+documents étaient réécrits, même inchangés. Ici, chaque document porte un champ
+`content_hash` (empreinte de son contenu, hors _id, updated_at, content_hash et
+dates du crawl). Pour chaque lot, les empreintes déjà en base sont relues en une
+requête et seuls les documents nouveaux ou modifiés sont écrits (bulk_write non
+ordonné), avec un updated_at mis à jour.
+"""
+import datetime
+import hashlib
+import json
+import time
+
+try:
+    import pymongo
+except ImportError:
+    pymongo = None
+
+HASH_FIELD = 'content_hash'
+
+# Dates du crawl, renouvelées à chaque passage : un document re-scrapé à l'identique
+# n'est pas réécrit (elles sont tout de même écrites avec les documents modifiés)
+CRAWL_FIELDS = ('date_scrape', 'details_fetched_at')
+
+# Champs exclus de l'empreinte du contenu
+NON_CONTENT_FIELDS = ('_id', 'updated_at', HASH_FIELD) + CRAWL_FIELDS
+
+def _require_pymongo():
+    if pymongo is None:
+        raise ImportError("pymongo est requis pour le chargement MongoDB : pip install pymongo")
+
+def content_hash(document):
+    """Empreinte SHA-1 du contenu d'un document (clés triées, dates au format ISO)."""
+    content = {k: v for k, v in document.items() if k not in NON_CONTENT_FIELDS}
+    payload = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def _write_batch(collection, batch, stats, label):
+    """Écrit les documents nouveaux ou modifiés d'un lot et met à jour les compteurs."""
+    now = datetime.datetime.now()
+    operations = []
+
+    keyed = {}
+    for document in batch:
+        document[HASH_FIELD] = content_hash(document)
+        if '_id' in document:
+            # Un même _id présent plusieurs fois dans le lot : la dernière version l'emporte
+            keyed[document['_id']] = document
+        else:
+            document['updated_at'] = now
+            operations.append(pymongo.InsertOne(document))
+
+    known = {}
+    if keyed:
+        cursor = collection.find({'_id': {'$in': list(keyed)}}, {HASH_FIELD: 1})
+        known = {existing['_id']: existing.get(HASH_FIELD) for existing in cursor}
+
+    for _id, document in keyed.items():
+        if known.get(_id) == document[HASH_FIELD]:
+            stats['unchanged'] += 1
+            continue
+        document['updated_at'] = now
+        operations.append(pymongo.ReplaceOne({'_id': _id}, document, upsert=True))
+
+    if not operations:
+        return
+
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        details = result.bulk_api_result
+    except pymongo.errors.BulkWriteError as e:
+        details = e.details
+        stats['errors'] += len(details.get('writeErrors', []))
+        print(f"{label} - {len(details.get('writeErrors', []))} erreurs d'écriture dans le lot: "
+              f"{details['writeErrors'][0].get('errmsg') if details.get('writeErrors') else ''}")
+
+    stats['inserted'] += details.get('nInserted', 0) + details.get('nUpserted', 0)
+    stats['updated'] += details.get('nModified', 0)
+    stats['written'] += len(operations)
+
+def delta_upsert(collection, documents, batch_size=1000, label="MongoDB"):
+    """
+    Écrit uniquement les documents nouveaux ou modifiés de `documents` dans la collection.
+
+    Args:
+        collection: Collection pymongo
+        documents (iterable): Documents (dict) ; ceux qui ont un _id sont comparés à la base
+        batch_size (int): Nombre de documents par lot (une lecture des empreintes et un bulk_write par lot)
+        label (str): Libellé des messages
+
+    Returns:
+        dict: documents inchangés, mis à jour, insérés, en erreur, opérations écrites,
+        durée et débit d'écriture
+    """
+    _require_pymongo()
+    stats = {'documents': 0, 'unchanged': 0, 'updated': 0, 'inserted': 0, 'errors': 0, 'written': 0}
+    start = time.perf_counter()
+
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            _write_batch(collection, batch, stats, label)
+            stats['documents'] += len(batch)
+            batch = []
+    if batch:
+        _write_batch(collection, batch, stats, label)
+        stats['documents'] += len(batch)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['written_per_second'] = stats['written'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    print(f"{label} - Importation terminée. Documents: {stats['documents']}, Insérés: {stats['inserted']}, "
+          f"Mis à jour: {stats['updated']}, Inchangés: {stats['unchanged']}, Erreurs: {stats['errors']}, "
+          f"{stats['seconds']:.2f}s ({stats['written_per_second']:.0f} écritures/s)")
+    return stats
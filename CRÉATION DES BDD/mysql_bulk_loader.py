@@ -0,0 +1,397 @@
+"""
+Chargement en masse des annonces et des agences dans MySQL.
+
+insert_annonces_into_mysql parcourait le DataFrame avec iterrows et envoyait une
+requête INSERT ... ON DUPLICATE KEY UPDATE par ligne. Ce module :
+- convertit le DataFrame en tuples de façon vectorisée (NaN/NaT -> None) ;
+- envoie les lignes par lots avec executemany, que mysql-connector réécrit en un
+  INSERT multi-lignes par lot (un aller-retour et un commit par lot) ;
+- ou, avec method="load_data", charge un fichier CSV temporaire par
+  LOAD DATA LOCAL INFILE dans une table temporaire annonces_staging, puis
+  fusionne cette table dans annonces par un seul INSERT ... SELECT
+  ON DUPLICATE KEY UPDATE.
+
+LOAD DATA LOCAL nécessite une connexion ouverte avec allow_local_infile=True
+(et local_infile=ON côté serveur) ; sinon le chargement repasse par executemany.
+
+Les agences (bulk_upsert_agences) sont chargées par executemany dans une table
+temporaire agences_staging, comparées à la table agences pour compter les
+insertions, mises à jour et lignes inchangées, puis fusionnées par un seul
+INSERT ... SELECT ... ON DUPLICATE KEY UPDATE, le tout dans une transaction.
+
+Les villes (bulk_upsert_cities) sont chargées par executemany dans la table cities.
+"""
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
+
+# Colonnes de la table annonces alimentées depuis le DataFrame (hors id)
+ANNONCES_COLUMNS = [
+    'titre', 'prix', 'surface', 'nb_pieces', 'nb_chambres', 'type_habitation',
+    'code_postal', 'departement', 'ville', 'dpe_consumption', 'dpe_rating',
+    'ges_emission', 'ges_rating', 'prix_m2', 'date_publication', 'reference', 'url', 'agency_id'
+]
+
+# Clé unique de la table annonces (non mise à jour en cas de doublon)
+ANNONCES_KEY = ('reference',)
+
+# Colonnes de la table agences et colonnes correspondantes du DataFrame des agences
+AGENCES_COLUMNS = {
+    'id': 'agency_id',
+    'nom': 'agency_name',
+    'adresse': 'agency_address',
+    'code_postal': None,
+    'ville': None,
+    'telephone': 'agency_phone',
+    'siret': 'agency_siret',
+    'carte_pro': 'agency_card_number',
+    'representant_legal': 'agency_legal_reps',
+    'url': 'agency_url',
+    'date_scrape': 'date_scrape',
+    'details_fetched_at': 'details_fetched_at',
+}
+
+AGENCES_KEY = ('id',)
+
+# Colonnes ignorées pour décider si une agence a changé : dates du crawl et de la lecture
+# de la page agence, renouvelées à chaque passage (elles sont tout de même mises à jour par la fusion)
+AGENCES_UNTRACKED = ('date_scrape', 'details_fetched_at')
+
+# Colonnes de la table cities (hors id), alimentées par load_city_data.preprocess_data
+CITIES_COLUMNS = [
+    'ville', 'population', 'surface', 'date', 'densite', 'villes_voisines',
+    'code_postal', 'coordonnees', 'demonym', 'region_label'
+]
+
+# Clé unique de la table cities (non mise à jour en cas de doublon)
+CITIES_KEY = ('ville', 'code_postal')
+
+METHODS = ("executemany", "load_data")
+
+def _require_mysql():
+    if mysql is None:
+        raise ImportError("mysql-connector-python est requis pour le chargement MySQL : pip install mysql-connector-python")
+
+####
+#    CONVERSION DU DATAFRAME    #
+####
+def dataframe_to_rows(df, columns):
+    """
+    Convertit les colonnes `columns` du DataFrame en liste de tuples prêts pour
+    MySQL : colonnes absentes à None, NaN/NaT en None, types numpy en types Python.
+    """
+    frame = df.reindex(columns=columns)
+    for col in frame.columns:
+        # Les Timestamp pandas ne sont pas convertis par mysql-connector
+        if pd.api.types.is_datetime64_any_dtype(frame[col]):
+            frame[col] = pd.Series(frame[col].dt.to_pydatetime(), index=frame.index, dtype=object)
+    frame = frame.astype(object)
+    frame = frame.where(frame.notna(), None)
+    return list(frame.itertuples(index=False, name=None))
+
+def upsert_query(table, columns, key=ANNONCES_KEY):
+    """Requête INSERT ... VALUES ... ON DUPLICATE KEY UPDATE pour executemany."""
+    updates = ",\n".join(f"{col} = VALUES({col})" for col in columns if col not in key)
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)})\n"
+        f"VALUES ({', '.join(['%s'] * len(columns))})\n"
+        f"ON DUPLICATE KEY UPDATE\n{updates}"
+    )
+
+####
+#    CHARGEMENT PAR EXECUTEMANY    #
+####
+def _executemany_batches(connection, query, rows, batch_size, label):
+    """
+    Envoie les lignes par lots de batch_size avec un commit par lot. Un lot en
+    erreur est annulé puis rejoué ligne par ligne pour n'écarter que les lignes invalides.
+    Retourne (lignes affectées, lignes en erreur).
+    """
+    cursor = connection.cursor()
+    affected = 0
+    errors = 0
+    try:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            try:
+                cursor.executemany(query, batch)
+                affected += max(cursor.rowcount, 0)
+                connection.commit()
+            except mysql.connector.Error as e:
+                connection.rollback()
+                print(f"{label} - Erreur MySQL sur le lot {start}-{start + len(batch) - 1} ({e}), reprise ligne par ligne")
+                for offset, row in enumerate(batch):
+                    try:
+                        cursor.execute(query, row)
+                        affected += max(cursor.rowcount, 0)
+                    except mysql.connector.Error as e:
+                        print(f"Erreur MySQL lors du traitement de la ligne {start + offset}: {e}")
+                        errors += 1
+                connection.commit()
+            print(f"{label} - Traités: {min(start + batch_size, len(rows))}/{len(rows)}")
+    finally:
+        cursor.close()
+    return affected, errors
+
+####
+#    CHARGEMENT PAR LOAD DATA LOCAL INFILE    #
+####
+def _csv_value(value):
+    """Valeur d'un champ du fichier LOAD DATA : NULL sans guillemets, texte entre guillemets."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+def write_load_data_file(rows, path):
+    """Écrit les lignes au format attendu par load_data_upsert."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for row in rows:
+            f.write(",".join(_csv_value(value) for value in row))
+            f.write("\n")
+
+def load_data_upsert(connection, table, columns, rows, key=ANNONCES_KEY, staging_table=None):
+    """
+    Charge les lignes dans une table temporaire (copie de `table` sans ses index
+    secondaires) par LOAD DATA LOCAL INFILE, puis les fusionne dans `table`.
+    Les doublons du fichier sont appliqués dans l'ordre : la dernière ligne l'emporte.
+    Retourne le nombre de lignes affectées par la fusion.
+    """
+    staging_table = staging_table or f"{table}_staging"
+    fd, path = tempfile.mkstemp(prefix=f"{table}_", suffix=".csv")
+    os.close(fd)
+    cursor = connection.cursor()
+    try:
+        write_load_data_file(rows, path)
+
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+        cursor.execute(f"CREATE TEMPORARY TABLE {staging_table} LIKE {table}")
+        # Sans clé unique, toutes les lignes du fichier sont chargées ; sans les index
+        # des filtres de l'API (migrations/), le chargement n'a aucun index à tenir à jour
+        cursor.execute(
+            "SELECT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY'",
+            (table,)
+        )
+        for index_name in {row[0] for row in cursor.fetchall()}:
+            cursor.execute(f"ALTER TABLE {staging_table} DROP INDEX {index_name}")
+
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {staging_table} CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+            f"LINES TERMINATED BY '\\n' ({', '.join(columns)})",
+            (path,)
+        )
+
+        updates = ",\n".join(f"{col} = VALUES({col})" for col in columns if col not in key)
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)})\n"
+            f"SELECT {', '.join(columns)} FROM {staging_table} ORDER BY id\n"
+            f"ON DUPLICATE KEY UPDATE\n{updates}"
+        )
+        affected = max(cursor.rowcount, 0)
+        connection.commit()
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+        return affected
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+        os.remove(path)
+
+####
+#    CHARGEMENT DES ANNONCES    #
+####
+def bulk_insert_annonces(df, connection, batch_size=1000, method="executemany"):
+    """
+    Insère (ou met à jour) les annonces du DataFrame dans la table annonces, qui doit exister.
+
+    Args:
+        df (DataFrame): Annonces prétraitées (preprocess_annonces_dataframe)
+        connection: Connexion mysql.connector
+        batch_size (int): Nombre de lignes par lot executemany
+        method (str): "executemany" ou "load_data" (LOAD DATA LOCAL INFILE + fusion)
+
+    Returns:
+        dict: lignes traitées, lignes affectées (1 par insertion, 2 par mise à jour),
+        lignes en erreur, durée et débit en lignes par seconde
+    """
+    _require_mysql()
+    if method not in METHODS:
+        raise ValueError(f"Méthode de chargement inconnue: {method}")
+
+    start = time.perf_counter()
+    rows = dataframe_to_rows(df, ANNONCES_COLUMNS)
+    affected = 0
+    errors = 0
+
+    if method == "load_data" and rows:
+        try:
+            affected = load_data_upsert(connection, "annonces", ANNONCES_COLUMNS, rows)
+        except mysql.connector.Error as e:
+            print(f"MySQL Annonces - LOAD DATA LOCAL INFILE impossible ({e}), chargement par executemany")
+            method = "executemany"
+
+    if method == "executemany" and rows:
+        affected, errors = _executemany_batches(
+            connection, upsert_query("annonces", ANNONCES_COLUMNS), rows, batch_size, "MySQL Annonces"
+        )
+
+    seconds = time.perf_counter() - start
+    rate = len(rows) / seconds if seconds > 0 else 0.0
+    print(f"MySQL Annonces - Importation terminée ({method}). Total traités: {len(rows)}, "
+          f"Lignes affectées: {affected}, Erreurs: {errors}, {seconds:.2f}s ({rate:.0f} lignes/s)")
+    return {
+        'method': method,
+        'rows': len(rows),
+        'affected': affected,
+        'errors': errors,
+        'seconds': seconds,
+        'rows_per_second': rate,
+    }
+
+####
+#    CHARGEMENT DES AGENCES    #
+####
+def agences_frame(df):
+    """
+    DataFrame des agences aux colonnes de la table agences : code postal et ville
+    extraits de l'adresse, une seule ligne par agence (la dernière l'emporte).
+    """
+    frame = pd.DataFrame(index=df.index)
+    for column, source in AGENCES_COLUMNS.items():
+        if source is not None:
+            frame[column] = df[source] if source in df.columns else None
+    if 'agency_address' not in df.columns:
+        frame['adresse'] = ''
+
+    # Recherche d'un code postal suivi de la ville dans l'adresse
+    adresse = frame['adresse'].where(frame['adresse'].map(lambda value: isinstance(value, str)))
+    location = adresse.astype(object).str.upper().str.extract(r'(\d{5})\s+([A-Z\s]+)')
+    frame['code_postal'] = location[0]
+    frame['ville'] = location[1].str.strip()
+
+    frame = frame[list(AGENCES_COLUMNS)]
+    frame = frame[frame['id'].notna()]
+    return frame.drop_duplicates(subset=list(AGENCES_KEY), keep='last')
+
+def bulk_upsert_agences(df, connection, batch_size=1000, staging_table="agences_staging"):
+    """
+    Insère (ou met à jour) les agences du DataFrame dans la table agences, qui doit exister,
+    en une transaction : chargement dans une table temporaire puis une seule fusion.
+
+    Args:
+        df (DataFrame): Agences prétraitées (preprocess_agences_dataframe)
+        connection: Connexion mysql.connector
+        batch_size (int): Nombre de lignes par lot executemany dans la table temporaire
+        staging_table (str): Nom de la table temporaire
+
+    Returns:
+        dict: lignes chargées, insérées, mises à jour, inchangées, durée et débit en lignes par seconde
+    """
+    _require_mysql()
+    start = time.perf_counter()
+    columns = list(AGENCES_COLUMNS)
+    rows = dataframe_to_rows(agences_frame(df), columns)
+    stats = {'rows': len(rows), 'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    cursor = connection.cursor()
+    try:
+        if not connection.in_transaction:
+            connection.start_transaction()
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+        cursor.execute(f"CREATE TEMPORARY TABLE {staging_table} LIKE agences")
+
+        insert_query = (
+            f"INSERT INTO {staging_table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})"
+        )
+        for batch_start in range(0, len(rows), batch_size):
+            cursor.executemany(insert_query, rows[batch_start:batch_start + batch_size])
+
+        # Comptages avant la fusion : nouvelles agences, puis agences identiques (comparaison NULL-safe,
+        # hors date du crawl)
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {staging_table} s LEFT JOIN agences a ON a.id = s.id WHERE a.id IS NULL"
+        )
+        stats['inserted'] = cursor.fetchone()[0]
+        same = " AND ".join(
+            f"a.{col} <=> s.{col}" for col in columns if col not in AGENCES_KEY + AGENCES_UNTRACKED
+        )
+        cursor.execute(f"SELECT COUNT(*) FROM {staging_table} s JOIN agences a ON a.id = s.id WHERE {same}")
+        stats['unchanged'] = cursor.fetchone()[0]
+        stats['updated'] = stats['rows'] - stats['inserted'] - stats['unchanged']
+
+        updates = ",\n".join(f"{col} = VALUES({col})" for col in columns if col not in AGENCES_KEY)
+        cursor.execute(
+            f"INSERT INTO agences ({', '.join(columns)})\n"
+            f"SELECT {', '.join(columns)} FROM {staging_table}\n"
+            f"ON DUPLICATE KEY UPDATE\n{updates}"
+        )
+        connection.commit()
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+    except mysql.connector.Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    print(f"MySQL Agences - Importation terminée (table temporaire). Total: {stats['rows']}, "
+          f"Insérées: {stats['inserted']}, Mises à jour: {stats['updated']}, Inchangées: {stats['unchanged']}, "
+          f"{stats['seconds']:.2f}s ({stats['rows_per_second']:.0f} lignes/s)")
+    return stats
+
+####
+#    CHARGEMENT DES VILLES    #
+####
+def bulk_upsert_cities(df, connection, batch_size=1000):
+    """
+    Insère (ou met à jour) les villes du DataFrame dans la table cities, qui doit exister.
+
+    Args:
+        df (DataFrame): Villes prétraitées (load_city_data.preprocess_data)
+        connection: Connexion mysql.connector
+        batch_size (int): Nombre de lignes par lot executemany
+
+    Returns:
+        dict: lignes traitées, lignes affectées (1 par insertion, 2 par mise à jour),
+        lignes en erreur, durée et débit en lignes par seconde
+    """
+    _require_mysql()
+    start = time.perf_counter()
+    if 'ville' not in df.columns:
+        # ville est NOT NULL dans la table
+        df = df.assign(ville='')
+    rows = dataframe_to_rows(df, CITIES_COLUMNS)
+    affected = 0
+    errors = 0
+
+    if rows:
+        affected, errors = _executemany_batches(
+            connection, upsert_query("cities", CITIES_COLUMNS, CITIES_KEY), rows, batch_size, "MySQL Villes"
+        )
+
+    seconds = time.perf_counter() - start
+    rate = len(rows) / seconds if seconds > 0 else 0.0
+    print(f"MySQL Villes - Importation terminée. Total traités: {len(rows)}, "
+          f"Lignes affectées: {affected}, Erreurs: {errors}, {seconds:.2f}s ({rate:.0f} lignes/s)")
+    return {
+        'rows': len(rows),
+        'affected': affected,
+        'errors': errors,
+        'seconds': seconds,
+        'rows_per_second': rate,
+    }
@@ -0,0 +1,190 @@
+"""
+Chargement simultané d'un même lot dans plusieurs bases (MySQL et MongoDB).
+
+Les deux chargements sont indépendants : au lieu de les enchaîner, FanOutLoader
+confie chaque lot prétraité à un thread par base. La durée d'un lot est alors
+celle de la base la plus lente, et non la somme des deux.
+
+Chaque base a sa propre file bornée de `max_pending` lots : quand la base la plus
+lente a max_pending lots de retard, submit bloque la lecture du lot suivant
+(contre-pression). Les erreurs (retour False ou exception) et les temps d'attente
+sont comptés base par base.
+
+Les connexions ne sont pas partagées entre threads : chaque fonction de
+chargement n'est appelée que depuis le thread de sa base.
+"""
+import collections
+import queue
+import threading
+import time
+
+# Message de fin pour les threads des bases
+_STOP = None
+
+class SinkBatch:
+    """Lot soumis à toutes les bases ; terminé quand chaque base l'a traité."""
+    def __init__(self, df, sinks, meta=None):
+        self.df = df
+        self.meta = meta
+        self.results = {}
+        self._pending = len(sinks)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not sinks:
+            self._done.set()
+
+    def sink_done(self, name, ok):
+        with self._lock:
+            self.results[name] = ok
+            self._pending -= 1
+            if self._pending == 0:
+                # Le DataFrame n'est plus utile une fois le lot chargé partout
+                self.df = None
+                self._done.set()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    @property
+    def ok(self):
+        return self.finished and all(self.results.values())
+
+    def wait(self, timeout=None):
+        """Attend que toutes les bases aient traité le lot. Retourne True si toutes ont réussi."""
+        self._done.wait(timeout)
+        return self.ok
+
+class SinkWorker:
+    """
+    Thread de chargement d'une base.
+
+    Args:
+        name (str): Nom de la base (pour les messages et les statistiques)
+        load (callable): Fonction load(df) -> bool
+        max_pending (int): Nombre maximal de lots en attente pour cette base
+    """
+    def __init__(self, name, load, max_pending=2):
+        self.name = name
+        self.load = load
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.stats = {
+            'batches': 0,
+            'rows': 0,
+            'failed_batches': 0,
+            'exceptions': 0,
+            'load_seconds': 0.0,
+            'backpressure_seconds': 0.0,
+        }
+        self.thread = threading.Thread(target=self._run, name=f"sink-{name}", daemon=True)
+
+    def put(self, batch):
+        """Ajoute un lot à la file ; bloque tant que la file est pleine."""
+        start = time.perf_counter()
+        self.queue.put(batch)
+        self.stats['backpressure_seconds'] += time.perf_counter() - start
+
+    def _run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is _STOP:
+                break
+            start = time.perf_counter()
+            rows = len(batch.df)
+            try:
+                ok = bool(self.load(batch.df))
+            except Exception as e:
+                print(f"{self.name} - Erreur lors du chargement d'un lot: {e}")
+                self.stats['exceptions'] += 1
+                ok = False
+            self.stats['load_seconds'] += time.perf_counter() - start
+            self.stats['batches'] += 1
+            if ok:
+                self.stats['rows'] += rows
+            else:
+                self.stats['failed_batches'] += 1
+            batch.sink_done(self.name, ok)
+
+class FanOutLoader:
+    """
+    Répartit chaque lot entre les bases, chargées en parallèle.
+
+    Args:
+        loaders (dict): Nom de la base -> fonction load(df) -> bool
+        max_pending (int): Nombre maximal de lots en attente par base
+    """
+    def __init__(self, loaders, max_pending=2):
+        self.workers = [SinkWorker(name, load, max_pending) for name, load in loaders.items()]
+        self._in_flight = collections.deque()
+        self._started = False
+        self._start_time = None
+
+    def start(self):
+        if not self._started:
+            self._start_time = time.perf_counter()
+            for worker in self.workers:
+                worker.thread.start()
+            self._started = True
+        return self
+
+    def submit(self, df, meta=None):
+        """Soumet un lot à toutes les bases. Retourne le SinkBatch correspondant."""
+        self.start()
+        batch = SinkBatch(df, [worker.name for worker in self.workers], meta)
+        self._in_flight.append(batch)
+        for worker in self.workers:
+            worker.put(batch)
+        return batch
+
+    def load(self, df):
+        """Charge un lot dans toutes les bases et attend la fin. Retourne True si toutes ont réussi."""
+        batch = self.submit(df)
+        self.completed()
+        return batch.wait()
+
+    def completed(self):
+        """Lots terminés, dans l'ordre de soumission (s'arrête au premier lot encore en cours)."""
+        done = []
+        while self._in_flight and self._in_flight[0].finished:
+            done.append(self._in_flight.popleft())
+        return done
+
+    def drain(self):
+        """Attend la fin de tous les lots soumis et les retourne dans l'ordre."""
+        for batch in self._in_flight:
+            batch.wait()
+        return self.completed()
+
+    def close(self):
+        """Attend les lots en cours puis arrête les threads des bases."""
+        if self._started:
+            for worker in self.workers:
+                worker.queue.put(_STOP)
+            for worker in self.workers:
+                worker.thread.join()
+            self._started = False
+
+    def stats(self):
+        """Statistiques par base."""
+        return {worker.name: dict(worker.stats) for worker in self.workers}
+
+    def report(self, label="Chargement"):
+        elapsed = time.perf_counter() - self._start_time if self._start_time else 0.0
+        for worker in self.workers:
+            stats = worker.stats
+            print(f"{label} - {worker.name}: {stats['batches']} lots, {stats['rows']} lignes, "
+                  f"{stats['failed_batches']} lots en échec ({stats['exceptions']} exceptions), "
+                  f"chargement {stats['load_seconds']:.1f}s, attente file pleine {stats['backpressure_seconds']:.1f}s")
+        if self.workers:
+            slowest = max(worker.stats['load_seconds'] for worker in self.workers)
+            total = sum(worker.stats['load_seconds'] for worker in self.workers)
+            print(f"{label} - Durée totale {elapsed:.1f}s (base la plus lente {slowest:.1f}s, chargements cumulés {total:.1f}s)")
+
+def load_in_parallel(df, loaders, label="Chargement"):
+    """Charge un DataFrame dans toutes les bases en parallèle. Retourne True si toutes ont réussi."""
+    fan_out = FanOutLoader(loaders, max_pending=1)
+    try:
+        return fan_out.load(df)
+    finally:
+        fan_out.close()
+        fan_out.report(label)
@@ -11,6 +11,11 @@ from dotenv import load_dotenv
 import time
 import json
 from tqdm import tqdm
+import sys
+
+# Migrations du schéma MySQL (CRÉATION DES BDD/migrate.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'CRÉATION DES BDD'))
+from migrate import MigrationError, apply_migrations
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -104,7 +109,9 @@ def apidf(url_endpoint, token=None, timeout=30):
 
 def create_tables(connection):
     """
-    Crée les tables nécessaires dans la base de données MySQL.
+    Crée ou met à jour les tables nécessaires dans la base de données MySQL.
+    Le schéma (tables DV3F et index des filtres de l'API) est décrit par les
+    migrations de CRÉATION DES BDD/migrations.
     
     Args:
         connection: Connexion MySQL active
@@ -113,53 +120,11 @@ def create_tables(connection):
         Error: En cas d'erreur lors de la création des tables
     """
     try:
-        cursor = connection.cursor()
-        
-        print("Création de la table des indicateurs par commune...")
-        # Table pour les indicateurs annuels par commune
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS dv3f_indicateurs_commune (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            code_insee VARCHAR(10) NOT NULL,
-            nom_commune VARCHAR(100),
-            annee VARCHAR(4) NOT NULL,
-            nbtrans_cod111 INT COMMENT 'Nombre de ventes de maisons individuelles',
-            nbtrans_cod121 INT COMMENT 'Nombre de ventes d''appartements individuels',
-            prix_median_cod111 DECIMAL(12, 2) COMMENT 'Prix médian des maisons individuelles',
-            prix_median_cod121 DECIMAL(12, 2) COMMENT 'Prix médian des appartements individuels',
-            surface_median_cod111 DECIMAL(8, 2) COMMENT 'Surface médiane des maisons individuelles',
-            surface_median_cod121 DECIMAL(8, 2) COMMENT 'Surface médiane des appartements individuels',
-            prix_m2_median_cod111 DECIMAL(10, 2) COMMENT 'Prix au m² médian des maisons individuelles',
-            prix_m2_median_cod121 DECIMAL(10, 2) COMMENT 'Prix au m² médian des appartements individuels',
-            date_import TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE KEY unique_indicateur (code_insee, annee)
-        )
-        ''')
-        
-        print("Création de la table des mutations géolocalisées...")
-        # Table pour les mutations géolocalisées
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS dv3f_mutations (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            id_mutation VARCHAR(50) NOT NULL,
-            code_insee VARCHAR(10),
-            commune VARCHAR(100),
-            datemut DATE,
-            libtypbien VARCHAR(100),
-            valeurfonc DECIMAL(15, 2),
-            sbati DECIMAL(10, 2),
-            sterr DECIMAL(10, 2),
-            latitude DECIMAL(10, 8),
-            longitude DECIMAL(11, 8),
-            date_import TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE KEY unique_mutation (id_mutation)
-        )
-        ''')
-        
-        connection.commit()
+        print("Application des migrations du schéma...")
+        apply_migrations(connection)
         print("Tables créées avec succès")
         
-    except Error as e:
+    except (Error, MigrationError) as e:
         print(f"Erreur lors de la création des tables: {e}")
         raise e
 
@@ -0,0 +1,356 @@
+"""
+Micro-benchmark du parsing des fiches annonces FNAIM.
+
+Compare l'extracteur compilé (fnaim_parser, un seul parsing lxml) à l'ancienne
+implémentation de scrapping_annonce (BeautifulSoup + lxml, XPath non compilés),
+sur les pages du dossier fixtures/ ou sur un dossier de pages HTML sauvegardées :
+- vérifie que les deux implémentations produisent les mêmes champs ;
+- mesure le débit (pages par seconde) ;
+- mesure la mémoire Python allouée par page (pic tracemalloc ; l'arbre libxml2,
+  alloué en C, n'est pas compté : l'écart reflète surtout l'arbre BeautifulSoup).
+
+Usage :
+    python benchmark_parser.py [--pages DOSSIER] [--iterations N]
+"""
+import argparse
+import glob
+import os
+import re
+import time
+import tracemalloc
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+from lxml import html
+
+from fnaim_parser import extract_numbers, parse_agence, parse_annonce
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_URL = "https://www.fnaim.fr/annonce-immobiliere/52367367/4333-acheter-appartement-rennes-35000.htm"
+
+####
+#    IMPLÉMENTATION DE RÉFÉRENCE    #
+####
+def parse_annonce_html_legacy(annonce_fiche_html, url_annonce):
+    """
+    Ancienne implémentation (double parsing BeautifulSoup + lxml), conservée
+    comme référence pour le benchmark et la vérification des résultats.
+    """
+    annonce_fiche_soup = BeautifulSoup(annonce_fiche_html, "lxml")
+    
+    # Version lxml directe pour certaines extractions complexes
+    tree = html.fromstring(annonce_fiche_html)
+    
+    # Titre, prix et référence
+    titre_element = annonce_fiche_soup.find('h1', class_='titreFiche')
+    titre = titre_element.get_text(strip=True) if titre_element else None
+    
+    price_element = annonce_fiche_soup.find('span', itemprop='price')
+    prix = price_element.get_text(strip=True) if price_element else None
+    
+    ref_element = annonce_fiche_soup.find('meta', itemprop='productid')
+    ref = ref_element['content'] if ref_element else None
+    
+    # Utilisation de XPath pour extractions spécifiques
+    lieu_xpath = tree.xpath('//li[contains(@class, "picto lieu")]/b/text()')
+    lieu = lieu_xpath[0].strip() if lieu_xpath else None
+    
+    # Extraire juste le code postal 
+    if lieu:
+        match = re.search(r'(\d{5})', lieu)
+        lieu = match.group(1) if match else None
+    
+    # Surface avec XPath
+    surface_xpath = tree.xpath('//li[contains(@class, "picto surface")]/b/text()')
+    surface = surface_xpath[0].strip() if surface_xpath else None
+    surface_int = extract_numbers(surface) if surface else None
+    
+    # Nombre de pièces avec XPath
+    pieces_xpath = tree.xpath('//li[contains(@class, "picto pieces")]/b/text()')
+    nbr_pieces = pieces_xpath[0].strip() if pieces_xpath else None
+    nb_pieces = extract_numbers(nbr_pieces) if nbr_pieces else None
+    
+    # Type d'habitation - combinaison BS4 et XPath
+    habit_type_element = annonce_fiche_soup.find('label', string="Type d'habitation : ")
+    if habit_type_element:
+        habit_type_text = habit_type_element.find_next_sibling(text=True)
+        habit_type = habit_type_text.strip() if habit_type_text else None
+    else:
+        # Essayer avec les méta données
+        habit_type_meta = annonce_fiche_soup.find('meta', itemprop='model')
+        habit_type = habit_type_meta['content'] if habit_type_meta else None
+        
+        # Alternative avec XPath si toujours pas de résultat
+        if not habit_type:
+            habit_xpath = tree.xpath('//meta[@itemprop="model"]/@content')
+            habit_type = habit_xpath[0] if habit_xpath else None
+    
+    # DPE et GES - Performance énergétique (utilisation avancée de XPath)
+    dpe_text = None
+    dpe_elements = tree.xpath('//li[contains(text(), "DPE")] | //li[.//label[contains(text(), "DPE")]]')
+    if dpe_elements:
+        dpe_text = dpe_elements[0].text_content().strip()
+    
+    if dpe_text:
+        # Extraire la lettre du DPE
+        dpe_match = re.search(r'DPE\s*:\s*([A-G])', dpe_text)
+        if not dpe_match:
+            dpe_match = re.search(r'DPE\s*[^\w]*([A-G])', dpe_text)
+        dpe_rating = dpe_match.group(1) if dpe_match else None
+        
+        # Extraire la consommation
+        consumption_match = re.search(r'(\d+)\s*kWh/m[²²]\s*an', dpe_text)
+        dpe_consumption = int(consumption_match.group(1)) if consumption_match else None
+    else:
+        dpe_rating = None
+        dpe_consumption = None
+    
+    # GES avec XPath
+    ges_text = None
+    ges_elements = tree.xpath('//li[contains(text(), "GES")] | //li[.//label[contains(text(), "GES")]]')
+    if ges_elements:
+        ges_text = ges_elements[0].text_content().strip()
+    elif dpe_text and "GES" in dpe_text:
+        ges_text = dpe_text
+        
+    if ges_text:
+        # Extraire la lettre du GES
+        ges_rang_match = re.search(r'GES\s*:\s*([A-G])', ges_text)
+        if not ges_rang_match:
+            ges_rang_match = re.search(r'GES\s*[^\w]*([A-G])', ges_text)
+        ges_rang = ges_rang_match.group(1) if ges_rang_match else None
+        
+        # Extraire l'émission
+        emission_match = re.search(r'(\d+)\s*kgCO2/m[²²].an', ges_text)
+        ges_emission = int(emission_match.group(1)) if emission_match else None
+    else:
+        ges_rang = None
+        ges_emission = None
+    
+    # Estimation des dépenses énergétiques
+    depenses_elements = tree.xpath('//li[.//label[contains(text(), "Montant estimé des dépenses")]]')
+    if depenses_elements:
+        depenses_text = depenses_elements[0].text_content().strip()
+        # Extraire les montants min et max
+        montants_match = re.search(r'Entre\s*(\d+)\s*€\s*TTC\s*/\s*an\s*et\s*(\d+)\s*€\s*TTC\s*/\s*an', depenses_text)
+        if montants_match:
+            depenses_min = int(montants_match.group(1))
+            depenses_max = int(montants_match.group(2))
+        else:
+            depenses_min = None
+            depenses_max = None
+        
+        # Date de référence des prix
+        date_ref_match = re.search(r'Date de référence des prix[^:]*:\s*(\d{2}/\d{2}/\d{4})', depenses_text)
+        date_ref_prix = date_ref_match.group(1) if date_ref_match else None
+    else:
+        depenses_min = None
+        depenses_max = None
+        date_ref_prix = None
+    
+    # Caractéristiques supplémentaires
+    # Nombre de chambres avec XPath
+    chambres_xpath = tree.xpath('//li[contains(text(), "Nombre de chambres")] | //label[contains(text(), "Nombre de chambres")]/following-sibling::text()[1]')
+    if chambres_xpath:
+        nb_chambres = extract_numbers(chambres_xpath[0])
+    else:
+        nb_chambres = None
+    
+    # Description
+    description_element = annonce_fiche_soup.find("p", itemprop="description")
+    description = description_element.get_text(strip=True) if description_element else None
+    
+    # Parking
+    parking_xpath = tree.xpath('//li[contains(@class, "picto parking")]/b/text()')
+    parking_bool = False
+    if parking_xpath:
+        parking_text = parking_xpath[0].strip()
+        parking_bool = True if parking_text == "Oui" else False
+
+    # Extraction des liens d'images avec XPath
+    images_links = []
+    image_elements = tree.xpath('//div[@id="diapo_annonce"]//a[contains(@class, "imageAnnonce")]/@href')
+    if image_elements:
+        images_links = image_elements
+    
+    # Si pas d'images trouvées, essayer les métadonnées
+    if not images_links:
+        meta_image = tree.xpath('//meta[@itemprop="image"]/@content')
+        if meta_image:
+            images_links.append(meta_image[0])
+
+    # Informations sur l'agence
+    agency_id = None
+    agency_name = None
+    agency_address = None
+    agency_url = None
+    
+    # Extraction des données de l'agence avec XPath
+    agency_name_xpath = tree.xpath('//div[contains(@class, "caracteristique agence")]//div[contains(@class, "libelle")]/a/text()')
+    if agency_name_xpath:
+        agency_name = agency_name_xpath[0].strip()
+        
+    agency_address_xpath = tree.xpath('//div[contains(@class, "caracteristique agence")]//p[contains(@class, "addresse")]/text()')
+    if agency_address_xpath:
+        agency_address = agency_address_xpath[0].strip()
+        
+    agency_url_xpath = tree.xpath('//div[contains(@class, "caracteristique agence")]//div[contains(@class, "libelle")]/a/@href')
+    if agency_url_xpath:
+        agency_url = agency_url_xpath[0]
+        agency_id_match = re.search(r'/agence-immobiliere/(\d+)/', agency_url)
+        if agency_id_match:
+            agency_id = agency_id_match.group(1)
+    
+    # Construction de l'URL complète pour l'agence
+    parsed_url = urlparse(url_annonce)
+    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+    full_agency_url = base_url + agency_url if agency_url else None
+    
+    data_annonce = {
+        'titre': titre,
+        'prix': prix,
+        'reference': ref,
+        'code_postal': lieu,
+        'surface': surface_int,
+        'nb_pieces': nb_pieces,
+        'type_habitation': habit_type,
+        'dpe_rating': dpe_rating,
+        'dpe_consumption': dpe_consumption,
+        'ges_rating': ges_rang,
+        'ges_emission': ges_emission,
+        'nb_chambres': nb_chambres,
+        'description': description,
+        'parking': parking_bool,
+        'url': url_annonce,
+        'images': images_links,
+        'depenses_energie_min': depenses_min,
+        'depenses_energie_max': depenses_max,
+        'date_ref_prix_energie': date_ref_prix,
+        'agency_id': agency_id,
+        'date_scrape': None
+    }
+    
+    data_agence = {
+        'agency_id': agency_id,
+        'agency_name': agency_name,
+        'agency_address': agency_address,
+        'agency_url': agency_url,
+        'agency_phone': None,
+        'agency_siret': None,
+        'agency_card_number': None,
+        'agency_legal_reps': None,
+        'date_scrape': None
+    }
+    
+    return data_annonce, data_agence, full_agency_url
+
+def parse_agence_html_legacy(agency_html):
+    """Ancienne implémentation de l'analyse d'une page agence."""
+    details = {
+        'agency_phone': None,
+        'agency_siret': None,
+        'agency_card_number': None,
+        'agency_legal_reps': None
+    }
+    agency_tree = html.fromstring(agency_html)
+    
+    # Récupération du numéro de téléphone avec XPath
+    phone_xpath = agency_tree.xpath('//span[@id="agence_call"]/text()')
+    if phone_xpath:
+        details['agency_phone'] = phone_xpath[0].strip()
+    
+    # Récupération des informations complémentaires
+    info_items = agency_tree.xpath('//div[contains(@class, "caracteristique tab-left")]//li')
+    for item in info_items:
+        item_text = item.text_content().strip()
+        if 'SIRET' in item_text:
+            details['agency_siret'] = item_text.split(':', 1)[1].strip() if ':' in item_text else item_text
+        elif 'Carte N°' in item_text:
+            details['agency_card_number'] = item_text.split(':', 1)[1].strip() if ':' in item_text else item_text
+        elif 'Représentants légaux' in item_text:
+            details['agency_legal_reps'] = item_text.split(':', 1)[1].strip() if ':' in item_text else item_text
+    
+    return details
+
+####
+#    MESURES    #
+####
+def check_equivalence(pages):
+    """Vérifie que l'extracteur compilé retourne les mêmes valeurs que l'ancienne version."""
+    differences = 0
+    for path, content in pages:
+        new = parse_annonce(content, FIXTURE_URL)
+        old = parse_annonce_html_legacy(content, FIXTURE_URL)
+        for new_part, old_part in zip(new[:2], old[:2]):
+            for key, value in old_part.items():
+                if new_part[key] == value:
+                    continue
+                if key == 'nb_chambres' and value is None:
+                    # L'ancienne version perdait le nombre de chambres écrit directement dans le <li>
+                    print(f"  {os.path.basename(path)} - {key}: {new_part[key]!r} (corrigé, None auparavant)")
+                    continue
+                differences += 1
+                print(f"  {os.path.basename(path)} - {key}: {value!r} (ancien) != {new_part[key]!r} (nouveau)")
+        if new[2] != old[2]:
+            differences += 1
+            print(f"  {os.path.basename(path)} - full_agency_url: {old[2]!r} != {new[2]!r}")
+    return differences
+
+def measure_throughput(parse, pages, iterations):
+    """Nombre de pages analysées par seconde."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for _, content in pages:
+            parse(content, FIXTURE_URL)
+    elapsed = time.perf_counter() - start
+    return iterations * len(pages) / elapsed
+
+def measure_memory(parse, pages):
+    """Pic moyen de mémoire Python allouée par page analysée, en Ko."""
+    peaks = []
+    for _, content in pages:
+        tracemalloc.start()
+        parse(content, FIXTURE_URL)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+    return sum(peaks) / len(peaks) / 1024
+
+def load_pages(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.htm*"))):
+        if "agence" in os.path.basename(path):
+            continue
+        with open(path, "rb") as f:
+            pages.append((path, f.read()))
+    return pages
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du parsing des fiches annonces FNAIM")
+    parser.add_argument("--pages", default=FIXTURES_DIR, help="Dossier contenant des fiches annonces HTML")
+    parser.add_argument("--iterations", type=int, default=200, help="Nombre de passes sur les pages")
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    if not pages:
+        print(f"Aucune page HTML trouvée dans {args.pages}")
+        return
+
+    print(f"{len(pages)} page(s), {args.iterations} itérations")
+
+    differences = check_equivalence(pages)
+    print(f"Équivalence des champs: {'OK' if differences == 0 else f'{differences} différence(s)'}")
+
+    results = {}
+    for name, parse in (("ancien (BS4 + lxml)", parse_annonce_html_legacy), ("compilé (fnaim_parser)", parse_annonce)):
+        results[name] = (measure_throughput(parse, pages, args.iterations), measure_memory(parse, pages))
+
+    print(f"{'Implémentation':<26}{'pages/s':>12}{'Ko Python/page':>16}")
+    for name, (pages_per_second, memory) in results.items():
+        print(f"{name:<26}{pages_per_second:>12.1f}{memory:>16.1f}")
+
+    (old_pps, old_mem), (new_pps, new_mem) = results.values()
+    print(f"Accélération: x{new_pps / old_pps:.2f}, mémoire: x{new_mem / old_mem:.2f}")
+
+if __name__ == "__main__":
+    main()
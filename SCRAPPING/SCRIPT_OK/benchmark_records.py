@@ -0,0 +1,176 @@
+"""
+Benchmark de l'accumulation des résultats du scraper FNAIM.
+
+Simule un crawl synthétique (sans réseau) de N annonces et compare :
+- l'ancienne accumulation : deux DataFrames d'une ligne par annonce, pd.concat
+  par page puis pd.concat du DataFrame global à chaque page ;
+- l'accumulation par enregistrements (fnaim_records) de CrawlAccumulator, où
+  les DataFrames ne sont construits qu'une fois, à la fin.
+
+Chaque variante s'exécute dans un processus séparé pour mesurer son pic de
+mémoire résidente (RSS) et son temps CPU.
+
+Usage :
+    python benchmark_records.py [--listings N] [--page-size N] [--agencies N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from fnaim_parser import parse_agence, parse_annonce
+from fnaim_records import AgenceRecord, AnnonceRecord, collect_results
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_URL = "https://www.fnaim.fr/annonce-immobiliere/52367367/4333-acheter-appartement-rennes-35000.htm"
+
+####
+#    DONNÉES SYNTHÉTIQUES    #
+####
+def synthetic_pages(listings, page_size, agencies):
+    """
+    Génère les résultats (data_annonce, data_agence) d'un crawl page par page,
+    à partir des fixtures : chaque annonce a sa propre URL et sa référence,
+    et les annonces sont réparties sur `agencies` agences.
+    """
+    with open(os.path.join(FIXTURES_DIR, "annonce_fnaim.html"), "rb") as f:
+        data_annonce, data_agence, _ = parse_annonce(f.read(), FIXTURE_URL)
+    with open(os.path.join(FIXTURES_DIR, "agence_fnaim.html"), "rb") as f:
+        data_agence.update(parse_agence(f.read()))
+
+    for start in range(0, listings, page_size):
+        page = []
+        for i in range(start, min(start + page_size, listings)):
+            agency_id = str(4000 + i % agencies)
+            annonce = dict(data_annonce, url=f"{FIXTURE_URL}?n={i}", reference=f"REF{i}",
+                           agency_id=agency_id, images=list(data_annonce['images']))
+            agence = dict(data_agence, agency_id=agency_id)
+            page.append((annonce, agence))
+        yield page
+
+####
+#    VARIANTES    #
+####
+def run_dataframes(listings, page_size, agencies):
+    """Ancienne accumulation : DataFrames d'une ligne et concaténations répétées."""
+    all_annonces_df = pd.DataFrame()
+    all_agences_df = pd.DataFrame()
+
+    for page in synthetic_pages(listings, page_size, agencies):
+        all_annonces = []
+        all_agences = []
+        for data_annonce, data_agence in page:
+            df_annonce = pd.DataFrame([data_annonce])
+            df_agence = pd.DataFrame([data_agence])
+            if not df_annonce.empty:
+                all_annonces.append(df_annonce)
+            if not df_agence.empty and df_agence['agency_id'].iloc[0] is not None:
+                all_agences.append(df_agence)
+
+        df_annonces = pd.concat(all_annonces, ignore_index=True) if all_annonces else pd.DataFrame()
+        df_agences = pd.concat(all_agences, ignore_index=True) if all_agences else pd.DataFrame()
+        if not df_agences.empty:
+            df_agences = df_agences.drop_duplicates(subset='agency_id', keep='first')
+
+        if not df_annonces.empty:
+            all_annonces_df = pd.concat([all_annonces_df, df_annonces], ignore_index=True)
+        if not df_agences.empty:
+            if all_agences_df.empty:
+                all_agences_df = df_agences
+            else:
+                new_agencies = df_agences[~df_agences['agency_id'].isin(all_agences_df['agency_id'])]
+                all_agences_df = pd.concat([all_agences_df, new_agencies], ignore_index=True)
+
+    return all_annonces_df, all_agences_df
+
+def run_records(listings, page_size, agencies):
+    """Accumulation par enregistrements de CrawlAccumulator, DataFrames construits à la fin."""
+    from fnaim_scraper import CrawlAccumulator
+
+    accumulator = CrawlAccumulator(save_interval=listings + 1)
+    for page_number, page in enumerate(synthetic_pages(listings, page_size, agencies), start=1):
+        results = [(AnnonceRecord(**data_annonce), AgenceRecord(**data_agence)) for data_annonce, data_agence in page]
+        annonces, agences = collect_results(results)
+        accumulator.add_page(page_number, annonces, agences)
+
+    return accumulator.annonces_df, accumulator.agences_df
+
+VARIANTS = {
+    "dataframes": ("ancien (DataFrames)", run_dataframes),
+    "records": ("enregistrements", run_records),
+}
+
+####
+#    MESURES    #
+####
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus en Mo (None si indisponible)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Ko sous Linux, octets sous macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_variant(name, listings, page_size, agencies):
+    """Exécute une variante dans le processus courant et affiche ses mesures en JSON."""
+    _, run = VARIANTS[name]
+    rss_before = peak_rss_mb()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    df_annonces, df_agences = run(listings, page_size, agencies)
+    print(json.dumps({
+        'cpu': time.process_time() - cpu_start,
+        'wall': time.perf_counter() - wall_start,
+        'rss_before': rss_before,
+        'rss_peak': peak_rss_mb(),
+        'annonces': df_annonces.shape,
+        'agences': df_agences.shape,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'accumulation des résultats du scraper FNAIM")
+    parser.add_argument("--listings", type=int, default=10000, help="Nombre d'annonces du crawl synthétique")
+    parser.add_argument("--page-size", type=int, default=12, help="Nombre d'annonces par page de résultats")
+    parser.add_argument("--agencies", type=int, default=300, help="Nombre d'agences distinctes")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.listings, args.page_size, args.agencies)
+        return
+
+    print(f"Crawl synthétique: {args.listings} annonces, {args.page_size} par page, {args.agencies} agences")
+    results = {}
+    for name, (label, _) in VARIANTS.items():
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--variant", name,
+             "--listings", str(args.listings), "--page-size", str(args.page_size),
+             "--agencies", str(args.agencies)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results[label] = json.loads(output.strip().splitlines()[-1])
+
+    shapes = {tuple(r['annonces']) for r in results.values()} | {tuple(r['agences']) for r in results.values()}
+    print(f"Résultats identiques (dimensions): {'OK' if len(shapes) == 2 else 'NON'}")
+
+    print(f"{'Accumulation':<24}{'CPU (s)':>10}{'Durée (s)':>12}{'Pic RSS (Mo)':>14}")
+    for label, r in results.items():
+        rss = f"{r['rss_peak']:.1f}" if r['rss_peak'] is not None else "n/d"
+        print(f"{label:<24}{r['cpu']:>10.2f}{r['wall']:>12.2f}{rss:>14}")
+
+    old, new = results.values()
+    print(f"Accélération CPU: x{old['cpu'] / new['cpu']:.1f}")
+    if old['rss_peak'] is not None:
+        print(f"Pic RSS: {old['rss_peak']:.1f} Mo -> {new['rss_peak']:.1f} Mo")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Rejeu hors ligne d'un corpus HTML enregistré (voir fnaim_corpus).
+
+Mesure, sans aucune requête vers fnaim.fr :
+- le débit du parsing seul (fnaim_parser) sur les fiches annonces du corpus ;
+- le débit du rejeu complet (scrapping_urls puis scrapping_annonce via process_page_urls).
+
+Pour tester une modification du parser, enregistrer d'abord une référence
+(--save-baseline), puis comparer les résultats du rejeu à cette référence.
+
+Enregistrement d'un corpus : scrapping_fnaim(..., response_hooks=[HtmlCorpus(dossier).record_response])
+(voir record_corpus dans SCRAPPING_FNAIM_V3).
+
+Usage :
+    python benchmark_replay.py --corpus DOSSIER [--workers N] [--iterations N]
+                               [--baseline FICHIER [--save-baseline]]
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from fnaim_corpus import PAGE_ANNONCE, HtmlCorpus, replay_crawl
+from fnaim_parser import parse_annonce
+from fnaim_records import record_to_dict
+
+# Champs variables d'un passage à l'autre, exclus de la comparaison
+VOLATILE_FIELDS = ('date_scrape', 'statut_crawl')
+
+####
+#    RÉFÉRENCE DES RÉSULTATS    #
+####
+def record_fingerprints(annonces):
+    """Empreinte des champs extraits de chaque annonce, par URL."""
+    fingerprints = {}
+    for annonce in annonces:
+        data = {k: v for k, v in record_to_dict(annonce).items() if k not in VOLATILE_FIELDS}
+        fingerprints[annonce.url] = hashlib.sha256(
+            json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+    return fingerprints
+
+def compare_fingerprints(baseline, current):
+    """Retourne (annonces modifiées, manquantes, nouvelles) par rapport à la référence."""
+    modified = [url for url in current if url in baseline and baseline[url] != current[url]]
+    missing = [url for url in baseline if url not in current]
+    new = [url for url in current if url not in baseline]
+    return modified, missing, new
+
+####
+#    MESURES    #
+####
+def measure_parsing(corpus, iterations):
+    """Débit du parsing seul des fiches annonces du corpus (pages par seconde)."""
+    pages = []
+    for url in corpus.urls(PAGE_ANNONCE):
+        entry, content = corpus.get(url)
+        if entry['status'] == 200:
+            pages.append((url, content))
+    if not pages:
+        return 0, 0.0
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for url, content in pages:
+            parse_annonce(content, url)
+    return len(pages), len(pages) * iterations / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejeu hors ligne d'un corpus HTML FNAIM")
+    parser.add_argument("--corpus", required=True, help="Dossier du corpus enregistré")
+    parser.add_argument("--workers", type=int, default=1, help="Threads de traitement des annonces pendant le rejeu")
+    parser.add_argument("--iterations", type=int, default=20, help="Nombre de passes pour le parsing seul")
+    parser.add_argument("--baseline", help="Fichier JSON de référence des résultats")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistrer les résultats comme référence")
+    args = parser.parse_args()
+
+    corpus = HtmlCorpus(args.corpus)
+    if not len(corpus):
+        print(f"Corpus vide: {args.corpus}")
+        return
+    print(f"Corpus: {len(corpus)} pages")
+
+    nb_pages, pages_per_second = measure_parsing(corpus, args.iterations)
+    print(f"Parsing seul: {nb_pages} fiches, {pages_per_second:.1f} fiches/s")
+
+    annonces, agences, stats = replay_crawl(corpus, max_workers=args.workers)
+    print(f"Rejeu complet: {stats['pages_resultats']} pages de résultats, {stats['annonces']} annonces, "
+          f"{stats['agences']} agences en {stats['duree_s']:.2f}s (CPU {stats['cpu_s']:.2f}s), "
+          f"{stats['annonces_par_s']:.1f} annonces/s")
+    if stats['absentes_du_corpus']:
+        print(f"Attention: {stats['absentes_du_corpus']} requêtes absentes du corpus")
+
+    if not args.baseline:
+        return
+
+    fingerprints = record_fingerprints(annonces)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(fingerprints, f, indent=1, sort_keys=True)
+        print(f"Référence enregistrée: {args.baseline} ({len(fingerprints)} annonces)")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"Référence introuvable: {args.baseline}")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    modified, missing, new = compare_fingerprints(baseline, fingerprints)
+    print(f"Comparaison à la référence: {len(modified)} modifiée(s), {len(missing)} manquante(s), {len(new)} nouvelle(s)")
+    for url in modified[:10]:
+        print(f"  modifiée: {url}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Cache des pages agences pour SCRAPPING_FNAIM_V3.
+
+Une même agence publie généralement des dizaines d'annonces : sans cache, sa
+page est téléchargée une fois par annonce. AgencyCache garantit une seule
+requête par agence et par exécution (ou par TTL si le cache est persisté) :
+- clé = agency_id, ou l'URL complète de l'agence à défaut ;
+- "single-flight" : les demandes concurrentes pour une agence en cours de
+  récupération attendent le résultat de la première au lieu de refaire la requête ;
+- persistance optionnelle dans un fichier JSON, avec une durée de validité (TTL).
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+def agency_cache_key(agency_id, full_agency_url):
+    """Clé de cache d'une agence : son identifiant, ou son URL à défaut."""
+    return str(agency_id) if agency_id else full_agency_url
+
+class AgencyCache:
+    """
+    Cache thread-safe (et utilisable depuis asyncio) des détails d'agences.
+
+    Args:
+        path (str): Fichier JSON de persistance (None = cache en mémoire uniquement)
+        ttl (float): Durée de validité d'une entrée en secondes (None = illimitée)
+    """
+    def __init__(self, path=None, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._in_flight = {}
+        self._async_in_flight = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def _is_fresh(self, fetched_at):
+        return self.ttl is None or time.time() - fetched_at < self.ttl
+
+    def _lookup(self, key):
+        """Retourne une copie des détails si l'entrée est valide (appelé sous verrou)."""
+        entry = self._entries.get(key)
+        if entry is not None and self._is_fresh(entry[0]):
+            self.hits += 1
+            return dict(entry[1])
+        return None
+
+    def _store(self, key, details):
+        with self._lock:
+            self._entries[key] = (time.time(), dict(details))
+
+    def get(self, key):
+        """Retourne les détails en cache pour une clé, ou None."""
+        with self._lock:
+            return self._lookup(key)
+
+    def fetched_at(self, key):
+        """Date de récupération (secondes) de l'entrée `key`, ou None si elle est absente."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key, details, fetched_at=None):
+        """
+        Ajoute ou remplace une entrée du cache. Avec une date de récupération
+        explicite, une entrée existante plus récente est conservée.
+        Retourne True si l'entrée a été ajoutée.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if fetched_at is not None and entry is not None and entry[0] >= fetched_at:
+                return False
+            self._entries[key] = (fetched_at or time.time(), dict(details))
+            return True
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Retourne les détails de l'agence `key`, en appelant fetch() au plus une
+        fois même si plusieurs threads la demandent simultanément.
+        Les erreurs de fetch() sont propagées à tous les demandeurs et ne sont pas mises en cache.
+        """
+        with self._lock:
+            details = self._lookup(key)
+            if details is not None:
+                return details
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not owner:
+            return dict(future.result())
+
+        try:
+            details = fetch()
+            self._store(key, details)
+            future.set_result(details)
+            return dict(details)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    async def get_or_fetch_async(self, key, fetch):
+        """
+        Équivalent asyncio de get_or_fetch : `fetch` est une fonction sans
+        argument qui retourne une coroutine.
+        """
+        with self._lock:
+            details = self._lookup(key)
+            if details is not None:
+                return details
+            future = self._async_in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = asyncio.get_running_loop().create_future()
+                self._async_in_flight[key] = future
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not owner:
+            return dict(await asyncio.shield(future))
+
+        try:
+            details = await fetch()
+            self._store(key, details)
+            future.set_result(details)
+            return dict(details)
+        except Exception as e:
+            future.set_exception(e)
+            # Évite l'avertissement "exception never retrieved" s'il n'y a pas d'autre demandeur
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                self._async_in_flight.pop(key, None)
+
+    def load(self):
+        """Charge les entrées encore valides depuis le fichier de persistance."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cache agences illisible ({self.path}), ignoré: {e}")
+            return
+
+        with self._lock:
+            for key, entry in data.items():
+                if self._is_fresh(entry['fetched_at']):
+                    self._entries[key] = (entry['fetched_at'], entry['details'])
+        logger.info(f"Cache agences chargé: {len(self._entries)} agences valides")
+
+    def save(self):
+        """Écrit les entrées valides dans le fichier de persistance (écriture atomique)."""
+        if not self.path:
+            return
+
+        with self._lock:
+            data = {
+                key: {'fetched_at': fetched_at, 'details': details}
+                for key, (fetched_at, details) in self._entries.items()
+                if self._is_fresh(fetched_at)
+            }
+
+        # Un seul écrivain à la fois (cache partagé entre plusieurs crawls simultanés)
+        with self._save_lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Résumé des statistiques du cache pour les logs."""
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0
+        return f"{len(self)} agences en cache, {self.misses} requêtes, {self.hits} évitées ({ratio:.0%})"
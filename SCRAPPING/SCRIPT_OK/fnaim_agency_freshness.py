@@ -0,0 +1,161 @@
+"""
+Politique de fraîcheur des agences déjà connues en base.
+
+Le téléphone, le SIRET, la carte professionnelle et les représentants légaux
+d'une agence changent rarement. AgencyFreshnessIndex charge au démarrage du crawl
+les agences de la table MySQL `agences` (ou de la collection MongoDB `agences`,
+voir data_processing_V2) et pré-remplit l'AgencyCache avec celles dont la
+dernière récupération est plus récente que `max_age` : leur page agence n'est
+alors pas re-téléchargée (complete_annonce les trouve dans le cache).
+
+La date de récupération est `details_fetched_at`, et non `date_scrape` : date_scrape
+est la date du crawl, renouvelée à chaque passage même quand les détails viennent
+du cache. Une agence servie par le cache garde la date de son entrée, et expire
+donc bien après `max_age`.
+
+Les agences sans aucun détail en base (récupération précédente en échec) sont
+ignorées et donc re-téléchargées.
+"""
+import datetime
+import logging
+import os
+
+from fnaim_agency_cache import agency_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Détails issus de la page agence (voir fnaim_parser.parse_agence)
+DETAIL_FIELDS = ('agency_phone', 'agency_siret', 'agency_card_number', 'agency_legal_reps')
+
+# Colonnes correspondantes de la table MySQL agences
+MYSQL_COLUMNS = {
+    'agency_phone': 'telephone',
+    'agency_siret': 'siret',
+    'agency_card_number': 'carte_pro',
+    'agency_legal_reps': 'representant_legal',
+}
+
+# Âge maximal par défaut d'une agence connue : 30 jours
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+
+def _timestamp(value):
+    """Horodatage (secondes) d'une date MySQL/MongoDB ou d'une chaîne ISO, ou None."""
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    try:
+        return datetime.datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+class AgencyFreshnessIndex:
+    """
+    Index en mémoire des agences connues : agency_id -> (date de récupération, détails).
+
+    Args:
+        max_age (float): Âge maximal en secondes d'une agence considérée comme à jour
+    """
+    def __init__(self, max_age=DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self.agencies = {}
+
+    def add(self, agency_id, fetched_at, details):
+        """Ajoute une agence connue ; la récupération la plus récente est conservée."""
+        if agency_id is None or fetched_at is None:
+            return
+        if not any(details.get(name) for name in DETAIL_FIELDS):
+            return
+        key = str(agency_id)
+        known = self.agencies.get(key)
+        if known is None or fetched_at > known[0]:
+            self.agencies[key] = (fetched_at, {name: details.get(name) for name in DETAIL_FIELDS})
+
+    ####
+    #    CHARGEMENT DEPUIS LES BASES    #
+    ####
+    def load_mysql(self, connection):
+        """Charge les agences de la table MySQL agences. Retourne le nombre d'agences lues."""
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                f"SELECT id, details_fetched_at, {', '.join(MYSQL_COLUMNS.values())} FROM agences "
+                f"WHERE details_fetched_at IS NOT NULL"
+            )
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        for agency_id, details_fetched_at, *values in rows:
+            self.add(agency_id, _timestamp(details_fetched_at), dict(zip(MYSQL_COLUMNS, values)))
+        return len(rows)
+
+    def load_mongodb(self, db):
+        """Charge les agences de la collection MongoDB agences. Retourne le nombre d'agences lues."""
+        projection = {name: 1 for name in ('agency_id', 'details_fetched_at') + DETAIL_FIELDS}
+        count = 0
+        for document in db["agences"].find({}, projection):
+            self.add(document.get('agency_id', document.get('_id')), _timestamp(document.get('details_fetched_at')), document)
+            count += 1
+        return count
+
+    def load_from_env(self, source="mysql"):
+        """
+        Se connecte à la base `source` ("mysql" ou "mongodb") avec les variables
+        d'environnement de data_processing_V2 et charge les agences connues.
+        En cas d'erreur (pilote absent, base injoignable), l'index reste vide.
+        """
+        if source not in ("mysql", "mongodb"):
+            raise ValueError(f"Source d'agences inconnue: {source}")
+        try:
+            if source == "mysql":
+                import mysql.connector
+                connection = mysql.connector.connect(
+                    host=os.getenv("MYSQL_HOST", "localhost"),
+                    user=os.getenv("MYSQL_USER", "root"),
+                    password=os.getenv("MYSQL_PASSWORD", ""),
+                    database="immobilier_fnaim"
+                )
+                try:
+                    count = self.load_mysql(connection)
+                finally:
+                    connection.close()
+            else:
+                import pymongo
+                client = pymongo.MongoClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017/"),
+                                             serverSelectionTimeoutMS=5000)
+                try:
+                    count = self.load_mongodb(client[os.getenv("MONGODB_DATABASE", "immobilier_fnaim")])
+                finally:
+                    client.close()
+        except ImportError as e:
+            logger.warning(f"Pilote {source} non installé ({e}) : les pages agences seront toutes téléchargées")
+            return 0
+        except Exception as e:
+            logger.warning(f"Impossible de charger les agences connues depuis {source}: {e}")
+            return 0
+
+        logger.info(f"Agences connues chargées depuis {source}: {count} lues, {len(self.agencies)} avec détails")
+        return count
+
+    ####
+    #    POLITIQUE DE FRAÎCHEUR    #
+    ####
+    def is_fresh(self, agency_id, now=None):
+        known = self.agencies.get(str(agency_id))
+        now = now if now is not None else datetime.datetime.now().timestamp()
+        return known is not None and now - known[0] < self.max_age
+
+    def prime(self, agency_cache, now=None):
+        """
+        Ajoute à l'AgencyCache les agences à jour, avec leur date de récupération.
+        Retourne le nombre d'agences ajoutées.
+        """
+        now = now if now is not None else datetime.datetime.now().timestamp()
+        primed = 0
+        for key, (fetched_at, details) in self.agencies.items():
+            if now - fetched_at < self.max_age:
+                if agency_cache.put(agency_cache_key(key, None), details, fetched_at=fetched_at):
+                    primed += 1
+        logger.info(f"Fraîcheur des agences: {primed}/{len(self.agencies)} agences à jour, pages non re-téléchargées")
+        return primed
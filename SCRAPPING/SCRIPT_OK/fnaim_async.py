@@ -0,0 +1,375 @@
+"""
+Moteur de scraping asyncio pour SCRAPPING_FNAIM_V3.
+
+Alternative au ThreadPoolExecutor de scrapping_fnaim : des centaines de
+requêtes (fiches annonces et pages agences) restent en vol, sous une limite
+de concurrence par hôte et un rate limit global en seau à jetons.
+Produit les mêmes DataFrames (df_annonces, df_agences) que le moteur à threads.
+
+Nécessite aiohttp (pip install aiohttp).
+"""
+import asyncio
+import datetime
+import random
+import time
+from urllib.parse import urlparse
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from fnaim_agency_cache import AgencyCache, agency_cache_key
+from fnaim_crawl_state import content_fingerprint
+from fnaim_records import AgenceRecord, AnnonceRecord, collect_results
+from fnaim_scraper import (
+    CrawlAccumulator,
+    create_checkpoint,
+    extract_annonce_urls,
+    finish_crawl_state,
+    logger,
+    parse_agence_html,
+    parse_annonce_html,
+)
+
+# Codes HTTP pour lesquels une nouvelle tentative est effectuée
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3',
+    'Referer': 'https://www.fnaim.fr/',
+}
+
+####
+#    LIMITATION DU DÉBIT    #
+####
+class TokenBucket:
+    """
+    Rate limit en seau à jetons : `rate` requêtes par seconde en régime établi,
+    avec des rafales d'au plus `capacity` requêtes.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Attend qu'un jeton soit disponible puis le consomme."""
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+
+class AsyncFetcher:
+    """
+    Client HTTP asynchrone : rate limit global, sémaphore par hôte et
+    nouvelles tentatives avec backoff exponentiel (respecte Retry-After).
+    """
+    def __init__(self, session, rate_limiter, per_host_limit=20, max_retries=3):
+        if max_retries < 1:
+            raise ValueError(f"max_retries doit être au moins 1 (reçu: {max_retries})")
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.per_host_limit = per_host_limit
+        self.max_retries = max_retries
+        self._host_semaphores = {}
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_semaphores[host]
+
+    async def get(self, url, timeout=30):
+        """Retourne (status_code, contenu) pour une URL."""
+        status, content, _ = await self.get_with_headers(url, timeout=timeout)
+        return status, content
+
+    async def get_with_headers(self, url, timeout=30, headers=None):
+        """
+        Retourne (status_code, contenu, en-têtes de réponse) pour une URL,
+        en envoyant les en-têtes de requête supplémentaires `headers`.
+        """
+        response_headers = {}
+        for attempt in range(self.max_retries):
+            await self.rate_limiter.acquire()
+            retry_after = None
+            try:
+                async with self._host_semaphore(url):
+                    async with self.session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                        content = await response.read()
+                        status = response.status
+                        response_headers = response.headers
+                        retry_after = response.headers.get('Retry-After')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                logger.warning(f"Erreur réseau pour {url} - tentative {attempt+1}/{self.max_retries}: {e}")
+                status, content = None, None
+
+            if status is not None and (status not in RETRY_STATUSES or attempt == self.max_retries - 1):
+                return status, content, response_headers
+
+            # Attente exponentielle avec élément aléatoire, ou délai imposé par le serveur
+            if retry_after and retry_after.isdigit():
+                sleep_time = float(retry_after)
+            else:
+                sleep_time = (2 ** attempt) + random.uniform(0, 1)
+            await asyncio.sleep(sleep_time)
+
+        return status, content, response_headers
+
+####
+#    SCRAPING ASYNCHRONE D'UNE ANNONCE    #
+####
+async def fetch_agency_details_async(fetcher, full_agency_url, timeout=45):
+    """Télécharge et analyse la page d'une agence."""
+    status, content = await fetcher.get(full_agency_url, timeout=timeout)
+    if status != 200:
+        raise RuntimeError(f"Status code {status} pour {full_agency_url}")
+    return parse_agence_html(content)
+
+async def scrapping_annonce_async(fetcher, url_annonce, timeout=30, agency_cache=None, crawl_state=None):
+    """
+    Équivalent asynchrone de scrapping_annonce : fiche annonce puis page agence,
+    via le cache d'agences s'il est fourni. Avec crawl_state, les annonces
+    inchangées depuis le dernier passage retournent (None, None).
+    """
+    headers = crawl_state.conditional_headers(url_annonce) if crawl_state is not None else None
+    status, content, response_headers = await fetcher.get_with_headers(url_annonce, timeout=timeout, headers=headers)
+
+    if crawl_state is not None and status == 304:
+        crawl_state.mark_not_modified()
+        return None, None
+    if status != 200:
+        raise RuntimeError(f"Status code {status} pour {url_annonce}")
+
+    if crawl_state is not None:
+        content_hash = content_fingerprint(content)
+        if crawl_state.is_unchanged(url_annonce, content_hash):
+            return None, None
+
+    data_annonce, data_agence, full_agency_url = parse_annonce_html(content, url_annonce)
+
+    if full_agency_url:
+        try:
+            fetched_at = None
+            if agency_cache is not None:
+                key = agency_cache_key(data_agence['agency_id'], full_agency_url)
+                agency_data = await agency_cache.get_or_fetch_async(
+                    key, lambda: fetch_agency_details_async(fetcher, full_agency_url, timeout * 1.5)
+                )
+                fetched_at = agency_cache.fetched_at(key)
+            else:
+                agency_data = await fetch_agency_details_async(fetcher, full_agency_url, timeout * 1.5)
+            data_agence.update(agency_data)
+            data_agence['details_fetched_at'] = datetime.datetime.fromtimestamp(fetched_at or time.time())
+        except Exception as e:
+            logger.warning(f"Erreur lors de la récupération des détails de l'agence {full_agency_url}: {e}")
+
+    if crawl_state is not None:
+        data_annonce['statut_crawl'] = crawl_state.stage(
+            url_annonce, response_headers.get('ETag'), response_headers.get('Last-Modified'), content_hash
+        )
+
+    return AnnonceRecord(**data_annonce), AgenceRecord(**data_agence)
+
+async def fetch_announcement_async(fetcher, url_annonce, in_flight, timeout=30, agency_cache=None, crawl_state=None):
+    """
+    Scrape une annonce en libérant son emplacement de concurrence à la fin.
+    Retourne (None, None) en cas d'échec, comme fetch_announcement.
+    """
+    try:
+        return await scrapping_annonce_async(
+            fetcher, url_annonce, timeout=timeout, agency_cache=agency_cache, crawl_state=crawl_state
+        )
+    except Exception as e:
+        logger.error(f"Abandon de {url_annonce}: {e}")
+        return None, None
+    finally:
+        in_flight.release()
+
+async def _process_page_async(page_number, urls, listing_tasks, accumulator, previous_page=None):
+    """
+    Attend les annonces d'une page et transmet le résultat à l'accumulateur,
+    après la page précédente : le journal de reprise reste ainsi dans l'ordre des pages.
+    Si la page précédente a échoué, son exception est propagée sans enregistrer
+    cette page, pour que la reprise reparte de la page en échec.
+    """
+    results = await asyncio.gather(*listing_tasks)
+    if previous_page is not None:
+        await previous_page
+
+    try:
+        annonces, agences = collect_results(results)
+        accumulator.add_page(page_number, annonces, agences, urls)
+    except Exception as e:
+        logger.error(f"Page {page_number} non enregistrée: {e}")
+        raise
+    logger.info(f"Page {page_number} terminée: {len(annonces)} annonces")
+
+####
+#    SCRAPING PRINCIPAL ASYNCHRONE    #
+####
+async def scrapping_fnaim_async(base_url, accumulator, max_retries=3, max_pages=None,
+                                max_concurrency=200, per_host_limit=20, rate_limit=10.0,
+                                burst=20, timeout=30, agency_cache=None, crawl_state=None,
+                                start_page=1, all_urls_processed=None):
+    """
+    Parcourt les pages de résultats et scrape les annonces de façon asynchrone.
+
+    Les pages sont découvertes séquentiellement, mais les annonces d'une page
+    sont lancées sans attendre celles de la page précédente : jusqu'à
+    `max_concurrency` annonces restent en vol, et le parcours des pages se met
+    en attente lorsque cette limite est atteinte.
+
+    Args:
+        base_url (str): URL de base pour la recherche
+        accumulator (CrawlAccumulator): Accumulateur des résultats
+        max_retries (int): Nombre maximum de tentatives par requête
+        max_pages (int): Nombre maximum de pages à scraper (None = illimité)
+        max_concurrency (int): Nombre maximum d'annonces en vol
+        per_host_limit (int): Nombre maximum de requêtes simultanées par hôte
+        rate_limit (float): Nombre moyen de requêtes par seconde
+        burst (int): Taille maximale des rafales du seau à jetons
+        timeout (int): Timeout d'une requête en secondes
+        agency_cache (AgencyCache): Cache des pages agences
+        crawl_state (CrawlState): État du crawl précédent pour un re-crawl incrémental
+        start_page (int): Première page à scraper (reprise d'un crawl interrompu)
+        all_urls_processed (set): URLs déjà traitées lors d'un passage interrompu
+
+    Returns:
+        tuple: (toutes les pages de résultats parcourues, parcours terminé sans interruption)
+    """
+    if aiohttp is None:
+        raise ImportError("Le moteur asynchrone nécessite aiohttp (pip install aiohttp)")
+
+    all_urls_processed = set(all_urls_processed or ())
+    page_tasks = []
+    page_errors = []
+    in_flight = asyncio.Semaphore(max_concurrency)
+    crawl_complete = False
+    finished = False
+    connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=per_host_limit)
+
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS) as session:
+        fetcher = AsyncFetcher(session, TokenBucket(rate_limit, burst), per_host_limit, max_retries)
+
+        page_number = start_page
+        try:
+            while max_pages is None or page_number <= max_pages:
+                url_page = f"{base_url}&ip={page_number}"
+
+                # 1. Extraire les URLs des annonces de la page courante
+                try:
+                    status_code, content = await fetcher.get(url_page, timeout=timeout)
+                except Exception as e:
+                    logger.error(f"Erreur lors de la récupération de la page {page_number}: {e}")
+                    status_code, content = 0, None
+                urls_annonces = extract_annonce_urls(content) if status_code == 200 else []
+
+                if not urls_annonces:
+                    logger.info(f"Aucune annonce trouvée ou erreur à la page {page_number} (status: {status_code}). Fin du scraping.")
+                    crawl_complete = status_code == 200
+                    finished = crawl_complete
+                    break
+
+                if crawl_state is not None:
+                    crawl_state.mark_seen(urls_annonces)
+
+                # 2. Filtrer les URLs déjà traitées
+                urls_to_process = [url for url in urls_annonces if url not in all_urls_processed]
+                all_urls_processed.update(urls_to_process)
+                logger.info(f"Page {page_number}: {len(urls_to_process)}/{len(urls_annonces)} nouvelles annonces à traiter")
+
+                # 3. Lancer les annonces sans attendre la fin de la page
+                listing_tasks = []
+                for url in urls_to_process:
+                    await in_flight.acquire()
+                    listing_tasks.append(asyncio.create_task(
+                        fetch_announcement_async(
+                            fetcher, url, in_flight, timeout=timeout,
+                            agency_cache=agency_cache, crawl_state=crawl_state
+                        )
+                    ))
+                page_tasks.append(asyncio.create_task(
+                    _process_page_async(
+                        page_number, urls_to_process, listing_tasks, accumulator,
+                        page_tasks[-1] if page_tasks else None
+                    )
+                ))
+
+                page_number += 1
+            else:
+                # Nombre maximum de pages atteint
+                finished = True
+        finally:
+            # Attendre les annonces encore en vol avant de fermer la session
+            if page_tasks:
+                results = await asyncio.gather(*page_tasks, return_exceptions=True)
+                # Une page en échec propage la même exception aux pages suivantes
+                for result in results:
+                    if isinstance(result, BaseException) and not any(result is error for error in page_errors):
+                        page_errors.append(result)
+
+    if page_errors:
+        raise RuntimeError(f"{len(page_errors)} erreur(s) lors de l'enregistrement des pages") from page_errors[0]
+    return crawl_complete, finished
+
+def run_scrapping_fnaim_async(base_url, max_retries=3, max_pages=None, save_interval=5, agency_cache=None,
+                              crawl_state=None, checkpoint=None, resume=True, output=None, **options):
+    """
+    Point d'entrée synchrone du moteur asynchrone, utilisé par
+    scrapping_fnaim(engine="async").
+
+    Returns:
+        tuple: (DataFrame des annonces, DataFrame des agences)
+    """
+    if checkpoint is None:
+        checkpoint = create_checkpoint(base_url)
+    accumulator = CrawlAccumulator(save_interval, journal=checkpoint, output=output, crawl_state=crawl_state)
+    start_page, all_urls_processed = accumulator.start(resume)
+    if agency_cache is None:
+        agency_cache = AgencyCache()
+    crawl_complete = False
+    finished = False
+    if crawl_state is not None:
+        crawl_state.start_run()
+        crawl_state.mark_seen(all_urls_processed)
+
+    try:
+        crawl_complete, finished = asyncio.run(scrapping_fnaim_async(
+            base_url, accumulator, max_retries=max_retries, max_pages=max_pages,
+            agency_cache=agency_cache, crawl_state=crawl_state,
+            start_page=start_page, all_urls_processed=all_urls_processed, **options
+        ))
+
+    except KeyboardInterrupt:
+        logger.warning("Interruption utilisateur. Sauvegarde des données collectées...")
+        accumulator.save("interrupt")
+
+    except Exception as e:
+        logger.error(f"Erreur lors du scraping: {e}")
+        accumulator.save("error")
+
+    finally:
+        # Toujours sauvegarder à la fin
+        accumulator.finish(finished)
+        agency_cache.save()
+        logger.info(f"Cache agences: {agency_cache.stats()}")
+        if crawl_state is not None:
+            finish_crawl_state(crawl_state, crawl_complete)
+
+        logger.info(f"Scraping terminé. {len(accumulator.annonces)} annonces et {len(accumulator.agences)} agences récupérées.")
+
+    return accumulator.annonces_df, accumulator.agences_df
@@ -0,0 +1,150 @@
+"""
+Journal de reprise du crawl FNAIM.
+
+Remplace les sauvegardes CSV complètes de save_progress, qui réécrivaient
+toutes les données collectées tous les save_interval pages (I/O quadratiques
+sur un long crawl) et ne permettaient pas de reprendre après un arrêt.
+
+Le journal est un répertoire par URL de recherche, en ajout seul :
+- segments/segment_000001.jsonl, ... : un segment par sauvegarde, une ligne
+  JSON par page ({"page", "urls", "annonces", "agences"}) ;
+- cursor.json : dernière page terminée et nombre de segments valides, réécrit
+  de façon atomique après chaque segment.
+
+Un segment écrit mais absent du curseur (arrêt entre les deux écritures) est
+ignoré à la reprise puis écrasé. Lorsqu'un crawl se termine normalement, le
+curseur est marqué complet et le passage suivant repart de la page 1.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+CURSOR_FILE = "cursor.json"
+SEGMENTS_DIR = "segments"
+
+class CheckpointJournal:
+    """
+    Journal de reprise d'un crawl.
+
+    Args:
+        root (str): Répertoire racine des journaux
+        base_url (str): URL de recherche du crawl ; chaque URL a son propre journal
+    """
+    def __init__(self, root, base_url):
+        self.base_url = base_url
+        self.directory = os.path.join(root, hashlib.sha1(base_url.encode("utf-8")).hexdigest()[:12])
+        self.segments_dir = os.path.join(self.directory, SEGMENTS_DIR)
+        self.cursor = {'base_url': base_url, 'last_page': 0, 'segments': 0, 'complete': False}
+        self._pending = []
+
+    ####
+    #    CURSEUR    #
+    ####
+    def _cursor_path(self):
+        return os.path.join(self.directory, CURSOR_FILE)
+
+    def _segment_path(self, number):
+        return os.path.join(self.segments_dir, f"segment_{number:06d}.jsonl")
+
+    def _read_cursor(self):
+        try:
+            with open(self._cursor_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Curseur de reprise illisible ({self._cursor_path()}), ignoré: {e}")
+            return None
+
+    def _write_cursor(self):
+        self.cursor['updated_at'] = datetime.datetime.now().isoformat()
+        tmp_path = f"{self._cursor_path()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.cursor, f, ensure_ascii=False)
+        os.replace(tmp_path, self._cursor_path())
+
+    ####
+    #    REPRISE    #
+    ####
+    def resumable(self):
+        """Vrai si un crawl interrompu de la même URL peut être repris."""
+        cursor = self._read_cursor()
+        return bool(cursor) and cursor.get('base_url') == self.base_url and not cursor.get('complete')
+
+    def reset(self):
+        """Supprime les segments existants et démarre un journal vide."""
+        shutil.rmtree(self.segments_dir, ignore_errors=True)
+        os.makedirs(self.segments_dir, exist_ok=True)
+        self.cursor = {'base_url': self.base_url, 'last_page': 0, 'segments': 0, 'complete': False}
+        self._pending = []
+        self._write_cursor()
+
+    def load(self):
+        """
+        Relit les segments valides d'un crawl interrompu.
+
+        Returns:
+            tuple: (dernière page terminée, URLs traitées, annonces, agences),
+            les annonces et agences sous forme de listes de dictionnaires
+        """
+        self.cursor = self._read_cursor()
+        self._pending = []
+        processed_urls = set()
+        annonces = []
+        agences = []
+
+        for number in range(1, self.cursor['segments'] + 1):
+            with open(self._segment_path(number), "r", encoding="utf-8") as f:
+                for line in f:
+                    page = json.loads(line)
+                    processed_urls.update(page['urls'])
+                    annonces.extend(page['annonces'])
+                    agences.extend(page['agences'])
+
+        logger.info(f"Reprise du crawl après la page {self.cursor['last_page']}: "
+                    f"{len(processed_urls)} URLs déjà traitées, {self.cursor['segments']} segments")
+        return self.cursor['last_page'], processed_urls, annonces, agences
+
+    ####
+    #    ÉCRITURE    #
+    ####
+    def add_page(self, page_number, urls, annonces, agences):
+        """Ajoute une page terminée au prochain segment (écrit au prochain flush)."""
+        self._pending.append({
+            'page': page_number,
+            'urls': list(urls),
+            'annonces': annonces,
+            'agences': agences
+        })
+
+    def flush(self):
+        """Écrit les pages en attente dans un nouveau segment puis met à jour le curseur."""
+        if not self._pending:
+            return
+
+        os.makedirs(self.segments_dir, exist_ok=True)
+        number = self.cursor['segments'] + 1
+        tmp_path = f"{self._segment_path(number)}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for page in self._pending:
+                f.write(json.dumps(page, ensure_ascii=False, default=str))
+                f.write("\n")
+        os.replace(tmp_path, self._segment_path(number))
+
+        self.cursor['segments'] = number
+        self.cursor['last_page'] = max(self.cursor['last_page'], max(page['page'] for page in self._pending))
+        self._write_cursor()
+        logger.info(f"Point de reprise: page {self.cursor['last_page']} ({len(self._pending)} pages dans le segment {number})")
+        self._pending = []
+
+    def finish(self):
+        """Marque le crawl comme terminé : le prochain passage repartira de la page 1."""
+        self.flush()
+        self.cursor['complete'] = True
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_cursor()
@@ -0,0 +1,275 @@
+"""
+Contrôle adaptatif de la concurrence (AIMD) pour les sessions requests du scraper FNAIM.
+
+Au lieu d'un nombre fixe de requêtes simultanées (max_workers), la limite de
+requêtes en vol évolue selon les signaux du serveur :
+- augmentation additive (+1 par "fenêtre" de `limit` réponses réussies) ;
+- diminution multiplicative sur 429, erreur 5xx, erreur réseau, ou lorsque la
+  latence médiane à la limite courante dépasse `latency_tolerance` fois celle
+  mesurée à la limite où une diminution ramènerait : monter en concurrence
+  n'apporte alors que de l'attente. La dispersion normale des latences (p95
+  bien au-dessus de p50) ne déclenche rien, puisque seules des médianes sont
+  comparées ;
+- pause de toutes les requêtes pendant la durée d'un en-tête Retry-After.
+
+AdaptiveConcurrencyAdapter applique la limite à toutes les requêtes d'une session
+(voir create_session_with_retry(concurrency=...)) et réessaie lui-même les 429/5xx,
+pour que chaque tentative soit transmise au contrôleur. metrics() expose la limite
+courante et le débit atteint.
+"""
+import datetime
+import email.utils
+import logging
+import threading
+import time
+from collections import deque
+
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Codes HTTP réessayés par AdaptiveConcurrencyAdapter
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def parse_retry_after(value):
+    """Délai en secondes d'un en-tête Retry-After (nombre de secondes ou date HTTP), ou None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_date - datetime.datetime.now(retry_date.tzinfo)).total_seconds())
+
+def percentile(values, q):
+    """Percentile q (0-100) d'une liste de valeurs, par la méthode du rang le plus proche."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class AdaptiveConcurrency:
+    """
+    Limite adaptative de requêtes simultanées, partageable entre threads et sessions.
+
+    Args:
+        initial_limit (int): Limite de départ
+        min_limit (int): Limite minimale
+        max_limit (int): Limite maximale
+        decrease_factor (float): Facteur appliqué à la limite lors d'une diminution
+        latency_tolerance (float): Dégradation de latence tolérée (p50 à la limite courante /
+            p50 à la limite diminuée) ; au-delà de 2, doubler la concurrence fait baisser le débit
+        window (int): Nombre de réponses utilisées pour les percentiles de latence
+        latency_decay (float): Poids de chaque nouvelle médiane dans la latence retenue pour une limite
+        rps_window (float): Fenêtre de calcul du débit en secondes
+    """
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=32, decrease_factor=0.5,
+                 latency_tolerance=1.5, window=100, latency_decay=0.3, rps_window=10.0):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.latency_decay = latency_decay
+        self.rps_window = rps_window
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._latencies = deque(maxlen=window)
+        # Latences des dernières réponses, comparées toutes les `_check_every` réponses réussies
+        self._check_every = min(20, window)
+        self._recent_latencies = []
+        # Limite -> latence médiane observée à cette limite (moyenne mobile exponentielle)
+        self._latency_by_limit = {}
+        self._completions = deque()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+        self.requests = 0
+        self.throttled = 0
+        self.server_errors = 0
+        self.network_errors = 0
+        self.decreases = 0
+
+    ####
+    #    ADMISSION DES REQUÊTES    #
+    ####
+    def acquire(self):
+        """Attend une place sous la limite courante (et la fin d'une éventuelle pause Retry-After)."""
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self._in_flight < int(self.limit):
+                    self._in_flight += 1
+                    return
+                else:
+                    self._cond.wait()
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    ####
+    #    SIGNAUX DU SERVEUR    #
+    ####
+    def observe(self, status, latency, retry_after=None):
+        """
+        Prend en compte une réponse : status HTTP (None pour une erreur réseau),
+        latence en secondes et valeur de l'en-tête Retry-After.
+        """
+        now = time.monotonic()
+        with self._cond:
+            self.requests += 1
+            self._completions.append(now)
+
+            if status is None or status == 429 or status >= 500:
+                if status is None:
+                    self.network_errors += 1
+                elif status == 429:
+                    self.throttled += 1
+                else:
+                    self.server_errors += 1
+
+                delay = parse_retry_after(retry_after)
+                if delay:
+                    self._paused_until = max(self._paused_until, now + delay)
+                    logger.warning(f"Retry-After reçu: pause des requêtes pendant {delay:.0f}s")
+                self._decrease(now, f"status {status}")
+
+            else:
+                self._latencies.append(latency)
+                self._recent_latencies.append(latency)
+                if len(self._recent_latencies) >= self._check_every:
+                    if self._check_latency(now):
+                        self._cond.notify_all()
+                        return
+
+                # Augmentation additive : +1 toutes les `limit` réponses réussies
+                if self.limit < self.max_limit:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            self._cond.notify_all()
+
+    def _check_latency(self, now):
+        """
+        Enregistre la latence médiane des dernières réponses pour la limite courante et la compare
+        à celle de la limite où une diminution ramènerait (appelé sous verrou).
+        Retourne True si la limite a été diminuée.
+        """
+        p50 = percentile(self._recent_latencies, 50)
+        self._recent_latencies = []
+        limit = int(self.limit)
+        previous = self._latency_by_limit.get(limit)
+        # Moyenne mobile : les mesures anciennes à une limite s'effacent quand on y revient
+        self._latency_by_limit[limit] = p50 if previous is None else (
+            (1 - self.latency_decay) * previous + self.latency_decay * p50
+        )
+
+        lower = [known for known in self._latency_by_limit if known <= limit * self.decrease_factor]
+        if not lower:
+            return False
+        reference = self._latency_by_limit[max(lower)]
+        if p50 > self.latency_tolerance * reference:
+            self._decrease(now, f"latence p50 {p50:.2f}s contre {reference:.2f}s à {max(lower)} requêtes")
+            return True
+        return False
+
+    def _decrease(self, now, reason):
+        """Diminution multiplicative, au plus une fois par seconde (appelé sous verrou)."""
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        previous = self.limit
+        self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+        self.decreases += 1
+        # Les latences mesurées à l'ancienne limite ne sont plus représentatives
+        self._latencies.clear()
+        self._recent_latencies = []
+        logger.info(f"Concurrence réduite de {int(previous)} à {int(self.limit)} ({reason})")
+
+    ####
+    #    MÉTRIQUES    #
+    ####
+    def requests_per_second(self):
+        """Débit atteint sur les rps_window dernières secondes."""
+        now = time.monotonic()
+        with self._cond:
+            while self._completions and now - self._completions[0] > self.rps_window:
+                self._completions.popleft()
+            return len(self._completions) / self.rps_window
+
+    def metrics(self):
+        """Limite courante, requêtes en vol, débit, latences et compteurs d'erreurs."""
+        rps = self.requests_per_second()
+        with self._cond:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self._in_flight,
+                'requests_per_second': round(rps, 2),
+                'latency_p50': percentile(self._latencies, 50),
+                'latency_p95': percentile(self._latencies, 95),
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'server_errors': self.server_errors,
+                'network_errors': self.network_errors,
+                'decreases': self.decreases,
+            }
+
+class AdaptiveConcurrencyAdapter(HTTPAdapter):
+    """
+    HTTPAdapter soumis à un AdaptiveConcurrency (et éventuellement à un rate limit
+    fnaim_rate_limit.RateLimiter) : chaque envoi attend une place, puis transmet
+    le status et la latence de la réponse au contrôleur.
+
+    Les réponses GET dont le status est dans status_forcelist sont réessayées
+    jusqu'à status_retries fois, après le délai de l'en-tête Retry-After ou une
+    attente exponentielle (backoff_factor * 2^tentative) : urllib3 ne réessaie
+    alors que les erreurs de connexion et de lecture.
+    """
+    def __init__(self, controller, rate_limiter=None, *args, status_retries=3, status_forcelist=RETRY_STATUSES,
+                 backoff_factor=0.5, **kwargs):
+        self.controller = controller
+        self.rate_limiter = rate_limiter
+        self.status_retries = status_retries
+        self.status_forcelist = tuple(status_forcelist)
+        self.backoff_factor = backoff_factor
+        super().__init__(*args, **kwargs)
+
+    def _send_once(self, request, **kwargs):
+        self.controller.acquire()
+        try:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = super().send(request, **kwargs)
+            except Exception:
+                self.controller.observe(None, time.monotonic() - start)
+                raise
+            self.controller.observe(response.status_code, time.monotonic() - start, response.headers.get('Retry-After'))
+            return response
+        finally:
+            self.controller.release()
+
+    def send(self, request, **kwargs):
+        retries = self.status_retries if request.method == 'GET' else 0
+        for attempt in range(retries + 1):
+            response = self._send_once(request, **kwargs)
+            if response.status_code not in self.status_forcelist or attempt == retries:
+                return response
+
+            # Le slot est libéré pendant l'attente : les autres requêtes continuent
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+            if delay is None:
+                delay = self.backoff_factor * (2 ** attempt)
+            logger.info(f"Status {response.status_code} pour {request.url} - nouvelle tentative "
+                        f"{attempt + 1}/{retries} dans {delay:.1f}s")
+            response.close()
+            time.sleep(delay)
@@ -0,0 +1,219 @@
+"""
+Corpus HTML local pour rejouer un crawl FNAIM hors ligne.
+
+Enregistrement : HtmlCorpus.record_response est un hook de réponse requests
+(voir scrapping_fnaim(response_hooks=...)) qui stocke chaque page téléchargée
+(résultats de recherche, fiches annonces, pages agences) :
+- objects/ab/abcdef....html.gz : contenu compressé, adressé par son SHA-256
+  (une page identique, par exemple la même agence, n'est stockée qu'une fois) ;
+- index.jsonl : une ligne par réponse (url, type de page, status, en-têtes utiles,
+  empreinte du contenu), la dernière ligne d'une URL faisant foi.
+
+Rejeu : ReplaySession remplace la session requests et sert les pages depuis le
+corpus, ce qui permet d'exécuter scrapping_urls et scrapping_annonce (et donc de
+mesurer ou de tester le parsing) à pleine vitesse, sans requête vers fnaim.fr.
+Voir replay_crawl et benchmark_replay.py.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.jsonl"
+OBJECTS_DIR = "objects"
+
+# En-têtes de réponse conservés dans l'index
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+PAGE_RESULTATS = "resultats"
+PAGE_ANNONCE = "annonce"
+PAGE_AGENCE = "agence"
+
+def page_kind(url):
+    """Type de page FNAIM d'une URL : résultats de recherche, fiche annonce, page agence."""
+    if "/annonce-immobiliere/" in url:
+        return PAGE_ANNONCE
+    if "/agence-immobiliere/" in url:
+        return PAGE_AGENCE
+    return PAGE_RESULTATS
+
+class HtmlCorpus:
+    """
+    Corpus de pages HTML compressées, adressées par leur contenu.
+
+    Args:
+        directory (str): Répertoire du corpus (créé si nécessaire)
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, OBJECTS_DIR)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._order = []
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        if os.path.exists(self.index_path):
+            self._load_index()
+
+    def _load_index(self):
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry['url'] not in self._entries:
+                    self._order.append(entry['url'])
+                self._entries[entry['url']] = entry
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.html.gz")
+
+    ####
+    #    ENREGISTREMENT    #
+    ####
+    def add(self, url, status, content, headers=None):
+        """Ajoute (ou remplace) la page d'une URL dans le corpus."""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        headers = headers or {}
+        entry = {
+            'url': url,
+            'kind': page_kind(url),
+            'status': status,
+            'sha256': digest,
+            'headers': {name: headers[name] for name in KEPT_HEADERS if headers.get(name)},
+            'recorded_at': time.time(),
+        }
+        with self._lock:
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            if url not in self._entries:
+                self._order.append(url)
+            self._entries[url] = entry
+
+    def record_response(self, response, *args, **kwargs):
+        """Hook de réponse requests : enregistre chaque page téléchargée (sauf les 304)."""
+        if response.request.method == "GET" and response.status_code != 304:
+            try:
+                self.add(response.url, response.status_code, response.content, response.headers)
+            except OSError as e:
+                logger.warning(f"Impossible d'enregistrer {response.url} dans le corpus: {e}")
+        return response
+
+    ####
+    #    LECTURE    #
+    ####
+    def get(self, url):
+        """Retourne (entrée d'index, contenu) pour une URL, ou (None, None)."""
+        entry = self._entries.get(url)
+        if entry is None:
+            return None, None
+        with gzip.open(self._object_path(entry['sha256']), "rb") as f:
+            return entry, f.read()
+
+    def urls(self, kind=None):
+        """URLs du corpus dans l'ordre d'enregistrement, éventuellement filtrées par type de page."""
+        return [url for url in self._order if kind is None or self._entries[url]['kind'] == kind]
+
+    def __len__(self):
+        return len(self._entries)
+
+####
+#    REJEU    #
+####
+class ReplaySession:
+    """
+    Remplaçant minimal de requests.Session servant les pages du corpus.
+    Une URL absente du corpus donne une réponse 404.
+    """
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.headers = CaseInsensitiveDict()
+        self.requests = 0
+        self.misses = 0
+
+    def get(self, url, timeout=None, headers=None, **kwargs):
+        self.requests += 1
+        entry, content = self.corpus.get(url)
+
+        response = Response()
+        response.url = url
+        response.encoding = "utf-8"
+        if entry is None:
+            self.misses += 1
+            response.status_code = 404
+            response._content = b""
+        else:
+            response.status_code = entry['status']
+            response._content = content
+            response.headers = CaseInsensitiveDict(entry['headers'])
+        return response
+
+def replay_crawl(corpus, max_workers=1, agency_cache=None, page_processor=None):
+    """
+    Rejoue un crawl enregistré : chaque page de résultats du corpus passe par
+    scrapping_urls, puis ses annonces par process_page_urls (scrapping_annonce),
+    sans pause ni requête réseau.
+
+    Args:
+        corpus (HtmlCorpus): Corpus enregistré
+        max_workers (int): Nombre de threads de traitement des annonces
+        agency_cache (AgencyCache): Cache des pages agences (défaut: cache en mémoire)
+        page_processor: Fonction de traitement d'une page (défaut: process_page_urls)
+
+    Returns:
+        tuple: (liste des AnnonceRecord, liste des AgenceRecord, statistiques)
+    """
+    from fnaim_agency_cache import AgencyCache
+    from fnaim_records import collect_results
+    from fnaim_scraper import process_page_urls, scrapping_urls
+
+    session = ReplaySession(corpus)
+    if agency_cache is None:
+        agency_cache = AgencyCache()
+    page_processor = page_processor or process_page_urls
+
+    annonces = []
+    agences = []
+    pages = 0
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    for url_page in corpus.urls(PAGE_RESULTATS):
+        urls_annonces, status_code = scrapping_urls(url_page, session)
+        if status_code != 200 or not urls_annonces:
+            continue
+        pages += 1
+        annonces_page, agences_page = page_processor(
+            urls_annonces, session, max_workers=max_workers, max_retries=1, agency_cache=agency_cache
+        )
+        annonces.extend(annonces_page)
+        agences.extend(agences_page)
+
+    _, agences = collect_results((None, agence) for agence in agences)
+    duration = time.perf_counter() - start
+    stats = {
+        'pages_resultats': pages,
+        'annonces': len(annonces),
+        'agences': len(agences),
+        'requetes': session.requests,
+        'absentes_du_corpus': session.misses,
+        'duree_s': duration,
+        'cpu_s': time.process_time() - cpu_start,
+        'annonces_par_s': len(annonces) / duration if duration else 0.0,
+    }
+    return annonces, agences, stats
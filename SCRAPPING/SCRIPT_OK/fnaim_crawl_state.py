@@ -0,0 +1,187 @@
+"""
+État persistant du crawl FNAIM pour les re-crawls incrémentaux.
+
+Une base SQLite locale conserve, pour chaque URL d'annonce, les en-têtes
+ETag / Last-Modified et l'empreinte (SHA-256) du HTML de la dernière version
+analysée. Lors d'un nouveau passage :
+- les fiches sont demandées avec If-None-Match / If-Modified-Since ;
+- une réponse 304, ou un HTML d'empreinte identique, n'est pas ré-analysée ;
+- seules les annonces nouvelles ou modifiées sont transmises en aval, avec une
+  colonne `statut_crawl` ("nouvelle" ou "modifiee") ;
+- la nouvelle version d'une annonce (stage) n'est écrite en base (commit)
+  qu'une fois l'annonce sauvegardée par le crawl : après un arrêt, une annonce
+  perdue avant sa sauvegarde est de nouveau considérée comme modifiée ;
+- à la fin d'un crawl complet, les annonces qui n'apparaissent plus dans les
+  résultats de recherche sont marquées supprimées (voir removed_urls).
+"""
+import datetime
+import hashlib
+import sqlite3
+import threading
+
+STATUT_NOUVELLE = "nouvelle"
+STATUT_MODIFIEE = "modifiee"
+
+def content_fingerprint(content):
+    """Empreinte SHA-256 du contenu HTML d'une page."""
+    return hashlib.sha256(content).hexdigest()
+
+class CrawlState:
+    """
+    Magasin SQLite de l'état du crawl, partageable entre threads.
+
+    Args:
+        path (str): Chemin de la base SQLite
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS annonces_crawl (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            first_seen TEXT,
+            last_seen TEXT,
+            last_changed TEXT,
+            removed_at TEXT
+        )
+        ''')
+        self._conn.commit()
+        self.run_started = None
+        self.unchanged = 0
+        # URL -> (etag, last_modified, content_hash) des annonces pas encore sauvegardées
+        self._staged = {}
+
+    def start_run(self):
+        """Démarre un nouveau passage ; retourne son horodatage."""
+        self.run_started = datetime.datetime.now().isoformat()
+        self.unchanged = 0
+        return self.run_started
+
+    def mark_seen(self, urls):
+        """Enregistre les URLs présentes dans les résultats de recherche de ce passage."""
+        now = datetime.datetime.now().isoformat()
+        with self._lock:
+            self._conn.executemany('''
+            INSERT INTO annonces_crawl (url, first_seen, last_seen) VALUES (?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET last_seen = excluded.last_seen, removed_at = NULL
+            ''', [(url, now, now) for url in urls])
+            self._conn.commit()
+
+    def conditional_headers(self, url):
+        """En-têtes de requête conditionnelle pour une URL déjà analysée."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, content_hash FROM annonces_crawl WHERE url = ?", (url,)
+            ).fetchone()
+
+        headers = {}
+        if row and row[2]:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def is_unchanged(self, url, content_hash):
+        """Vrai si le HTML a la même empreinte que la dernière version analysée."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM annonces_crawl WHERE url = ?", (url,)
+            ).fetchone()
+        unchanged = row is not None and row[0] == content_hash
+        if unchanged:
+            self.unchanged += 1
+        return unchanged
+
+    def mark_not_modified(self):
+        """Comptabilise une réponse 304."""
+        self.unchanged += 1
+
+    def stage(self, url, etag, last_modified, content_hash):
+        """
+        Retient la version analysée d'une annonce, écrite en base par commit une fois
+        l'annonce sauvegardée. Retourne STATUT_NOUVELLE ou STATUT_MODIFIEE.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM annonces_crawl WHERE url = ?", (url,)
+            ).fetchone()
+            self._staged[url] = (etag, last_modified, content_hash)
+
+        return STATUT_MODIFIEE if row is not None and row[0] else STATUT_NOUVELLE
+
+    def commit(self, urls=None):
+        """
+        Écrit en base les versions retenues par stage pour `urls` (toutes si None).
+        Retourne le nombre d'annonces écrites.
+        """
+        now = datetime.datetime.now().isoformat()
+        with self._lock:
+            if urls is None:
+                staged = list(self._staged.items())
+                self._staged.clear()
+            else:
+                staged = [(url, self._staged.pop(url)) for url in urls if url in self._staged]
+            if not staged:
+                return 0
+            self._conn.executemany('''
+            INSERT INTO annonces_crawl (url, etag, last_modified, content_hash, first_seen, last_seen, last_changed)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                content_hash = excluded.content_hash,
+                last_seen = excluded.last_seen,
+                last_changed = excluded.last_changed,
+                removed_at = NULL
+            ''', [(url, etag, last_modified, content_hash, now, now, now)
+                  for url, (etag, last_modified, content_hash) in staged])
+            self._conn.commit()
+        return len(staged)
+
+    def record(self, url, etag, last_modified, content_hash):
+        """
+        Enregistre immédiatement la version analysée d'une annonce (stage puis commit).
+        Retourne STATUT_NOUVELLE ou STATUT_MODIFIEE.
+        """
+        status = self.stage(url, etag, last_modified, content_hash)
+        self.commit([url])
+        return status
+
+    def finish_run(self, complete):
+        """
+        Termine le passage. Si le crawl a parcouru toutes les pages de résultats,
+        marque supprimées les annonces non vues depuis start_run et retourne leurs URLs.
+        """
+        if not complete or self.run_started is None:
+            return []
+
+        now = datetime.datetime.now().isoformat()
+        with self._lock:
+            removed = [row[0] for row in self._conn.execute(
+                "SELECT url FROM annonces_crawl WHERE removed_at IS NULL AND last_seen < ?",
+                (self.run_started,)
+            )]
+            self._conn.executemany(
+                "UPDATE annonces_crawl SET removed_at = ? WHERE url = ?",
+                [(now, url) for url in removed]
+            )
+            self._conn.commit()
+        return removed
+
+    def removed_urls(self, since=None):
+        """URLs marquées supprimées (depuis `since` si précisé, par défaut ce passage)."""
+        since = since or self.run_started or ""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT url FROM annonces_crawl WHERE removed_at IS NOT NULL AND removed_at >= ?",
+                (since,)
+            )]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,331 @@
+"""
+Mode distribué du scraper FNAIM : un coordinateur et N processus workers.
+
+- Le coordinateur parcourt les pages de résultats (scrapping_urls) et dépose les
+  URLs d'annonces découvertes dans une file de travail SQLite locale.
+- Chaque worker est un processus avec sa propre session HTTP et son propre cache
+  d'agences ; il emprunte des lots d'URLs (bail de `visibility_timeout` secondes),
+  exécute fetch_announcement et enregistre les résultats dans la file.
+- Un bail expiré (worker arrêté ou bloqué) remet ses URLs à disposition des autres
+  workers ; au-delà de `max_attempts` emprunts, une URL est marquée en échec.
+- Le coordinateur relance les workers morts tant qu'il reste du travail, puis
+  fusionne les résultats en DataFrames annonces / agences, comme scrapping_fnaim.
+
+La file étant un simple fichier SQLite, des workers peuvent aussi être lancés sur
+un autre nœud partageant le fichier : python fnaim_distributed.py --worker FILE.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import time
+
+from fnaim_agency_cache import AgencyCache
+from fnaim_records import (
+    AgenceRecord,
+    AnnonceRecord,
+    collect_results,
+    record_from_dict,
+    record_to_dict,
+    records_to_dataframe,
+)
+from fnaim_scraper import BACKUP_DIR, create_session_with_retry, fetch_announcement, logger, scrapping_urls
+
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+####
+#    FILE DE TRAVAIL SQLITE    #
+####
+class WorkQueue:
+    """
+    File de travail SQLite avec baux à expiration (visibility timeout).
+    Chaque processus ouvre sa propre instance sur le même fichier.
+
+    Args:
+        path (str): Chemin de la base SQLite
+    """
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            url TEXT PRIMARY KEY,
+            page INTEGER,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_until REAL,
+            worker TEXT,
+            annonce TEXT,
+            agence TEXT,
+            error TEXT
+        )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, page)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def reset(self):
+        """Vide la file (nouveau crawl)."""
+        self._conn.execute("DELETE FROM tasks")
+        self._conn.execute("DELETE FROM meta")
+
+    def enqueue(self, urls, page_number):
+        """Ajoute des URLs à traiter ; une URL déjà présente n'est pas ajoutée deux fois."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        cursor = self._conn.executemany(
+            "INSERT OR IGNORE INTO tasks (url, page, status) VALUES (?, ?, ?)",
+            [(url, page_number, STATUS_PENDING) for url in urls]
+        )
+        self._conn.execute("COMMIT")
+        return cursor.rowcount
+
+    def _set_flag(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, "1" if value else "0"))
+
+    def _flag(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return bool(row and row[0] == "1")
+
+    def close_producer(self, value=True):
+        """Indique aux workers que toutes les URLs ont été déposées."""
+        self._set_flag('producer_done', value)
+
+    def producer_done(self):
+        return self._flag('producer_done')
+
+    def mark_complete(self):
+        """Marque le crawl terminé : le lancement suivant repart d'une file vide."""
+        self._set_flag('complete', True)
+
+    def is_complete(self):
+        return self._flag('complete')
+
+    def lease(self, worker_id, batch_size=5, visibility_timeout=120, max_attempts=3):
+        """
+        Emprunte jusqu'à batch_size URLs libres ou dont le bail a expiré.
+        Les URLs déjà empruntées max_attempts fois sans résultat passent en échec.
+        """
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, error = 'bail expiré' WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (STATUS_FAILED, STATUS_LEASED, now, max_attempts)
+            )
+            urls = [row[0] for row in self._conn.execute(
+                "SELECT url FROM tasks WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY page, rowid LIMIT ?",
+                (STATUS_PENDING, STATUS_LEASED, now, batch_size)
+            )]
+            self._conn.executemany(
+                "UPDATE tasks SET status = ?, lease_until = ?, worker = ?, attempts = attempts + 1 WHERE url = ?",
+                [(STATUS_LEASED, now + visibility_timeout, worker_id, url) for url in urls]
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return urls
+
+    def complete(self, url, annonce, agence):
+        """Enregistre le résultat d'une URL (AnnonceRecord, AgenceRecord)."""
+        self._conn.execute(
+            "UPDATE tasks SET status = ?, lease_until = NULL, annonce = ?, agence = ?, error = NULL WHERE url = ?",
+            (STATUS_DONE, json.dumps(record_to_dict(annonce), ensure_ascii=False, default=str),
+             json.dumps(record_to_dict(agence), ensure_ascii=False, default=str), url)
+        )
+
+    def fail(self, url, error):
+        self._conn.execute(
+            "UPDATE tasks SET status = ?, lease_until = NULL, error = ? WHERE url = ?",
+            (STATUS_FAILED, error, url)
+        )
+
+    def counts(self):
+        """Nombre d'URLs par statut."""
+        counts = {STATUS_PENDING: 0, STATUS_LEASED: 0, STATUS_DONE: 0, STATUS_FAILED: 0}
+        counts.update(dict(self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")))
+        return counts
+
+    def remaining(self):
+        counts = self.counts()
+        return counts[STATUS_PENDING] + counts[STATUS_LEASED]
+
+    def results(self):
+        """Résultats enregistrés, dans l'ordre des pages : (AnnonceRecord, AgenceRecord)."""
+        for annonce, agence in self._conn.execute(
+            "SELECT annonce, agence FROM tasks WHERE status = ? ORDER BY page, rowid", (STATUS_DONE,)
+        ):
+            yield record_from_dict(AnnonceRecord, json.loads(annonce)), record_from_dict(AgenceRecord, json.loads(agence))
+
+    def close(self):
+        self._conn.close()
+
+####
+#    WORKERS    #
+####
+def run_worker(queue_path, worker_id=None, batch_size=5, visibility_timeout=120, max_attempts=3,
+               max_retries=3, poll_interval=1.0):
+    """
+    Boucle d'un worker : emprunte des lots d'URLs, scrape chaque annonce avec
+    fetch_announcement et enregistre le résultat, jusqu'à ce que le coordinateur
+    ait terminé et que la file soit vide.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    work_queue = WorkQueue(queue_path)
+    session = create_session_with_retry(retries=max_retries)
+    agency_cache = AgencyCache()
+    processed = 0
+
+    try:
+        while True:
+            urls = work_queue.lease(worker_id, batch_size, visibility_timeout, max_attempts)
+            if not urls:
+                if work_queue.producer_done() and not work_queue.remaining():
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            for url in urls:
+                annonce, agence = fetch_announcement(url, session, max_retries, agency_cache=agency_cache)
+                if annonce is None:
+                    work_queue.fail(url, "échec du scraping")
+                else:
+                    work_queue.complete(url, annonce, agence)
+                processed += 1
+    finally:
+        work_queue.close()
+        logger.info(f"[{worker_id}] {processed} annonces traitées, cache agences: {agency_cache.stats()}")
+
+def _start_worker(queue_path, index, worker_options):
+    process = multiprocessing.Process(
+        target=run_worker, args=(queue_path, f"{socket.gethostname()}-w{index}"), kwargs=worker_options,
+        name=f"fnaim-worker-{index}", daemon=True
+    )
+    process.start()
+    return process
+
+####
+#    COORDINATEUR    #
+####
+def default_queue_path(base_url):
+    """File de travail par défaut d'une URL de recherche, dans BACKUP_DIR."""
+    directory = os.path.join(BACKUP_DIR, "distributed")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"queue_{hashlib.sha1(base_url.encode('utf-8')).hexdigest()[:12]}.sqlite")
+
+def scrapping_fnaim_distributed(base_url, workers=4, max_pages=None, queue_path=None, resume=True,
+                                batch_size=5, visibility_timeout=120, max_attempts=3, max_retries=3,
+                                page_delay=(1.5, 3.0), poll_interval=1.0):
+    """
+    Scrappe les annonces FNAIM avec un coordinateur et des processus workers.
+
+    Args:
+        base_url (str): URL de base pour la recherche
+        workers (int): Nombre de processus workers
+        max_pages (int): Nombre maximum de pages à scraper (None = illimité)
+        queue_path (str): Fichier SQLite de la file (défaut: default_queue_path(base_url))
+        resume (bool): Conserver la file d'un crawl interrompu (les URLs déjà traitées
+            ne sont pas re-scrapées) ; False pour repartir d'une file vide
+        batch_size (int): Nombre d'URLs empruntées à la fois par un worker
+        visibility_timeout (int): Durée d'un bail en secondes ; au-delà, les URLs
+            sont remises dans la file
+        max_attempts (int): Nombre maximum d'emprunts d'une URL
+        max_retries (int): Nombre maximum de tentatives par requête (fetch_announcement)
+        page_delay (tuple): Bornes de la pause aléatoire entre deux pages (None = pas de pause)
+        poll_interval (float): Intervalle de scrutation de la file en secondes
+
+    Returns:
+        tuple: (DataFrame des annonces, DataFrame des agences)
+    """
+    queue_path = queue_path or default_queue_path(base_url)
+    work_queue = WorkQueue(queue_path)
+    if not resume or work_queue.is_complete():
+        work_queue.reset()
+    work_queue.close_producer(False)
+
+    worker_options = dict(
+        batch_size=batch_size, visibility_timeout=visibility_timeout, max_attempts=max_attempts,
+        max_retries=max_retries, poll_interval=poll_interval
+    )
+    processes = [_start_worker(queue_path, i, worker_options) for i in range(workers)]
+    session = create_session_with_retry(retries=max_retries)
+    start = time.time()
+
+    crawl_complete = False
+    try:
+        # 1. Parcours des pages de résultats : les URLs sont distribuées au fil de l'eau
+        page_number = 1
+        while max_pages is None or page_number <= max_pages:
+            urls_annonces, status_code = scrapping_urls(f"{base_url}&ip={page_number}", session)
+            if not urls_annonces or status_code != 200:
+                logger.info(f"Aucune annonce trouvée ou erreur à la page {page_number} (status: {status_code}). Fin du parcours des pages.")
+                break
+
+            added = work_queue.enqueue(urls_annonces, page_number)
+            logger.info(f"Page {page_number}: {added}/{len(urls_annonces)} nouvelles annonces mises en file")
+            page_number += 1
+            if page_delay:
+                time.sleep(random.uniform(*page_delay))
+        work_queue.close_producer()
+
+        # 2. Attente des workers ; un worker mort est relancé tant qu'il reste du travail
+        while True:
+            remaining = work_queue.remaining()
+            alive = [process for process in processes if process.is_alive()]
+            if not remaining and not alive:
+                break
+            if remaining:
+                for i, process in enumerate(processes):
+                    if not process.is_alive() and process.exitcode != 0:
+                        logger.warning(f"Worker {process.name} arrêté (code {process.exitcode}), relance")
+                        processes[i] = _start_worker(queue_path, i, worker_options)
+            time.sleep(poll_interval)
+        crawl_complete = True
+
+    except KeyboardInterrupt:
+        logger.warning("Interruption utilisateur. Les URLs en cours seront reprises au prochain lancement.")
+
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+    # 3. Fusion des résultats des workers
+    counts = work_queue.counts()
+    if crawl_complete:
+        work_queue.mark_complete()
+    annonces, agences = collect_results(work_queue.results())
+    work_queue.close()
+
+    duration = time.time() - start
+    logger.info(f"Crawl distribué terminé en {duration:.1f}s avec {workers} workers: {counts[STATUS_DONE]} annonces, "
+                f"{counts[STATUS_FAILED]} en échec, {counts[STATUS_PENDING] + counts[STATUS_LEASED]} restantes")
+    return records_to_dataframe(annonces, AnnonceRecord), records_to_dataframe(agences, AgenceRecord)
+
+####
+#    EXÉCUTION PRINCIPALE    #
+####
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraping FNAIM distribué (coordinateur ou worker)")
+    parser.add_argument("--worker", metavar="FILE", help="Lancer uniquement un worker sur une file existante")
+    parser.add_argument("--workers", type=int, default=4, help="Nombre de processus workers")
+    parser.add_argument("--max-pages", type=int, default=None, help="Nombre maximum de pages à scraper")
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+    else:
+        base_url = "https://www.fnaim.fr/17-acheter.htm?TRANSACTION=1&localites=%5B%7B%22id%22%3A%221213%22%2C%22type%22%3A%223%22%2C%22label%22%3A%22RENNES+(35000)%22%2C%22insee%22%3A%2235238%22%7D%5D&TYPE%5B%5D=1&TYPE%5B%5D=2&NB_PIECES%5B%5D=&NB_PIECES%5B%5D=&SURFACE%5B%5D=&SURFACE%5B%5D=&PRIX%5B%5D=&PRIX%5B%5D=&NB_CHAMBRES%5B%5D=&NB_CHAMBRES%5B%5D=&SURFACE_TERRAIN%5B%5D=&SURFACE_TERRAIN%5B%5D=&op=CEN_VTE_PRIX_VENTE+asc%2CTRI_PRIX+asc%2CCEN_MDT_DTE_CREATION+desc&cp=b7c1074e5c0678bdbb36&mp=12&lat=48.115981245818375&lng=-1.6880820000176&zoom=12"
+        df_annonces, df_agences = scrapping_fnaim_distributed(base_url, workers=args.workers, max_pages=args.max_pages)
+
+        df_annonces.to_csv('annonces_fnaim.csv', index=False)
+        df_agences.to_csv('agences_fnaim.csv', index=False)
+        logger.info("Fichiers CSV créés avec succès !")
@@ -0,0 +1,336 @@
+"""
+Mesures du scraper FNAIM par étape, par page et pour l'ensemble du crawl.
+
+Étapes mesurées :
+- connect : résolution DNS + connexion TCP (+ TLS), pour les nouvelles connexions ;
+- ttfb : délai entre l'envoi de la requête et la réception des en-têtes ;
+- download / bytes : durée de téléchargement et taille du corps de la réponse ;
+- parse : analyse HTML d'une fiche annonce (fnaim_parser) ;
+- agency : récupération complète d'une page agence (hors cache).
+
+Les étapes réseau sont ventilées par type de page (resultats, annonce, agence,
+voir fnaim_corpus.page_kind). Les valeurs sont agrégées dans des histogrammes à
+buckets fixes, comme ceux de Prometheus, pour le crawl entier et pour chaque page
+de résultats (voir CrawlMetrics.end_page).
+
+Export : résumé JSON (write_json), format texte Prometheus (to_prometheus,
+write_prometheus pour le textfile collector de node_exporter, ou serve pour
+un endpoint /metrics).
+"""
+import contextlib
+import http.server
+import json
+import math
+import os
+import threading
+import time
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from fnaim_corpus import page_kind
+
+# Bornes des buckets (la borne +Inf est implicite)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1_000, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+STAGES = {
+    'connect': ('seconds', "Résolution DNS et connexion (nouvelles connexions)"),
+    'ttfb': ('seconds', "Délai avant le premier octet de la réponse"),
+    'download': ('seconds', "Téléchargement du corps de la réponse"),
+    'bytes': ('bytes', "Taille du corps de la réponse"),
+    'parse': ('seconds', "Analyse HTML d'une fiche annonce"),
+    'agency': ('seconds', "Récupération d'une page agence (hors cache)"),
+}
+NETWORK_STAGES = ('connect', 'ttfb', 'download')
+
+# Mesures de la requête en cours, par thread (renseignées par les connexions instrumentées)
+_timings = threading.local()
+
+####
+#    HISTOGRAMMES    #
+####
+class Histogram:
+    """Histogramme cumulatif à buckets fixes (compte, somme, minimum et maximum)."""
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Estimation du quantile q (0-1) par interpolation linéaire dans le bucket concerné."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': self.max,
+        }
+
+####
+#    CONNEXIONS INSTRUMENTÉES (urllib3)    #
+####
+class _TimedConnectionMixin:
+    """Mesure la durée de connexion et le TTFB de chaque requête, dans le thread courant."""
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _timings.connected_at = time.perf_counter()
+        _timings.connect = getattr(_timings, 'connect', 0.0) + _timings.connected_at - start
+
+    def request(self, *args, **kwargs):
+        _timings.request_start = time.perf_counter()
+        return super().request(*args, **kwargs)
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        # Une connexion ouverte pendant l'envoi (HTTP) est exclue du TTFB
+        sent_at = max(_timings.request_start, getattr(_timings, 'connected_at', 0.0))
+        _timings.ttfb = time.perf_counter() - sent_at
+        return response
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+TIMED_POOL_CLASSES = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+def stage_timer(metrics, stage, kind=None):
+    """Chronomètre une étape si metrics est fourni (sinon ne fait rien)."""
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.timer(stage, kind)
+
+####
+#    MESURES DU CRAWL    #
+####
+class CrawlMetrics:
+    """
+    Histogrammes par étape (et type de page pour les étapes réseau), pour le crawl
+    entier et pour chaque page de résultats.
+
+    Avec les moteurs "threads" et "processes", une page correspond exactement aux
+    requêtes de ses annonces ; avec le moteur "pipeline", les pages se recouvrent
+    et une page regroupe les mesures reçues depuis la fin de la précédente.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.run = {}
+        self._page = {}
+        self.pages = []
+        self.responses = {}
+        self.started_at = time.time()
+
+    def _histogram(self, histograms, stage, kind):
+        key = (stage, kind)
+        if key not in histograms:
+            unit = STAGES[stage][0]
+            histograms[key] = Histogram(BYTES_BUCKETS if unit == 'bytes' else SECONDS_BUCKETS)
+        return histograms[key]
+
+    def observe(self, stage, value, kind=None):
+        with self._lock:
+            self._histogram(self.run, stage, kind).observe(value)
+            self._histogram(self._page, stage, kind).observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, stage, kind=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, kind)
+
+    ####
+    #    INSTRUMENTATION D'UNE SESSION    #
+    ####
+    def instrument(self, session):
+        """
+        Instrumente une session requests : connexions urllib3 chronométrées et hook
+        de réponse (placé en premier, avant ceux qui lisent le contenu).
+        """
+        for adapter in set(session.adapters.values()):
+            adapter.poolmanager.pool_classes_by_scheme = TIMED_POOL_CLASSES
+        session.hooks['response'].insert(0, self.record_response)
+        return session
+
+    def record_response(self, response, *args, **kwargs):
+        """Hook de réponse requests : connexion, TTFB, téléchargement et taille du corps."""
+        start = time.perf_counter()
+        size = len(response.content)
+        download = time.perf_counter() - start
+
+        connect = getattr(_timings, 'connect', 0.0)
+        ttfb = getattr(_timings, 'ttfb', None)
+        _timings.connect = 0.0
+        _timings.ttfb = None
+
+        kind = page_kind(response.url)
+        if connect:
+            self.observe('connect', connect, kind)
+        self.observe('ttfb', ttfb if ttfb is not None else response.elapsed.total_seconds(), kind)
+        self.observe('download', download, kind)
+        self.observe('bytes', size, kind)
+        with self._lock:
+            key = (kind, response.status_code)
+            self.responses[key] = self.responses.get(key, 0) + 1
+        return response
+
+    ####
+    #    PAGES ET RÉSUMÉ    #
+    ####
+    def end_page(self, page_number):
+        """Clôt les histogrammes de la page de résultats courante."""
+        with self._lock:
+            page, self._page = self._page, {}
+        self.pages.append({
+            'page': page_number,
+            'stages': _summarize(page),
+            'repartition': _breakdown(page),
+        })
+
+    def summary(self):
+        """Résumé du crawl : histogrammes par étape, réponses par status, répartition du temps et pages."""
+        with self._lock:
+            run = dict(self.run)
+            responses = dict(self.responses)
+        return {
+            'duration_s': round(time.time() - self.started_at, 3),
+            'stages': _summarize(run),
+            'responses': {f"{kind}:{status}": count for (kind, status), count in sorted(responses.items())},
+            'repartition': _breakdown(run),
+            'pages': list(self.pages),
+        }
+
+    def report(self):
+        """Ligne de synthèse pour les logs : temps cumulé réseau, parsing et agences."""
+        repartition = self.summary()['repartition']
+        return (f"réseau {repartition['network_s']:.1f}s, parsing {repartition['parse_s']:.1f}s, "
+                f"agences {repartition['agency_s']:.1f}s ({repartition['bound']})")
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+
+    ####
+    #    EXPORT PROMETHEUS    #
+    ####
+    def to_prometheus(self):
+        """Histogrammes du crawl au format texte d'exposition Prometheus."""
+        with self._lock:
+            run = {key: histogram for key, histogram in self.run.items()}
+            responses = dict(self.responses)
+
+        lines = []
+        for stage, (unit, description) in STAGES.items():
+            keys = sorted((key for key in run if key[0] == stage), key=lambda key: key[1] or "")
+            if not keys:
+                continue
+            name = f"fnaim_{stage}_{unit}" if stage != 'bytes' else "fnaim_response_bytes"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} histogram")
+            for key in keys:
+                histogram = run[key]
+                labels = f'kind="{key[1]}"' if key[1] else ""
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(float(bound))
+                    lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{le}"}} {cumulative}')
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}_sum{suffix} {histogram.sum}")
+                lines.append(f"{name}_count{suffix} {histogram.count}")
+
+        lines.append("# HELP fnaim_responses_total Réponses HTTP par type de page et status")
+        lines.append("# TYPE fnaim_responses_total counter")
+        for (kind, status), count in sorted(responses.items()):
+            lines.append(f'fnaim_responses_total{{kind="{kind}",status="{status}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Écrit le fichier .prom (écriture atomique, pour le textfile collector)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve(self, port=9108, host="127.0.0.1"):
+        """Expose /metrics au format Prometheus dans un thread en arrière-plan. Retourne le serveur."""
+        metrics = self
+
+        class _Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=server.serve_forever, name="fnaim-metrics", daemon=True).start()
+        return server
+
+def _summarize(histograms):
+    """Résumé {étape: {type de page: statistiques}} d'un ensemble d'histogrammes."""
+    summary = {}
+    for (stage, kind), histogram in sorted(histograms.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+        summary.setdefault(stage, {})[kind or "all"] = histogram.summary()
+    return summary
+
+def _breakdown(histograms):
+    """Temps cumulé réseau / parsing / agences et étape dominante."""
+    network = sum(h.sum for (stage, _), h in histograms.items() if stage in NETWORK_STAGES)
+    parse = sum(h.sum for (stage, _), h in histograms.items() if stage == 'parse')
+    agency = sum(h.sum for (stage, _), h in histograms.items() if stage == 'agency')
+    return {
+        'network_s': round(network, 3),
+        'parse_s': round(parse, 3),
+        'agency_s': round(agency, 3),
+        'bound': "réseau" if network >= parse else "parsing",
+    }
@@ -0,0 +1,200 @@
+"""
+Sortie typée du scraper FNAIM : Parquet (ou Arrow IPC) écrit au fil du crawl.
+
+Le CSV final (df.to_csv) perd les types : `images` devient la représentation
+texte d'une liste et data_processing_V2 doit tout re-parser avec pd.read_csv.
+ScrapeOutput écrit les annonces et les agences de chaque page terminée dans deux
+fichiers dont le schéma est imposé (annonces_schema, agences_schema) :
+- `images` est une list<string>, le prix, les surfaces / nombres de pièces / DPE
+  des entiers, `parking` un booléen et `date_scrape` un horodatage ; le prix
+  affiché par la fiche ("245 000 €") est converti à l'écriture (parse_price),
+  le chargeur n'a donc plus à l'analyser ;
+- une valeur incompatible avec le schéma lève une ValueError au lieu d'être
+  écrite sous une autre forme ;
+- les enregistrements sont regroupés en row groups de `row_group_size` lignes.
+
+Les fichiers peuvent ensuite être lus par memory-mapping (voir
+data_processing_V2.read_scraper_output).
+"""
+import os
+
+from fnaim_parser import parse_price
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FORMATS = {'parquet': ".parquet", 'arrow': ".arrow"}
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow est requis pour la sortie Parquet/Arrow : pip install pyarrow")
+
+def annonces_schema():
+    """Schéma Arrow des annonces (colonnes de fnaim_records.AnnonceRecord)."""
+    _require_pyarrow()
+    return pa.schema([
+        ('titre', pa.string()),
+        ('prix', pa.int64()),
+        ('reference', pa.string()),
+        ('code_postal', pa.string()),
+        ('surface', pa.int32()),
+        ('nb_pieces', pa.int16()),
+        ('type_habitation', pa.string()),
+        ('dpe_rating', pa.string()),
+        ('dpe_consumption', pa.int32()),
+        ('ges_rating', pa.string()),
+        ('ges_emission', pa.int32()),
+        ('nb_chambres', pa.int16()),
+        ('description', pa.string()),
+        ('parking', pa.bool_()),
+        ('url', pa.string()),
+        ('images', pa.list_(pa.string())),
+        ('depenses_energie_min', pa.int32()),
+        ('depenses_energie_max', pa.int32()),
+        ('date_ref_prix_energie', pa.string()),
+        ('agency_id', pa.string()),
+        ('date_scrape', pa.timestamp('us')),
+        ('statut_crawl', pa.string()),
+    ])
+
+# Conversions appliquées aux colonnes des annonces avant l'écriture
+ANNONCES_CONVERTERS = {'prix': parse_price}
+
+def agences_schema():
+    """Schéma Arrow des agences (colonnes de fnaim_records.AgenceRecord)."""
+    _require_pyarrow()
+    return pa.schema([
+        ('agency_id', pa.string()),
+        ('agency_name', pa.string()),
+        ('agency_address', pa.string()),
+        ('agency_url', pa.string()),
+        ('agency_phone', pa.string()),
+        ('agency_siret', pa.string()),
+        ('agency_card_number', pa.string()),
+        ('agency_legal_reps', pa.string()),
+        ('date_scrape', pa.timestamp('us')),
+        ('details_fetched_at', pa.timestamp('us')),
+    ])
+
+####
+#    ÉCRITURE D'UNE TABLE    #
+####
+class RecordWriter:
+    """
+    Écrit des enregistrements (fnaim_records) dans un fichier Parquet ou Arrow IPC,
+    par row groups, en imposant un schéma.
+
+    Args:
+        path (str): Fichier de sortie (écrit sous path.tmp puis renommé à la fermeture)
+        schema (pyarrow.Schema): Schéma imposé ; ses colonnes sont celles des enregistrements
+        file_format (str): "parquet" ou "arrow"
+        row_group_size (int): Nombre de lignes par row group
+        converters (dict): Colonne -> fonction appliquée à chaque valeur avant l'écriture
+    """
+    def __init__(self, path, schema, file_format="parquet", row_group_size=5000, converters=None):
+        _require_pyarrow()
+        if file_format not in FORMATS:
+            raise ValueError(f"Format de sortie inconnu: {file_format}")
+        self.path = path
+        self.schema = schema
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self.converters = converters or {}
+        self.rows = 0
+        self._buffer = []
+        self._tmp_path = f"{path}.tmp"
+        if file_format == "parquet":
+            self._writer = pq.ParquetWriter(self._tmp_path, schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(self._tmp_path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, schema)
+
+    def _to_table(self, records):
+        """Table Arrow des enregistrements ; une valeur hors schéma lève une ValueError."""
+        columns = []
+        for field in self.schema:
+            values = [getattr(record, field.name) for record in records]
+            convert = self.converters.get(field.name)
+            if convert is not None:
+                values = [convert(value) for value in values]
+            try:
+                columns.append(pa.array(values, type=field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError) as e:
+                raise ValueError(f"Colonne {field.name} incompatible avec le type {field.type}: {e}") from e
+        return pa.Table.from_arrays(columns, schema=self.schema)
+
+    def write(self, records):
+        """Ajoute des enregistrements ; un row group est écrit dès que row_group_size lignes sont prêtes."""
+        self._buffer.extend(records)
+        while len(self._buffer) >= self.row_group_size:
+            batch, self._buffer = self._buffer[:self.row_group_size], self._buffer[self.row_group_size:]
+            self._write_table(batch)
+
+    def _write_table(self, records):
+        table = self._to_table(records)
+        self._writer.write_table(table)
+        self.rows += len(records)
+
+    def close(self):
+        """Écrit les enregistrements restants et finalise le fichier."""
+        if self._buffer:
+            self._write_table(self._buffer)
+            self._buffer = []
+        self._writer.close()
+        if self.file_format == "arrow":
+            self._sink.close()
+        os.replace(self._tmp_path, self.path)
+
+####
+#    SORTIE DU CRAWL    #
+####
+class ScrapeOutput:
+    """
+    Fichiers de sortie typés d'un crawl : {prefix}annonces_fnaim.parquet et
+    {prefix}agences_fnaim.parquet (ou .arrow) dans `directory`.
+
+    Args:
+        directory (str): Répertoire de sortie
+        file_format (str): "parquet" ou "arrow"
+        row_group_size (int): Nombre de lignes par row group
+        prefix (str): Préfixe des noms de fichiers
+    """
+    def __init__(self, directory=".", file_format="parquet", row_group_size=5000, prefix=""):
+        _require_pyarrow()
+        if file_format not in FORMATS:
+            raise ValueError(f"Format de sortie inconnu: {file_format}")
+        extension = FORMATS[file_format]
+        os.makedirs(directory, exist_ok=True)
+        self.annonces_path = os.path.join(directory, f"{prefix}annonces_fnaim{extension}")
+        self.agences_path = os.path.join(directory, f"{prefix}agences_fnaim{extension}")
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self._annonces = None
+        self._agences = None
+
+    def open(self):
+        """Ouvre (ou ré-ouvre, en écrasant) les fichiers de sortie."""
+        self._annonces = RecordWriter(self.annonces_path, annonces_schema(), self.file_format, self.row_group_size,
+                                      converters=ANNONCES_CONVERTERS)
+        self._agences = RecordWriter(self.agences_path, agences_schema(), self.file_format, self.row_group_size)
+
+    def write_page(self, annonces, agences):
+        """Ajoute les annonces et les nouvelles agences d'une page terminée."""
+        if self._annonces is None:
+            self.open()
+        self._annonces.write(annonces)
+        self._agences.write(agences)
+
+    def close(self):
+        """Finalise les deux fichiers. Retourne (nombre d'annonces, nombre d'agences) écrites."""
+        if self._annonces is None:
+            self.open()
+        self._annonces.close()
+        self._agences.close()
+        counts = (self._annonces.rows, self._agences.rows)
+        self._annonces = self._agences = None
+        return counts
@@ -0,0 +1,147 @@
+"""
+Parsing multi-processus des fiches annonces pour SCRAPPING_FNAIM_V3.
+
+Avec le moteur à threads, chaque thread télécharge puis analyse sa fiche : au-delà
+de quelques workers, le parsing lxml (sérialisé par le GIL) devient le goulot
+d'étranglement. Le moteur "processes" de scrapping_fnaim sépare les deux étapes :
+- des threads d'I/O téléchargent le HTML brut des fiches ;
+- les pages sont regroupées par lots et analysées par un ProcessPoolExecutor
+  (fnaim_parser) ; les résultats reviennent sous forme de tuples compacts ;
+- les threads d'I/O complètent ensuite chaque annonce (page agence via le cache,
+  statut du crawl incrémental).
+
+Ce module n'importe fnaim_scraper qu'à l'exécution des méthodes, pour que les
+processus de parsing n'aient à charger que fnaim_parser.
+"""
+import concurrent.futures
+import logging
+import time
+
+from fnaim_parser import parse_annonce
+from fnaim_records import AGENCE_FIELDS, ANNONCE_FIELDS, OPTIONAL_FIELDS, collect_results
+
+logger = logging.getLogger(__name__)
+
+# Champs produits par fnaim_parser.parse_annonce (les champs optionnels sont ajoutés ensuite)
+PARSED_ANNONCE_FIELDS = tuple(name for name in ANNONCE_FIELDS if name not in OPTIONAL_FIELDS)
+
+####
+#    ÉTAPE DE PARSING (PROCESSUS)    #
+####
+def parse_batch(pages, date_scrape=None):
+    """
+    Analyse un lot de fiches annonces dans un processus de parsing.
+
+    Args:
+        pages (list): Liste de (url, contenu HTML)
+        date_scrape: Horodatage du crawl
+
+    Returns:
+        list: (url, valeurs de l'annonce, valeurs de l'agence, URL de l'agence, erreur,
+        durée du parsing) pour chaque page ; les valeurs sont des tuples dans l'ordre de
+        PARSED_ANNONCE_FIELDS et AGENCE_FIELDS
+    """
+    results = []
+    for url, content in pages:
+        start = time.perf_counter()
+        try:
+            data_annonce, data_agence, full_agency_url = parse_annonce(content, url, date_scrape=date_scrape)
+            results.append((
+                url,
+                tuple(data_annonce[name] for name in PARSED_ANNONCE_FIELDS),
+                tuple(data_agence[name] for name in AGENCE_FIELDS),
+                full_agency_url,
+                None,
+                time.perf_counter() - start
+            ))
+        except Exception as e:
+            results.append((url, None, None, None, str(e), time.perf_counter() - start))
+    return results
+
+####
+#    PIPELINE I/O -> PARSING -> I/O    #
+####
+class ParsePool:
+    """
+    Pool de processus de parsing, partagé par toutes les pages d'un crawl.
+
+    Args:
+        processes (int): Nombre de processus de parsing (défaut: nombre de CPU)
+        batch_size (int): Nombre de fiches envoyées ensemble à un processus
+        base_timeout (int): Timeout initial des requêtes en secondes
+    """
+    def __init__(self, processes=None, batch_size=8, base_timeout=30):
+        self.batch_size = batch_size
+        self.base_timeout = base_timeout
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=processes)
+
+    def process_page_urls(self, urls_annonces, session, max_workers=5, max_retries=3, agency_cache=None, crawl_state=None,
+                          metrics=None):
+        """
+        Équivalent de fnaim_scraper.process_page_urls, avec le parsing déporté
+        dans les processus.
+
+        Returns:
+            tuple: (liste des AnnonceRecord, liste des AgenceRecord dédupliquées)
+        """
+        from fnaim_scraper import complete_annonce, fetch_annonce_page, retry_with_backoff, timestamp
+
+        responses = {}
+        results = []
+        batch = []
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as io_executor:
+            # 1. Téléchargement du HTML brut
+            pending = {
+                io_executor.submit(
+                    retry_with_backoff, url,
+                    lambda timeout, url=url: fetch_annonce_page(url, session, timeout, crawl_state),
+                    max_retries, self.base_timeout, (None, None)
+                ): ('fetch', url)
+                for url in urls_annonces
+            }
+            fetches_left = len(pending)
+
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    stage, url = pending.pop(future)
+                    try:
+                        if stage == 'fetch':
+                            fetches_left -= 1
+                            response, content_hash = future.result()
+                            if response is not None:
+                                responses[url] = (response, content_hash)
+                                batch.append((url, response.content))
+
+                        elif stage == 'parse':
+                            # 3. Compléter les annonces analysées (agence, statut du crawl)
+                            for page_url, annonce_values, agence_values, full_agency_url, error, duration in future.result():
+                                if metrics is not None:
+                                    metrics.observe('parse', duration)
+                                if error is not None:
+                                    logger.error(f"Erreur de parsing pour {page_url}: {error}")
+                                    continue
+                                response, content_hash = responses.pop(page_url)
+                                pending[io_executor.submit(
+                                    complete_annonce, page_url,
+                                    dict(zip(PARSED_ANNONCE_FIELDS, annonce_values)),
+                                    dict(zip(AGENCE_FIELDS, agence_values)),
+                                    full_agency_url, session, self.base_timeout,
+                                    agency_cache, crawl_state, response, content_hash, metrics
+                                )] = ('complete', page_url)
+
+                        else:
+                            results.append(future.result())
+                    except Exception as e:
+                        logger.error(f"Erreur non gérée pour {url}: {e}")
+
+                # 2. Envoyer les lots complets (ou le dernier lot) aux processus de parsing
+                while len(batch) >= self.batch_size or (batch and fetches_left == 0):
+                    lot, batch = batch[:self.batch_size], batch[self.batch_size:]
+                    pending[self.executor.submit(parse_batch, lot, timestamp)] = ('parse', f"lot de {len(lot)} fiches")
+
+        return collect_results(results)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
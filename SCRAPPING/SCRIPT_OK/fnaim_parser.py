@@ -0,0 +1,325 @@
+"""
+Extracteur compilé des fiches annonces et des pages agences FNAIM.
+
+Remplace le double parsing BeautifulSoup + lxml de scrapping_annonce :
+- le document n'est analysé qu'une fois (lxml.html) ;
+- les champs sont extraits en un seul parcours du document, en ne visitant que
+  les balises utiles (h1, span, meta, p, div, li, label) ;
+- les sous-requêtes limitées à un élément (blocs agence et diaporama) utilisent
+  des objets etree.XPath précompilés, et toutes les expressions régulières sont
+  compilées au chargement du module.
+
+Les valeurs retournées sont identiques à celles de l'ancienne implémentation
+(voir benchmark_parser.py pour la comparaison), à une correction près : le
+nombre de chambres écrit directement dans un <li> ("Nombre de chambres : 4")
+était perdu par l'ancienne version.
+"""
+import re
+from urllib.parse import urlparse
+
+from lxml import etree, html
+
+####
+#    EXPRESSIONS PRÉCOMPILÉES    #
+####
+RE_NUMBER = re.compile(r'\d+')
+RE_NON_DIGIT = re.compile(r'\D')
+RE_CODE_POSTAL = re.compile(r'(\d{5})')
+RE_DPE = re.compile(r'DPE\s*:\s*([A-G])')
+RE_DPE_LOOSE = re.compile(r'DPE\s*[^\w]*([A-G])')
+RE_DPE_CONSUMPTION = re.compile(r'(\d+)\s*kWh/m[²²]\s*an')
+RE_GES = re.compile(r'GES\s*:\s*([A-G])')
+RE_GES_LOOSE = re.compile(r'GES\s*[^\w]*([A-G])')
+RE_GES_EMISSION = re.compile(r'(\d+)\s*kgCO2/m[²²].an')
+RE_DEPENSES = re.compile(r'Entre\s*(\d+)\s*€\s*TTC\s*/\s*an\s*et\s*(\d+)\s*€\s*TTC\s*/\s*an')
+RE_DATE_REF_PRIX = re.compile(r'Date de référence des prix[^:]*:\s*(\d{2}/\d{2}/\d{4})')
+RE_AGENCY_ID = re.compile(r'/agence-immobiliere/(\d+)/')
+
+XPATH_FIRST_TEXT = etree.XPath('string(text())')
+XPATH_B_TEXT = etree.XPath('b/text()')
+XPATH_IMAGES = etree.XPath('.//a[contains(@class, "imageAnnonce")]/@href')
+XPATH_AGENCY_NAME = etree.XPath('.//div[contains(@class, "libelle")]/a/text()')
+XPATH_AGENCY_URL = etree.XPath('.//div[contains(@class, "libelle")]/a/@href')
+XPATH_AGENCY_ADDRESS = etree.XPath('.//p[contains(@class, "addresse")]/text()')
+XPATH_FOLLOWING_TEXT = etree.XPath('following-sibling::text()[1]')
+XPATH_AGENCY_PHONE = etree.XPath('//span[@id="agence_call"]/text()')
+XPATH_AGENCY_INFOS = etree.XPath('//div[contains(@class, "caracteristique tab-left")]//li')
+
+# Balises visitées lors du parcours unique du document
+WALK_TAGS = ('h1', 'span', 'meta', 'p', 'div', 'li', 'label')
+
+LABEL_HABITATION = "Type d'habitation : "
+LABEL_CHAMBRES = "Nombre de chambres"
+LABEL_DEPENSES = "Montant estimé des dépenses"
+
+####
+#    FONCTIONS UTILITAIRES    #
+####
+def extract_numbers(text):
+    """Extrait le premier nombre entier d'une chaîne de caractères."""
+    if not text:
+        return None
+    match = RE_NUMBER.search(text)
+    return int(match.group(0)) if match else None
+
+def parse_price(text):
+    """
+    Prix affiché ("245 000 €") en entier : tous ses chiffres, comme clean_price
+    côté chargement (CRÉATION DES BDD/cleaning.py). None sans chiffre.
+    """
+    if text is None or isinstance(text, int):
+        return text
+    digits = RE_NON_DIGIT.sub('', text)
+    return int(digits) if digits else None
+
+def _stripped_text(element):
+    """Équivalent de get_text(strip=True) de BeautifulSoup."""
+    return ''.join(text.strip() for text in element.itertext())
+
+def _has_class(element, name):
+    """Vrai si `name` fait partie des classes CSS de l'élément."""
+    return name in (element.get('class') or '').split()
+
+def _first_b_text(element):
+    """Premier texte d'une balise <b> enfant, nettoyé."""
+    texts = XPATH_B_TEXT(element)
+    return texts[0].strip() if texts else None
+
+def _label_texts(li):
+    """Premiers textes des <label> contenus dans un <li>."""
+    return [XPATH_FIRST_TEXT(label) for label in li.iter('label')]
+
+def _next_sibling_text(label):
+    """Premier nœud texte qui suit un élément parmi ses frères (ou None)."""
+    if label.tail is not None:
+        return label.tail
+    for sibling in label.itersiblings():
+        if sibling.tail is not None:
+            return sibling.tail
+    return None
+
+####
+#    FICHE ANNONCE    #
+####
+def parse_annonce(content, url_annonce, date_scrape=None):
+    """
+    Analyse le HTML d'une fiche annonce en un seul parcours.
+    Retourne (data_annonce, data_agence, full_agency_url), dans le même format
+    que fnaim_scraper.parse_annonce_html.
+    """
+    tree = html.fromstring(content)
+
+    titre = prix = ref = description = None
+    lieu = surface = pieces = parking_text = None
+    habit_label = meta_image = None
+    habit_label_found = False
+    meta_models = []
+    dpe_text = ges_text = depenses_text = None
+    chambres_source = None
+    images_links = []
+    agency_blocks = []
+
+    for element in tree.iter(*WALK_TAGS):
+        tag = element.tag
+
+        if tag == 'li':
+            cls = element.get('class') or ''
+            if 'picto' in cls:
+                if lieu is None and 'picto lieu' in cls:
+                    lieu = _first_b_text(element)
+                elif surface is None and 'picto surface' in cls:
+                    surface = _first_b_text(element)
+                elif pieces is None and 'picto pieces' in cls:
+                    pieces = _first_b_text(element)
+                elif parking_text is None and 'picto parking' in cls:
+                    parking_text = _first_b_text(element)
+
+            first_text = XPATH_FIRST_TEXT(element)
+            labels = _label_texts(element)
+            if dpe_text is None and ('DPE' in first_text or any('DPE' in text for text in labels)):
+                dpe_text = element.text_content().strip()
+            if ges_text is None and ('GES' in first_text or any('GES' in text for text in labels)):
+                ges_text = element.text_content().strip()
+            if depenses_text is None and any(LABEL_DEPENSES in text for text in labels):
+                depenses_text = element.text_content().strip()
+            if chambres_source is None and LABEL_CHAMBRES in first_text:
+                chambres_source = element.text_content()
+
+        elif tag == 'label':
+            first_text = XPATH_FIRST_TEXT(element)
+            if chambres_source is None and LABEL_CHAMBRES in first_text:
+                following = XPATH_FOLLOWING_TEXT(element)
+                if following:
+                    chambres_source = following[0]
+            if not habit_label_found and len(element) == 0 and element.text == LABEL_HABITATION:
+                habit_label_found = True
+                habit_label = _next_sibling_text(element)
+
+        elif tag == 'meta':
+            itemprop = element.get('itemprop')
+            if itemprop == 'productid' and ref is None:
+                ref = element.get('content')
+            elif itemprop == 'model':
+                meta_models.append(element)
+            elif itemprop == 'image' and meta_image is None:
+                meta_image = element.get('content')
+
+        elif tag == 'div':
+            if element.get('id') == 'diapo_annonce':
+                images_links.extend(XPATH_IMAGES(element))
+            if 'caracteristique agence' in (element.get('class') or ''):
+                agency_blocks.append(element)
+
+        elif tag == 'h1':
+            if titre is None and _has_class(element, 'titreFiche'):
+                titre = _stripped_text(element)
+
+        elif tag == 'span':
+            if prix is None and element.get('itemprop') == 'price':
+                prix = _stripped_text(element)
+
+        elif tag == 'p':
+            if description is None and element.get('itemprop') == 'description':
+                description = _stripped_text(element)
+
+    # Code postal
+    if lieu:
+        match = RE_CODE_POSTAL.search(lieu)
+        lieu = match.group(1) if match else None
+
+    # Type d'habitation : libellé, puis méta données
+    if habit_label_found:
+        habit_type = habit_label.strip() if habit_label else None
+    else:
+        habit_type = meta_models[0].get('content') if meta_models else None
+        if not habit_type:
+            contents = [meta.get('content') for meta in meta_models if meta.get('content') is not None]
+            habit_type = contents[0] if contents else None
+
+    # DPE
+    if dpe_text:
+        dpe_match = RE_DPE.search(dpe_text) or RE_DPE_LOOSE.search(dpe_text)
+        dpe_rating = dpe_match.group(1) if dpe_match else None
+        consumption_match = RE_DPE_CONSUMPTION.search(dpe_text)
+        dpe_consumption = int(consumption_match.group(1)) if consumption_match else None
+    else:
+        dpe_rating = None
+        dpe_consumption = None
+
+    # GES
+    if ges_text is None and dpe_text and "GES" in dpe_text:
+        ges_text = dpe_text
+    if ges_text:
+        ges_match = RE_GES.search(ges_text) or RE_GES_LOOSE.search(ges_text)
+        ges_rang = ges_match.group(1) if ges_match else None
+        emission_match = RE_GES_EMISSION.search(ges_text)
+        ges_emission = int(emission_match.group(1)) if emission_match else None
+    else:
+        ges_rang = None
+        ges_emission = None
+
+    # Dépenses énergétiques
+    depenses_min = depenses_max = date_ref_prix = None
+    if depenses_text:
+        montants_match = RE_DEPENSES.search(depenses_text)
+        if montants_match:
+            depenses_min = int(montants_match.group(1))
+            depenses_max = int(montants_match.group(2))
+        date_ref_match = RE_DATE_REF_PRIX.search(depenses_text)
+        date_ref_prix = date_ref_match.group(1) if date_ref_match else None
+
+    # Images, avec les méta données en secours
+    if not images_links and meta_image is not None:
+        images_links = [meta_image]
+
+    # Agence
+    agency_id = agency_name = agency_address = agency_url = None
+    for block in agency_blocks:
+        if agency_name is None:
+            names = XPATH_AGENCY_NAME(block)
+            agency_name = names[0].strip() if names else None
+        if agency_address is None:
+            addresses = XPATH_AGENCY_ADDRESS(block)
+            agency_address = addresses[0].strip() if addresses else None
+        if agency_url is None:
+            urls = XPATH_AGENCY_URL(block)
+            agency_url = urls[0] if urls else None
+
+    if agency_url:
+        agency_id_match = RE_AGENCY_ID.search(agency_url)
+        if agency_id_match:
+            agency_id = agency_id_match.group(1)
+
+    parsed_url = urlparse(url_annonce)
+    full_agency_url = f"{parsed_url.scheme}://{parsed_url.netloc}{agency_url}" if agency_url else None
+
+    data_annonce = {
+        'titre': titre,
+        'prix': prix,
+        'reference': ref,
+        'code_postal': lieu,
+        'surface': extract_numbers(surface),
+        'nb_pieces': extract_numbers(pieces),
+        'type_habitation': habit_type,
+        'dpe_rating': dpe_rating,
+        'dpe_consumption': dpe_consumption,
+        'ges_rating': ges_rang,
+        'ges_emission': ges_emission,
+        'nb_chambres': extract_numbers(chambres_source),
+        'description': description,
+        'parking': parking_text == "Oui",
+        'url': url_annonce,
+        'images': list(images_links),
+        'depenses_energie_min': depenses_min,
+        'depenses_energie_max': depenses_max,
+        'date_ref_prix_energie': date_ref_prix,
+        'agency_id': agency_id,
+        'date_scrape': date_scrape
+    }
+
+    data_agence = {
+        'agency_id': agency_id,
+        'agency_name': agency_name,
+        'agency_address': agency_address,
+        'agency_url': agency_url,
+        'agency_phone': None,
+        'agency_siret': None,
+        'agency_card_number': None,
+        'agency_legal_reps': None,
+        'date_scrape': date_scrape,
+        'details_fetched_at': None
+    }
+
+    return data_annonce, data_agence, full_agency_url
+
+####
+#    PAGE AGENCE    #
+####
+def parse_agence(content):
+    """
+    Analyse le HTML de la page d'une agence : téléphone, SIRET, carte
+    professionnelle et représentants légaux (None si absents).
+    """
+    details = {
+        'agency_phone': None,
+        'agency_siret': None,
+        'agency_card_number': None,
+        'agency_legal_reps': None
+    }
+    tree = html.fromstring(content)
+
+    phones = XPATH_AGENCY_PHONE(tree)
+    if phones:
+        details['agency_phone'] = phones[0].strip()
+
+    for item in XPATH_AGENCY_INFOS(tree):
+        item_text = item.text_content().strip()
+        value = item_text.split(':', 1)[1].strip() if ':' in item_text else item_text
+        if 'SIRET' in item_text:
+            details['agency_siret'] = value
+        elif 'Carte N°' in item_text:
+            details['agency_card_number'] = value
+        elif 'Représentants légaux' in item_text:
+            details['agency_legal_reps'] = value
+
+    return details
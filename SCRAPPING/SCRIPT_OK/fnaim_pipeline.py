@@ -0,0 +1,281 @@
+"""
+Moteur de scraping en pipeline producteur/consommateur pour SCRAPPING_FNAIM_V3.
+
+Un thread parcourt les pages de résultats et pousse les URLs des annonces dans
+une file bornée ; des workers vident cette file en continu. La latence de la
+pagination (et la pause entre les pages) se superpose ainsi au scraping des
+fiches au lieu de s'y ajouter. La file bornée assure la contre-pression : le
+parcours des pages se bloque tant que les workers n'ont pas rattrapé leur retard.
+"""
+import queue
+import random
+import threading
+import time
+
+from fnaim_agency_cache import AgencyCache
+from fnaim_records import collect_results
+from fnaim_scraper import (
+    CrawlAccumulator,
+    create_checkpoint,
+    create_session_with_retry,
+    fetch_announcement,
+    finish_crawl_state,
+    logger,
+    scrapping_urls,
+)
+
+# Message de fin pour les workers
+_STOP = None
+
+####
+#    PRODUCTEUR : PARCOURS DES PAGES DE RÉSULTATS    #
+####
+def _walk_pages(base_url, session, url_queue, events, stop_event, max_pages, page_delay, crawl_state=None,
+                start_page=1, all_urls_processed=None, seen_urls=None):
+    """
+    Parcourt les pages de résultats à partir de start_page et pousse (page_number, url)
+    dans url_queue. Chaque page est annoncée dans `events` avant ses URLs, avec leur liste.
+    Le message de fin indique (toutes les pages de résultats parcourues, parcours terminé).
+    """
+    all_urls_processed = set(all_urls_processed or ())
+    page_number = start_page
+    crawl_complete = False
+    finished = False
+
+    try:
+        while not stop_event.is_set() and (max_pages is None or page_number <= max_pages):
+            url_page = f"{base_url}&ip={page_number}"
+            urls_annonces, status_code = scrapping_urls(url_page, session)
+
+            if not urls_annonces or status_code != 200:
+                logger.info(f"Aucune annonce trouvée ou erreur à la page {page_number} (status: {status_code}). Fin du parcours des pages.")
+                crawl_complete = status_code == 200
+                finished = crawl_complete
+                break
+
+            if crawl_state is not None:
+                crawl_state.mark_seen(urls_annonces)
+
+            # Filtrer les URLs déjà traitées
+            urls_to_process = [url for url in urls_annonces if url not in all_urls_processed]
+            if seen_urls is not None:
+                urls_to_process = seen_urls.claim(urls_to_process)
+            all_urls_processed.update(urls_to_process)
+            logger.info(f"Page {page_number}: {len(urls_to_process)}/{len(urls_annonces)} nouvelles annonces à traiter")
+
+            events.put(('page', page_number, urls_to_process))
+            for url in urls_to_process:
+                # Bloque si la file est pleine (contre-pression)
+                while not stop_event.is_set():
+                    try:
+                        url_queue.put((page_number, url), timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+
+            page_number += 1
+
+            # Pause aléatoire entre les pages, sans bloquer les workers
+            if page_delay:
+                stop_event.wait(random.uniform(*page_delay))
+        else:
+            # Nombre maximum de pages atteint
+            finished = not stop_event.is_set()
+
+    except Exception as e:
+        logger.error(f"Erreur lors du parcours des pages: {e}")
+
+    finally:
+        events.put(('done', page_number - 1, (crawl_complete, finished)))
+
+####
+#    CONSOMMATEURS : SCRAPING DES FICHES ANNONCES    #
+####
+def _detail_worker(session, url_queue, events, max_retries, agency_cache, crawl_state=None, metrics=None):
+    """Vide url_queue et publie le résultat de chaque annonce dans `events`."""
+    while True:
+        item = url_queue.get()
+        if item is _STOP:
+            break
+        page_number, url = item
+        try:
+            result = fetch_announcement(
+                url, session, max_retries, agency_cache=agency_cache, crawl_state=crawl_state, metrics=metrics
+            )
+        except Exception as e:
+            logger.error(f"Erreur non gérée pour {url}: {e}")
+            result = (None, None)
+        events.put(('annonce', page_number, result))
+
+####
+#    SUIVI DES PAGES TERMINÉES    #
+####
+class _PageTracker:
+    """
+    Regroupe les résultats par page et les transmet à l'accumulateur dans
+    l'ordre des pages, dès qu'une page et toutes les précédentes sont complètes.
+    Les sauvegardes tous les save_interval pages gardent ainsi leur sens.
+    """
+    def __init__(self, accumulator, start_page=1, metrics=None):
+        self.accumulator = accumulator
+        self.metrics = metrics
+        self.expected = {}
+        self.urls = {}
+        self.results = {}
+        self.next_page = start_page
+
+    def register(self, page_number, urls):
+        self.expected[page_number] = len(urls)
+        self.urls[page_number] = urls
+        self.results.setdefault(page_number, [])
+        self._flush()
+
+    def add(self, page_number, result):
+        self.results.setdefault(page_number, []).append(result)
+        self._flush()
+
+    def pending(self):
+        return len(self.expected)
+
+    def _flush(self):
+        while self.next_page in self.expected and len(self.results[self.next_page]) >= self.expected[self.next_page]:
+            page_number = self.next_page
+            results = self.results.pop(page_number)
+            del self.expected[page_number]
+
+            annonces, agences = collect_results(results)
+            self.accumulator.add_page(page_number, annonces, agences, self.urls.pop(page_number))
+            if self.metrics is not None:
+                self.metrics.end_page(page_number)
+            self.next_page += 1
+
+####
+#    SCRAPING PRINCIPAL EN PIPELINE    #
+####
+def scrapping_fnaim_pipeline(base_url, max_workers=5, max_retries=3, max_pages=None, save_interval=5,
+                             queue_size=None, page_delay=(1.5, 3.0), agency_cache=None, crawl_state=None,
+                             checkpoint=None, resume=True, rate_limiter=None, seen_urls=None,
+                             response_hooks=None, concurrency=None, metrics=None, output=None):
+    """
+    Scrappe les annonces FNAIM en superposant pagination et scraping des fiches.
+
+    Args:
+        base_url (str): URL de base pour la recherche
+        max_workers (int): Nombre de workers qui scrapent les fiches annonces
+        max_retries (int): Nombre maximum de tentatives par URL
+        max_pages (int): Nombre maximum de pages à scraper (None = illimité)
+        save_interval (int): Intervalle de sauvegarde en nombre de pages
+        queue_size (int): Taille de la file d'URLs (défaut: 4 x max_workers)
+        page_delay (tuple): Bornes de la pause aléatoire entre deux pages (None = pas de pause)
+        agency_cache (AgencyCache): Cache des pages agences partagé par les workers
+        crawl_state (CrawlState): État du crawl précédent pour un re-crawl incrémental
+        checkpoint (CheckpointJournal): Journal de reprise (défaut: create_checkpoint(base_url))
+        resume (bool): Reprendre un crawl interrompu depuis sa dernière page sauvegardée
+        rate_limiter (RateLimiter): Rate limit partagé par toutes les requêtes
+        seen_urls (SharedUrlSet): URLs déjà prises en charge par d'autres crawls simultanés
+        response_hooks (list): Hooks appelés sur chaque réponse HTTP (voir fnaim_corpus)
+        concurrency (AdaptiveConcurrency): Contrôleur AIMD du nombre de requêtes en vol (voir fnaim_concurrency)
+        metrics (CrawlMetrics): Mesures par étape et par page (voir fnaim_metrics)
+        output (ScrapeOutput): Sortie typée Parquet/Arrow (voir fnaim_output)
+
+    Returns:
+        tuple: (DataFrame des annonces, DataFrame des agences)
+    """
+    session = create_session_with_retry(
+        retries=max_retries, rate_limiter=rate_limiter, response_hooks=response_hooks, concurrency=concurrency,
+        metrics=metrics
+    )
+    if agency_cache is None:
+        agency_cache = AgencyCache()
+    if checkpoint is None:
+        checkpoint = create_checkpoint(base_url)
+    accumulator = CrawlAccumulator(save_interval, journal=checkpoint, output=output, crawl_state=crawl_state)
+    start_page, all_urls_processed = accumulator.start(resume)
+    tracker = _PageTracker(accumulator, start_page, metrics)
+
+    url_queue = queue.Queue(maxsize=queue_size or 4 * max_workers)
+    events = queue.Queue()
+    stop_event = threading.Event()
+    crawl_complete = False
+    finished = False
+    if crawl_state is not None:
+        crawl_state.start_run()
+        crawl_state.mark_seen(all_urls_processed)
+
+    producer = threading.Thread(
+        target=_walk_pages,
+        args=(base_url, session, url_queue, events, stop_event, max_pages, page_delay, crawl_state,
+              start_page, all_urls_processed, seen_urls),
+        name="fnaim-pages",
+        daemon=True
+    )
+    workers = [
+        threading.Thread(
+            target=_detail_worker,
+            args=(session, url_queue, events, max_retries, agency_cache, crawl_state, metrics),
+            name=f"fnaim-worker-{i}",
+            daemon=True
+        )
+        for i in range(max_workers)
+    ]
+
+    start = time.time()
+    try:
+        producer.start()
+        for worker in workers:
+            worker.start()
+
+        producer_done = False
+        walk_result = (False, False)
+        while not producer_done or tracker.pending():
+            kind, page_number, payload = events.get()
+            if kind == 'page':
+                tracker.register(page_number, payload)
+            elif kind == 'annonce':
+                tracker.add(page_number, payload)
+            elif kind == 'done':
+                producer_done = True
+                walk_result = payload
+
+        # Toutes les pages annoncées ont été transmises à l'accumulateur
+        crawl_complete, finished = walk_result
+
+    except KeyboardInterrupt:
+        logger.warning("Interruption utilisateur. Sauvegarde des données collectées...")
+        accumulator.save("interrupt")
+
+    except Exception as e:
+        logger.error(f"Erreur lors du scraping: {e}")
+        accumulator.save("error")
+
+    finally:
+        # Arrêter le producteur, abandonner les URLs en attente puis arrêter les workers
+        stop_event.set()
+        while True:
+            try:
+                url_queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in workers:
+            url_queue.put(_STOP)
+
+        # Attendre la fin des requêtes en cours : plus aucun thread ne modifie
+        # le cache agences ni l'état du crawl pendant la sauvegarde finale
+        for thread in [producer] + workers:
+            if thread.is_alive():
+                thread.join()
+
+        # Toujours sauvegarder à la fin
+        accumulator.finish(finished)
+        agency_cache.save()
+        logger.info(f"Cache agences: {agency_cache.stats()}")
+        if concurrency is not None:
+            logger.info(f"Concurrence adaptative: {concurrency.metrics()}")
+        if metrics is not None:
+            logger.info(f"Temps cumulé par étape: {metrics.report()}")
+        if crawl_state is not None:
+            finish_crawl_state(crawl_state, crawl_complete)
+
+        logger.info(f"Scraping terminé en {time.time() - start:.1f}s. {len(accumulator.annonces)} annonces et {len(accumulator.agences)} agences récupérées.")
+
+    return accumulator.annonces_df, accumulator.agences_df
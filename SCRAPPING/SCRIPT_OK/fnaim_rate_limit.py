@@ -0,0 +1,47 @@
+"""
+Rate limit partagé entre threads pour les sessions requests du scraper FNAIM.
+
+RateLimiter est un seau à jetons thread-safe (équivalent synchrone du
+TokenBucket de fnaim_async). Monté sur une session via RateLimitedAdapter,
+il s'applique à toutes ses requêtes (pages de résultats, fiches, agences) ;
+plusieurs sessions partageant le même RateLimiter respectent un débit global.
+"""
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+
+class RateLimiter:
+    """
+    Seau à jetons : `rate` requêtes par seconde en régime établi, avec des
+    rafales d'au plus `capacity` requêtes.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Attend qu'un jeton soit disponible puis le consomme."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter qui prend un jeton du RateLimiter avant chaque envoi."""
+    def __init__(self, rate_limiter, *args, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        self.rate_limiter.acquire()
+        return super().send(request, **kwargs)
@@ -0,0 +1,100 @@
+"""
+Enregistrements légers produits par le scraper FNAIM.
+
+Chaque annonce (et son agence) est représentée par une dataclass à __slots__
+au lieu de deux DataFrames d'une ligne : les résultats sont accumulés dans des
+listes, et les DataFrames ne sont construits, colonne par colonne, qu'au moment
+d'une sauvegarde ou à la fin du crawl (voir records_to_dataframe).
+"""
+from dataclasses import dataclass, fields
+
+import pandas as pd
+
+@dataclass(slots=True)
+class AnnonceRecord:
+    """Champs d'une fiche annonce, dans l'ordre des colonnes de annonces_fnaim.csv."""
+    titre: str = None
+    prix: str = None
+    reference: str = None
+    code_postal: str = None
+    surface: int = None
+    nb_pieces: int = None
+    type_habitation: str = None
+    dpe_rating: str = None
+    dpe_consumption: int = None
+    ges_rating: str = None
+    ges_emission: int = None
+    nb_chambres: int = None
+    description: str = None
+    parking: bool = None
+    url: str = None
+    images: list = None
+    depenses_energie_min: int = None
+    depenses_energie_max: int = None
+    date_ref_prix_energie: str = None
+    agency_id: str = None
+    date_scrape: object = None
+    statut_crawl: str = None
+
+@dataclass(slots=True)
+class AgenceRecord:
+    """Champs d'une agence, dans l'ordre des colonnes de agences_fnaim.csv."""
+    agency_id: str = None
+    agency_name: str = None
+    agency_address: str = None
+    agency_url: str = None
+    agency_phone: str = None
+    agency_siret: str = None
+    agency_card_number: str = None
+    agency_legal_reps: str = None
+    date_scrape: object = None
+    # Date de récupération de la page agence (celle de l'entrée du cache si elle en vient)
+    details_fetched_at: object = None
+
+ANNONCE_FIELDS = tuple(f.name for f in fields(AnnonceRecord))
+AGENCE_FIELDS = tuple(f.name for f in fields(AgenceRecord))
+
+# Colonnes retirées des DataFrames lorsqu'elles ne sont renseignées pour aucun enregistrement
+OPTIONAL_FIELDS = ('statut_crawl',)
+
+def record_to_dict(record):
+    """Dictionnaire {champ: valeur} d'un enregistrement."""
+    return {name: getattr(record, name) for name in record.__slots__}
+
+def records_to_dataframe(records, record_type):
+    """
+    Construit un DataFrame à partir d'une liste d'enregistrements, colonne par colonne.
+    Les colonnes optionnelles jamais renseignées sont omises.
+    """
+    names = [f.name for f in fields(record_type)]
+    if not records:
+        return pd.DataFrame()
+
+    columns = {name: [getattr(record, name) for record in records] for name in names}
+    for name in OPTIONAL_FIELDS:
+        if name in columns and all(value is None for value in columns[name]):
+            del columns[name]
+    return pd.DataFrame(columns)
+
+def record_from_dict(record_type, data):
+    """Enregistrement construit à partir d'un dictionnaire (les clés inconnues sont ignorées)."""
+    return record_type(**{name: value for name, value in data.items() if name in record_type.__slots__})
+
+def collect_results(results):
+    """
+    Regroupe les résultats (annonce, agence) des annonces d'une page : les annonces
+    vides (échec, annonce inchangée) sont ignorées et chaque agence n'est gardée qu'une fois.
+
+    Returns:
+        tuple: (liste des AnnonceRecord, liste des AgenceRecord)
+    """
+    annonces = []
+    agences = []
+    agency_ids = set()
+    for annonce, agence in results:
+        if annonce is not None:
+            annonces.append(annonce)
+        if agence is not None and agence.agency_id is not None and agence.agency_id not in agency_ids:
+            agency_ids.add(agence.agency_id)
+            agences.append(agence)
+    return annonces, agences
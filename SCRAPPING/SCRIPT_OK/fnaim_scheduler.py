@@ -0,0 +1,240 @@
+"""
+Ordonnanceur de crawls FNAIM multi-localités.
+
+Au lieu d'exécuter SCRAPPING_FNAIM_V3 une fois par commune avec une URL de
+recherche copiée depuis le site, l'ordonnanceur :
+- construit l'URL de recherche FNAIM de chaque localité (code INSEE, libellé,
+  filtres optionnels) ;
+- crawle plusieurs localités simultanément avec scrapping_fnaim, sous un rate
+  limit global partagé par toutes les requêtes ;
+- partage entre les localités l'ensemble des annonces déjà prises en charge et
+  le cache des agences ;
+- rapporte le débit de chaque localité.
+
+Par défaut, les localités sont les communes suivies par
+Recuperation_donnees_API_DV3F.main.
+"""
+import concurrent.futures
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlencode
+
+import pandas as pd
+
+from fnaim_agency_cache import AgencyCache
+from fnaim_rate_limit import RateLimiter
+from fnaim_scraper import BACKUP_DIR, logger, scrapping_fnaim
+
+SEARCH_URL = "https://www.fnaim.fr/17-acheter.htm"
+
+# Tri des résultats utilisé par le site
+SEARCH_ORDER = "CEN_VTE_PRIX_VENTE asc,TRI_PRIX asc,CEN_MDT_DTE_CREATION desc"
+
+# Nombre d'annonces par page de résultats
+RESULTS_PER_PAGE = 12
+
+# Filtres de recherche sous forme d'intervalle (min, max), None = non borné
+RANGE_FILTERS = ("NB_PIECES", "SURFACE", "PRIX", "NB_CHAMBRES", "SURFACE_TERRAIN")
+
+# Types de biens : 1 = appartement, 2 = maison
+DEFAULT_TYPES = (1, 2)
+
+@dataclass
+class Locality:
+    """
+    Localité à crawler.
+
+    Args:
+        insee (str): Code INSEE de la commune
+        label (str): Libellé FNAIM de la localité, ex: "RENNES (35000)"
+        filters (dict): Filtres optionnels : "TYPE" (liste de types de biens) et
+            intervalles (min, max) pour NB_PIECES, SURFACE, PRIX, NB_CHAMBRES, SURFACE_TERRAIN
+        fnaim_id (str): Identifiant interne FNAIM de la localité, s'il est connu
+    """
+    insee: str
+    label: str
+    filters: dict = field(default_factory=dict)
+    fnaim_id: str = None
+
+# Communes suivies par Recuperation_donnees_API_DV3F.main
+DV3F_LOCALITIES = [
+    Locality("35238", "RENNES (35000)", fnaim_id="1213"),
+    Locality("75056", "PARIS (75000)"),
+    Locality("69123", "LYON (69000)"),
+    Locality("13055", "MARSEILLE (13000)"),
+    Locality("33063", "BORDEAUX (33000)"),
+    Locality("59350", "LILLE (59000)"),
+    Locality("44109", "NANTES (44000)"),
+    Locality("31555", "TOULOUSE (31000)"),
+    Locality("67482", "STRASBOURG (67000)"),
+    Locality("06088", "NICE (06000)"),
+]
+
+####
+#    CONSTRUCTION DES URLS DE RECHERCHE    #
+####
+def build_search_url(locality, search_url=SEARCH_URL):
+    """
+    Construit l'URL de recherche FNAIM (achat) d'une localité, sans numéro de
+    page (ajouté par scrapping_fnaim).
+    """
+    localite = {}
+    if locality.fnaim_id:
+        localite['id'] = locality.fnaim_id
+    localite.update({'type': "3", 'label': locality.label, 'insee': locality.insee})
+
+    params = [
+        ("TRANSACTION", "1"),
+        ("localites", json.dumps([localite], separators=(',', ':'))),
+    ]
+    for type_bien in locality.filters.get("TYPE", DEFAULT_TYPES):
+        params.append(("TYPE[]", str(type_bien)))
+    for name in RANGE_FILTERS:
+        bounds = locality.filters.get(name) or (None, None)
+        for bound in bounds:
+            params.append((f"{name}[]", "" if bound is None else str(bound)))
+    params += [("op", SEARCH_ORDER), ("mp", str(RESULTS_PER_PAGE))]
+
+    return f"{search_url}?{urlencode(params)}"
+
+####
+#    DÉDUPLICATION PARTAGÉE    #
+####
+class SharedUrlSet:
+    """Ensemble thread-safe des URLs d'annonces déjà prises en charge par l'un des crawls."""
+    def __init__(self):
+        self._urls = set()
+        self._lock = threading.Lock()
+
+    def claim(self, urls):
+        """Réserve les URLs encore libres et les retourne (dans l'ordre d'origine)."""
+        with self._lock:
+            claimed = [url for url in urls if url not in self._urls]
+            self._urls.update(claimed)
+        return claimed
+
+    def __len__(self):
+        return len(self._urls)
+
+####
+#    ORDONNANCEMENT    #
+####
+def _crawl_locality(locality, search_url, rate_limiter, seen_urls, agency_cache, scrapping_options):
+    """Crawle une localité et mesure son débit."""
+    base_url = build_search_url(locality, search_url)
+    logger.info(f"[{locality.label}] Début du crawl: {base_url}")
+
+    start = time.time()
+    df_annonces, df_agences = scrapping_fnaim(
+        base_url,
+        rate_limiter=rate_limiter,
+        seen_urls=seen_urls,
+        agency_cache=agency_cache,
+        **scrapping_options
+    )
+    duration = time.time() - start
+
+    stats = {
+        'insee': locality.insee,
+        'localite': locality.label,
+        'annonces': len(df_annonces),
+        'agences': len(df_agences),
+        'duree_s': round(duration, 1),
+        'annonces_par_s': round(len(df_annonces) / duration, 2) if duration else 0.0,
+    }
+    logger.info(f"[{locality.label}] {stats['annonces']} annonces en {duration:.1f}s ({stats['annonces_par_s']} annonces/s)")
+    return df_annonces, df_agences, stats
+
+def schedule_crawls(localities=None, max_parallel=3, rate_limit=5.0, burst=10, agency_cache=None,
+                    search_url=SEARCH_URL, **scrapping_options):
+    """
+    Crawle plusieurs localités simultanément.
+
+    Args:
+        localities (list): Localités à crawler (défaut: DV3F_LOCALITIES)
+        max_parallel (int): Nombre de localités crawlées en même temps
+        rate_limit (float): Nombre moyen de requêtes par seconde, toutes localités confondues
+        burst (int): Taille maximale des rafales du rate limit
+        agency_cache (AgencyCache): Cache des pages agences partagé (défaut: cache en mémoire)
+        search_url (str): URL du moteur de recherche FNAIM
+        **scrapping_options: Options transmises à scrapping_fnaim (max_workers, max_pages,
+            engine "threads" ou "pipeline", ...)
+
+    Returns:
+        tuple: (DataFrame des annonces, DataFrame des agences, DataFrame du débit par localité)
+    """
+    localities = localities if localities is not None else DV3F_LOCALITIES
+    if agency_cache is None:
+        agency_cache = AgencyCache()
+    rate_limiter = RateLimiter(rate_limit, burst)
+    seen_urls = SharedUrlSet()
+
+    all_annonces = []
+    all_agences = []
+    report = []
+
+    start = time.time()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="fnaim-localite") as executor:
+        future_to_locality = {
+            executor.submit(
+                _crawl_locality, locality, search_url, rate_limiter, seen_urls, agency_cache, scrapping_options
+            ): locality
+            for locality in localities
+        }
+
+        for future in concurrent.futures.as_completed(future_to_locality):
+            locality = future_to_locality[future]
+            try:
+                df_annonces, df_agences, stats = future.result()
+            except Exception as e:
+                logger.error(f"[{locality.label}] Échec du crawl: {e}")
+                report.append({'insee': locality.insee, 'localite': locality.label, 'erreur': str(e)})
+                continue
+            if not df_annonces.empty:
+                all_annonces.append(df_annonces)
+            if not df_agences.empty:
+                all_agences.append(df_agences)
+            report.append(stats)
+
+    df_annonces = pd.concat(all_annonces, ignore_index=True) if all_annonces else pd.DataFrame()
+    df_agences = pd.concat(all_agences, ignore_index=True) if all_agences else pd.DataFrame()
+    if not df_agences.empty:
+        df_agences = df_agences.drop_duplicates(subset='agency_id', keep='first', ignore_index=True)
+
+    duration = time.time() - start
+    df_report = pd.DataFrame(report)
+    logger.info(f"Débit par localité:\n{df_report.to_string(index=False)}")
+    logger.info(f"Crawl multi-localités terminé en {duration:.1f}s: {len(df_annonces)} annonces, "
+                f"{len(df_agences)} agences ({len(df_annonces) / duration if duration else 0:.2f} annonces/s)")
+    logger.info(f"Cache agences: {agency_cache.stats()}")
+
+    return df_annonces, df_agences, df_report
+
+####
+#    EXÉCUTION PRINCIPALE    #
+####
+if __name__ == "__main__":
+    # Cache des pages agences persisté entre deux exécutions (validité: 7 jours)
+    agency_cache = AgencyCache(path=os.path.join(BACKUP_DIR, "agences_cache.json"), ttl=7 * 24 * 3600)
+
+    df_annonces, df_agences, df_report = schedule_crawls(
+        DV3F_LOCALITIES,
+        max_parallel=3,
+        rate_limit=5.0,  # Requêtes par seconde, toutes localités confondues
+        agency_cache=agency_cache,
+        max_workers=3,
+        max_retries=4,
+        max_pages=None,  # Définir une valeur (ex: 5) pour limiter, None pour tout scraper
+        save_interval=2
+    )
+    agency_cache.save()
+
+    # Enregistrer les données dans des fichiers CSV
+    df_annonces.to_csv('annonces_fnaim.csv', index=False)
+    df_agences.to_csv('agences_fnaim.csv', index=False)
+    df_report.to_csv('debit_localites_fnaim.csv', index=False)
+
+    logger.info("Fichiers CSV créés avec succès !")
@@ -0,0 +1,772 @@
+"""
+Fonctions du scraper FNAIM partagées par SCRAPPING_FNAIM_V3 et les moteurs
+(fnaim_async, fnaim_pipeline, fnaim_parse_pool, fnaim_distributed, fnaim_scheduler).
+
+Exécuté comme script, SCRAPPING_FNAIM_V3 est chargé sous le nom __main__ : les
+moteurs qui l'importaient en chargeaient une seconde copie, avec son propre
+horodatage du crawl (date_scrape), son propre logger et sa propre configuration
+du logging. Ce module n'est chargé qu'une fois, quel que soit le point d'entrée.
+"""
+import re
+import requests
+import time
+import datetime
+import random
+import logging
+import os
+from tqdm import tqdm
+from bs4 import BeautifulSoup
+import concurrent.futures
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3 import PoolManager
+from lxml import etree, html
+from urllib.parse import urlparse  
+from fnaim_agency_cache import AgencyCache, agency_cache_key
+from fnaim_checkpoint import CheckpointJournal
+from fnaim_concurrency import AdaptiveConcurrencyAdapter
+from fnaim_crawl_state import content_fingerprint
+from fnaim_metrics import stage_timer
+from fnaim_parser import extract_numbers, parse_agence, parse_annonce
+from fnaim_rate_limit import RateLimitedAdapter
+from fnaim_records import (
+    AgenceRecord,
+    AnnonceRecord,
+    collect_results,
+    record_from_dict,
+    record_to_dict,
+    records_to_dataframe,
+)
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("scraping.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+timestamp = datetime.datetime.now()
+
+# Dossier pour les sauvegardes intermédiaires
+BACKUP_DIR = "scraping_backups"
+os.makedirs(BACKUP_DIR, exist_ok=True)
+
+####
+#    FONCTIONS UTILITAIRES    #
+####
+def create_session_with_retry(retries=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504, 429), rate_limiter=None,
+                              response_hooks=None, concurrency=None, metrics=None):
+    """
+    Crée une session avec une stratégie de nouvelle tentative optimisée avec urllib3.
+    Si rate_limiter (fnaim_rate_limit.RateLimiter) est fourni, chaque requête de la
+    session consomme un jeton de ce rate limit, éventuellement partagé avec d'autres sessions.
+    Les response_hooks sont appelés sur chaque réponse (ex: fnaim_corpus.HtmlCorpus.record_response).
+    Si concurrency (fnaim_concurrency.AdaptiveConcurrency) est fourni, le nombre de requêtes
+    en vol suit sa limite adaptative ; les 429/5xx ne sont alors plus réessayés par urllib3
+    mais par l'adaptateur, qui transmet chaque tentative au contrôleur et respecte Retry-After.
+    Si metrics (fnaim_metrics.CrawlMetrics) est fourni, chaque requête est chronométrée
+    (connexion, TTFB, téléchargement, taille).
+    """
+    # Avec le contrôleur adaptatif, les 429/5xx sont réessayés par l'adaptateur (urllib3
+    # réessaierait sinon les 429/503 porteurs d'un Retry-After, sans que le contrôleur les voie)
+    adaptive = concurrency is not None
+    urllib3_status_forcelist = () if adaptive else status_forcelist
+    # Configuration avancée pour urllib3 et la gestion des connexions
+    retry_strategy = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=urllib3_status_forcelist,
+        allowed_methods=["GET"],
+        raise_on_status=False,
+        respect_retry_after_header=not adaptive,
+        # Nouvelles options pour améliorer la robustesse
+        connect=retries,
+        read=retries,
+        redirect=5
+    )
+    
+    # Créer un adaptateur avec le gestionnaire de connexions optimisé
+    adapter_options = dict(
+        max_retries=retry_strategy,
+        pool_connections=10,
+        pool_maxsize=20,
+        pool_block=False
+    )
+    if adaptive:
+        adapter = AdaptiveConcurrencyAdapter(
+            concurrency, rate_limiter, status_retries=retries, status_forcelist=status_forcelist,
+            backoff_factor=backoff_factor, **adapter_options
+        )
+    elif rate_limiter is not None:
+        adapter = RateLimitedAdapter(rate_limiter, **adapter_options)
+    else:
+        adapter = HTTPAdapter(**adapter_options)
+    
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    
+    # Ajout d'en-têtes pour simuler un navigateur réel
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Cache-Control': 'max-age=0'
+    })
+    
+    for hook in response_hooks or ():
+        session.hooks['response'].append(hook)
+    if metrics is not None:
+        metrics.instrument(session)
+    
+    return session
+
+def save_progress(df_annonces, df_agences, prefix='interim'):
+    """Sauvegarde les données collectées jusqu'à présent."""
+    timestamp_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    annonces_file = f"{BACKUP_DIR}/{prefix}_annonces_{timestamp_str}.csv"
+    agences_file = f"{BACKUP_DIR}/{prefix}_agences_{timestamp_str}.csv"
+    
+    df_annonces.to_csv(annonces_file, index=False)
+    df_agences.to_csv(agences_file, index=False)
+    logger.info(f"Progression sauvegardée : {len(df_annonces)} annonces et {len(df_agences)} agences")
+
+####
+#    SCRAPING DES DÉTAILS D'ANNONCE
+####
+def parse_annonce_html(annonce_fiche_html, url_annonce):
+    """
+    Analyse le HTML d'une fiche annonce, sans effectuer de requête.
+    Retourne (data_annonce, data_agence, full_agency_url) ; les champs de
+    l'agence issus de sa page dédiée (téléphone, SIRET, ...) restent à None.
+    Un seul parsing lxml avec des XPath et regex précompilés (voir fnaim_parser).
+    """
+    return parse_annonce(annonce_fiche_html, url_annonce, date_scrape=timestamp)
+
+def parse_agence_html(agency_html):
+    """
+    Analyse le HTML de la page d'une agence.
+    Retourne un dictionnaire avec le téléphone, le SIRET, la carte professionnelle
+    et les représentants légaux (None si absents).
+    """
+    return parse_agence(agency_html)
+
+def fetch_agency_details(full_agency_url, session, timeout=45):
+    """
+    Télécharge et analyse la page d'une agence.
+    Une réponse en erreur (404, 429, 5xx) lève une exception : elle n'est pas mise en cache.
+    """
+    agency_response = session.get(full_agency_url, timeout=timeout)
+    agency_response.raise_for_status()
+    return parse_agence_html(agency_response.content)
+
+def fetch_annonce_page(url_annonce, session, timeout=30, crawl_state=None):
+    """
+    Télécharge une fiche annonce, sans l'analyser.
+    Si crawl_state est fourni, la fiche est demandée de façon conditionnelle.
+    
+    Returns:
+        tuple: (réponse, empreinte du HTML ou None), ou (None, None) si la fiche
+        n'a pas changé depuis le dernier passage
+    """
+    headers = crawl_state.conditional_headers(url_annonce) if crawl_state is not None else None
+    annonce_fiche_response = session.get(url_annonce, timeout=timeout, headers=headers)
+    
+    # Annonce inchangée depuis le dernier passage : pas de parsing
+    if crawl_state is not None and annonce_fiche_response.status_code == 304:
+        crawl_state.mark_not_modified()
+        return None, None
+    annonce_fiche_response.raise_for_status()
+    
+    content_hash = None
+    if crawl_state is not None:
+        content_hash = content_fingerprint(annonce_fiche_response.content)
+        if crawl_state.is_unchanged(url_annonce, content_hash):
+            return None, None
+    
+    return annonce_fiche_response, content_hash
+
+def complete_annonce(url_annonce, data_annonce, data_agence, full_agency_url, session, timeout=30,
+                     agency_cache=None, crawl_state=None, response=None, content_hash=None, metrics=None):
+    """
+    Complète une fiche annonce analysée : détails de l'agence (via le cache s'il
+    est fourni) et statut du crawl incrémental. La nouvelle version de l'annonce
+    n'est écrite dans crawl_state qu'à la sauvegarde de sa page (voir CrawlAccumulator).
+    Le téléchargement des pages agences est chronométré si metrics est fourni.
+    
+    Returns:
+        tuple: (AnnonceRecord, AgenceRecord)
+    """
+    # Requête vers la page de l'agence - Optionnelle, peut être désactivée si nécessaire
+    # (les agences à jour en base sont déjà dans le cache, voir fnaim_agency_freshness)
+    agency_details = True
+    if full_agency_url and agency_details:
+        def fetch_agency():
+            # Utilisation d'un timeout plus long pour les requêtes d'agence
+            with stage_timer(metrics, 'agency'):
+                return fetch_agency_details(full_agency_url, session, timeout * 1.5)
+        
+        try:
+            fetched_at = None
+            if agency_cache is not None:
+                key = agency_cache_key(data_agence['agency_id'], full_agency_url)
+                agency_data = agency_cache.get_or_fetch(key, fetch_agency)
+                fetched_at = agency_cache.fetched_at(key)
+            else:
+                agency_data = fetch_agency()
+            data_agence.update(agency_data)
+            # Date de la récupération des détails, et non du crawl (voir fnaim_agency_freshness)
+            data_agence['details_fetched_at'] = datetime.datetime.fromtimestamp(fetched_at or time.time())
+        
+        except Exception as e:
+            logger.warning(f"Erreur lors de la récupération des détails de l'agence {full_agency_url}: {e}")
+    
+    if crawl_state is not None:
+        data_annonce['statut_crawl'] = crawl_state.stage(
+            url_annonce,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            content_hash
+        )
+    
+    # Enregistrements légers : les DataFrames ne sont construits qu'à la sauvegarde
+    return AnnonceRecord(**data_annonce), AgenceRecord(**data_agence)
+
+def scrapping_annonce(url_annonce, session=None, timeout=30, agency_cache=None, crawl_state=None, metrics=None):
+    """
+    Scrape les détails d'une annonce immobilière et de l'agence associée à partir d'une URL.
+    Utilise lxml pour un parsing plus rapide.
+    Si agency_cache est fourni, la page de chaque agence n'est téléchargée qu'une fois.
+    Si crawl_state est fourni, la fiche est demandée de façon conditionnelle et
+    (None, None) est retourné lorsqu'elle n'a pas changé depuis le dernier passage.
+    Si metrics est fourni, le parsing et la page agence sont chronométrés (voir fnaim_metrics).
+    
+    Returns:
+        tuple: (AnnonceRecord, AgenceRecord)
+    """
+    if session is None:
+        session = create_session_with_retry()
+    
+    try:
+        annonce_fiche_response, content_hash = fetch_annonce_page(url_annonce, session, timeout, crawl_state)
+        if annonce_fiche_response is None:
+            return None, None
+        
+        with stage_timer(metrics, 'parse'):
+            data_annonce, data_agence, full_agency_url = parse_annonce_html(
+                annonce_fiche_response.content, url_annonce
+            )
+        
+        return complete_annonce(
+            url_annonce, data_annonce, data_agence, full_agency_url, session, timeout,
+            agency_cache, crawl_state, annonce_fiche_response, content_hash, metrics
+        )
+    
+    except Exception as e:
+        logger.error(f"Erreur dans scrapping_annonce pour {url_annonce}: {e}")
+        raise
+
+####
+#    EXTRACTION DES URLS DES ANNONCES    #
+####
+def extract_annonce_urls(content, fnaim_url="https://www.fnaim.fr"):
+    """
+    Extrait les URLs des annonces du HTML d'une page de résultats FNAIM.
+    Version robuste avec détection multi-méthodes.
+    """
+    urls = set()
+    
+    # Méthode 1: Sélecteur XPath original
+    tree = html.fromstring(content)
+    link_elements = tree.xpath('//a[@class="linkAnnonce"]/@href')
+    
+    # Méthode 2: BeautifulSoup pour plus de robustesse
+    if not link_elements:
+        soup = BeautifulSoup(content, "lxml")
+        links = soup.find_all('a', class_='linkAnnonce')
+        if links:
+            link_elements = [link['href'] for link in links if link.has_attr('href')]
+            
+    # Méthode 3: Sélecteurs alternatifs XPath
+    if not link_elements:
+        # Recherche des liens dans les blocs d'annonces
+        link_elements = tree.xpath('//div[contains(@class, "liste-biens")]//a[contains(@href, "/annonce-immobiliere/")]/@href')
+        
+        # Recherche plus large par attribut href
+        if not link_elements:
+            link_elements = tree.xpath('//a[contains(@href, "/annonce-immobiliere/")]/@href')
+            
+        # Essai avec CSS selecteurs via BeautifulSoup
+        if not link_elements:
+            soup = BeautifulSoup(content, "lxml") if not 'soup' in locals() else soup
+            all_links = soup.select('a[href*="/annonce-immobiliere/"]')
+            link_elements = [link.get('href') for link in all_links if link.get('href')]
+    
+    # Traitement des liens trouvés
+    for link in link_elements:
+        if "#AGE_CONTACT" not in link:
+            if link.startswith('/'):
+                urls.add(fnaim_url + link)
+            else:
+                urls.add(link)
+    
+    return list(urls)
+
+def scrapping_urls(url, session=None, timeout=20):
+    """
+    Extrait les URLs des annonces immobilières à partir d'une page de résultats FNAIM.
+    Version robuste avec détection multi-méthodes.
+    """
+    if session is None:
+        session = create_session_with_retry()
+    
+    try:
+        # Obtention de la page avec un User-Agent plus réaliste
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3',
+            'Referer': 'https://www.fnaim.fr/',
+            'Connection': 'keep-alive',
+        }
+        session.headers.update(headers)
+        
+        response = session.get(url, timeout=timeout)
+        status_code = response.status_code
+        
+        if status_code != 200:
+            logger.warning(f"Status code non-200 reçu: {status_code}")
+            return [], status_code
+        
+        # Sauvegarde du HTML pour analyse
+        with open("debug_fnaim.html", "w", encoding="utf-8") as f:
+            f.write(response.text)
+        logger.info(f"HTML de la page sauvegardé pour analyse")
+        
+        filtered_urls = extract_annonce_urls(response.content)
+        logger.info(f"Status code: {status_code}, Nombre d'annonces trouvées: {len(filtered_urls)}")
+        
+        # Log d'un échantillon des URLs trouvées
+        if filtered_urls and len(filtered_urls) > 0:
+            sample = filtered_urls[:min(2, len(filtered_urls))]
+            logger.info(f"Exemples d'URLs: {sample}")
+            
+        return filtered_urls, status_code
+    
+    except Exception as e:
+        logger.error(f"Erreur dans scrapping_urls pour {url}: {e}")
+        return [], 0
+
+####
+#    FONCTION DE RETRY POUR UN SCRAPING D'ANNONCE    #
+####
+def retry_with_backoff(url_annonce, call, max_retries=3, base_timeout=30, default=None):
+    """
+    Appelle call(timeout) jusqu'à max_retries fois, en augmentant le timeout à chaque
+    tentative et avec une attente exponentielle entre deux tentatives.
+    Retourne `default` après max_retries échecs.
+    """
+    for attempt in range(max_retries):
+        try:
+            # Augmenter le timeout à chaque tentative
+            current_timeout = base_timeout * (attempt + 1)
+            return call(current_timeout)
+        except Exception as e:
+            logger.warning(f"Erreur lors du scraping de {url_annonce} - tentative {attempt+1}/{max_retries}: {e}")
+            if attempt < max_retries - 1:
+                # Attente exponentielle avec élément aléatoire
+                sleep_time = (2 ** attempt) + random.uniform(1, 3)
+                logger.info(f"Attente de {sleep_time:.2f} secondes avant la nouvelle tentative")
+                time.sleep(sleep_time)
+    
+    logger.error(f"Abandon de {url_annonce} après {max_retries} tentatives.")
+    return default
+
+def fetch_announcement(url_annonce, session, max_retries=3, base_timeout=30, agency_cache=None, crawl_state=None,
+                       metrics=None):
+    """
+    Tente de scraper une annonce avec plusieurs tentatives en cas d'erreur.
+    Utilise urllib3 via la session pour gérer les retries.
+    """
+    return retry_with_backoff(
+        url_annonce,
+        lambda timeout: scrapping_annonce(
+            url_annonce, session, timeout=timeout,
+            agency_cache=agency_cache, crawl_state=crawl_state, metrics=metrics
+        ),
+        max_retries, base_timeout, default=(None, None)
+    )
+
+####
+#    GESTION DES TÂCHES PARALLÈLES    #
+####
+def process_page_urls(urls_annonces, session, max_workers=5, max_retries=3, agency_cache=None, crawl_state=None,
+                      metrics=None):
+    """
+    Traite une liste d'URLs d'annonces en parallèle avec urllib3 et lxml.
+    Le cache d'agences partagé évite de télécharger plusieurs fois la page d'une même agence.
+    
+    Returns:
+        tuple: (liste des AnnonceRecord, liste des AgenceRecord dédupliquées)
+    """
+    if agency_cache is None:
+        agency_cache = AgencyCache()
+    
+    results = []
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Créer un dict de futures pour traiter les annonces en parallèle
+        future_to_url = {
+            executor.submit(
+                fetch_announcement, url, session, max_retries,
+                agency_cache=agency_cache, crawl_state=crawl_state, metrics=metrics
+            ): url
+            for url in urls_annonces
+        }
+        
+        # Traiter les résultats au fur et à mesure qu'ils arrivent
+        for future in tqdm(concurrent.futures.as_completed(future_to_url), 
+                          total=len(future_to_url), 
+                          desc="Traitement des annonces"):
+            url = future_to_url[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"Erreur non gérée pour {url}: {e}")
+    
+    # Combiner les résultats et dédupliquer les agences
+    return collect_results(results)
+
+####
+#    ACCUMULATION DES RÉSULTATS PAGE PAR PAGE    #
+####
+def create_checkpoint(base_url):
+    """Journal de reprise par défaut d'une URL de recherche, dans BACKUP_DIR."""
+    return CheckpointJournal(os.path.join(BACKUP_DIR, "checkpoints"), base_url)
+
+class CrawlAccumulator:
+    """
+    Accumule les résultats du scraping page par page : fusion des annonces,
+    déduplication des agences et sauvegardes périodiques.
+    Partagé par les différents moteurs (threads, asyncio) de scrapping_fnaim.
+    
+    Avec un journal de reprise (fnaim_checkpoint), chaque sauvegarde n'écrit que
+    les pages terminées depuis la précédente, et un crawl interrompu peut être
+    repris (voir start). Sans journal, l'état complet est sauvegardé en CSV.
+    
+    Les résultats sont conservés sous forme d'enregistrements (fnaim_records) ;
+    annonces_df et agences_df ne construisent les DataFrames qu'à la demande.
+    Avec une sortie typée (fnaim_output.ScrapeOutput), chaque page terminée y est
+    aussi écrite au fil du crawl.
+    
+    Avec l'état du crawl incrémental (fnaim_crawl_state), les nouvelles versions des
+    annonces ne sont écrites dans crawl_state qu'une fois leur page sauvegardée : une
+    annonce perdue dans un arrêt entre deux sauvegardes est re-téléchargée à la reprise.
+    """
+    def __init__(self, save_interval=5, journal=None, output=None, crawl_state=None):
+        self.save_interval = save_interval
+        self.journal = journal
+        self.output = output
+        self.crawl_state = crawl_state
+        self._unsaved_urls = []
+        self.annonces = []
+        self.agences = []
+        self._agency_ids = set()
+        self._frames = {}
+    
+    def _frame(self, name, records, record_type):
+        """DataFrame des enregistrements, reconstruit seulement si de nouveaux ont été ajoutés."""
+        cached = self._frames.get(name)
+        if cached is None or cached[0] != len(records):
+            cached = (len(records), records_to_dataframe(records, record_type))
+            self._frames[name] = cached
+        return cached[1]
+    
+    @property
+    def annonces_df(self):
+        return self._frame('annonces', self.annonces, AnnonceRecord)
+    
+    @property
+    def agences_df(self):
+        return self._frame('agences', self.agences, AgenceRecord)
+    
+    def _add_agences(self, agences):
+        """Ajoute uniquement les nouvelles agences ; retourne la liste des agences ajoutées."""
+        added = []
+        for agence in agences:
+            if agence.agency_id not in self._agency_ids:
+                self._agency_ids.add(agence.agency_id)
+                added.append(agence)
+        self.agences.extend(added)
+        return added
+    
+    def start(self, resume=True):
+        """
+        Prépare le journal de reprise. Si un crawl interrompu peut être repris,
+        recharge ses résultats.
+        
+        Returns:
+            tuple: (numéro de la première page à scraper, set des URLs déjà traitées)
+        """
+        if self.output is not None:
+            self.output.open()
+        if self.journal is None:
+            return 1, set()
+        
+        if resume and self.journal.resumable():
+            last_page, processed_urls, annonces, agences = self.journal.load()
+            self.annonces.extend(record_from_dict(AnnonceRecord, data) for data in annonces)
+            self._add_agences(record_from_dict(AgenceRecord, data) for data in agences)
+            # La sortie typée est réécrite : elle reprend d'abord les pages déjà traitées
+            if self.output is not None:
+                self.output.write_page(self.annonces, self.agences)
+            return last_page + 1, processed_urls
+        
+        self.journal.reset()
+        return 1, set()
+    
+    def add_page(self, page_number, annonces_page, agences_page, urls=()):
+        """
+        Ajoute les enregistrements d'une page et sauvegarde tous les save_interval pages.
+        `urls` sont les URLs d'annonces de la page, enregistrées dans le journal de reprise.
+        """
+        if self.journal is not None:
+            self.journal.add_page(
+                page_number, urls,
+                [record_to_dict(annonce) for annonce in annonces_page],
+                [record_to_dict(agence) for agence in agences_page]
+            )
+        
+        self._unsaved_urls.extend(urls)
+        self.annonces.extend(annonces_page)
+        new_agences = self._add_agences(agences_page)
+        if self.output is not None:
+            self.output.write_page(annonces_page, new_agences)
+        
+        # Sauvegarder périodiquement
+        if page_number % self.save_interval == 0:
+            self.save(f"page_{page_number}")
+    
+    def save(self, prefix):
+        """
+        Sauvegarde l'état courant : nouvelles pages dans le journal de reprise,
+        ou état complet via save_progress en l'absence de journal.
+        """
+        if self.journal is None:
+            save_progress(self.annonces_df, self.agences_df, prefix)
+        else:
+            self.journal.flush()
+        self._commit_crawl_state()
+    
+    def _commit_crawl_state(self):
+        """Écrit dans crawl_state les versions des annonces des pages sauvegardées."""
+        if self.crawl_state is not None:
+            self.crawl_state.commit(self._unsaved_urls)
+        self._unsaved_urls = []
+    
+    def finish(self, finished):
+        """
+        Sauvegarde finale. Si le crawl est allé à son terme (`finished`), le journal
+        est clos et l'état complet est écrit une seule fois en CSV ; sinon le crawl
+        pourra être repris. La sortie typée est finalisée dans tous les cas.
+        """
+        if self.output is not None:
+            nb_annonces, nb_agences = self.output.close()
+            logger.info(f"Sortie typée: {nb_annonces} annonces dans {self.output.annonces_path}, "
+                        f"{nb_agences} agences dans {self.output.agences_path}")
+        if self.journal is None:
+            save_progress(self.annonces_df, self.agences_df, "final")
+        elif finished:
+            self.journal.finish()
+            save_progress(self.annonces_df, self.agences_df, "final")
+        else:
+            self.journal.flush()
+        self._commit_crawl_state()
+
+def finish_crawl_state(crawl_state, crawl_complete):
+    """Clôture le passage incrémental et journalise les annonces inchangées et supprimées."""
+    removed = crawl_state.finish_run(crawl_complete)
+    logger.info(f"Crawl incrémental: {crawl_state.unchanged} annonces inchangées, {len(removed)} supprimées")
+
+####
+#    SCRAPING PRINCIPAL MULTI-PAGES AVEC EXÉCUTION PARALLÈLE    #
+####
+def scrapping_fnaim(base_url, max_workers=5, max_retries=3, max_pages=None, save_interval=5,
+                    engine="threads", engine_options=None, agency_cache=None, crawl_state=None,
+                    checkpoint=None, resume=True, rate_limiter=None, seen_urls=None, response_hooks=None,
+                    concurrency=None, metrics=None, output=None):
+    """
+    Scrappe toutes les annonces immobilières de la FNAIM de manière optimisée avec lxml et urllib3.
+    
+    Args:
+        base_url (str): URL de base pour la recherche
+        max_workers (int): Nombre maximum de workers pour le traitement parallèle
+        max_retries (int): Nombre maximum de tentatives par URL
+        max_pages (int): Nombre maximum de pages à scraper (None = illimité)
+        save_interval (int): Intervalle de sauvegarde (point de reprise) en nombre de pages
+        engine (str): Moteur de scraping : "threads" (ThreadPoolExecutor page par page),
+            "processes" (threads d'I/O et parsing dans un pool de processus),
+            "pipeline" (pagination et fiches en parallèle) ou "async" (asyncio/aiohttp)
+        engine_options (dict): Options propres au moteur (voir fnaim_parse_pool.ParsePool,
+            fnaim_pipeline.scrapping_fnaim_pipeline et fnaim_async.scrapping_fnaim_async)
+        agency_cache (AgencyCache): Cache des pages agences, éventuellement persisté
+            (défaut: cache en mémoire pour la durée de l'exécution)
+        crawl_state (CrawlState): État du crawl précédent ; seules les annonces nouvelles
+            ou modifiées sont alors retournées (voir fnaim_crawl_state)
+        checkpoint (CheckpointJournal): Journal de reprise (défaut: create_checkpoint(base_url))
+        resume (bool): Reprendre un crawl interrompu depuis sa dernière page sauvegardée
+        rate_limiter (RateLimiter): Rate limit partagé par toutes les requêtes (moteurs
+            "threads" et "pipeline", voir fnaim_rate_limit)
+        seen_urls (SharedUrlSet): Ensemble d'URLs partagé entre plusieurs crawls simultanés ;
+            une annonce déjà prise en charge par un autre crawl est ignorée (voir fnaim_scheduler)
+        response_hooks (list): Hooks appelés sur chaque réponse HTTP, ex: enregistrement des
+            pages dans un corpus local (voir fnaim_corpus) ; moteurs "threads", "processes" et "pipeline"
+        concurrency (AdaptiveConcurrency): Contrôleur AIMD du nombre de requêtes en vol ; max_workers
+            est alors porté à sa limite maximale (voir fnaim_concurrency) ; mêmes moteurs
+        metrics (CrawlMetrics): Mesures par étape (connexion, TTFB, téléchargement, parsing,
+            agences), par page et pour le crawl (voir fnaim_metrics) ; mêmes moteurs
+        output (ScrapeOutput): Sortie typée Parquet/Arrow écrite au fil des pages (voir fnaim_output)
+    
+    Returns:
+        tuple: (DataFrame des annonces, DataFrame des agences)
+    """
+    if agency_cache is None:
+        agency_cache = AgencyCache()
+    if checkpoint is None:
+        checkpoint = create_checkpoint(base_url)
+    if engine == "async":
+        if (rate_limiter is not None or seen_urls is not None or response_hooks or concurrency is not None
+                or metrics is not None):
+            raise ValueError("rate_limiter, seen_urls, response_hooks, concurrency et metrics ne sont pas disponibles "
+                             "avec le moteur async")
+        from fnaim_async import run_scrapping_fnaim_async
+        return run_scrapping_fnaim_async(
+            base_url, max_retries=max_retries, max_pages=max_pages,
+            save_interval=save_interval, agency_cache=agency_cache, crawl_state=crawl_state,
+            checkpoint=checkpoint, resume=resume, output=output, **(engine_options or {})
+        )
+    
+    if concurrency is not None:
+        # Le contrôleur décide du nombre de requêtes en vol, dans la limite des threads disponibles
+        max_workers = max(max_workers, concurrency.max_limit)
+    
+    if engine == "pipeline":
+        from fnaim_pipeline import scrapping_fnaim_pipeline
+        return scrapping_fnaim_pipeline(
+            base_url, max_workers=max_workers, max_retries=max_retries, max_pages=max_pages,
+            save_interval=save_interval, agency_cache=agency_cache, crawl_state=crawl_state,
+            checkpoint=checkpoint, resume=resume, rate_limiter=rate_limiter, seen_urls=seen_urls,
+            response_hooks=response_hooks, concurrency=concurrency, metrics=metrics, output=output,
+            **(engine_options or {})
+        )
+    elif engine not in ("threads", "processes"):
+        raise ValueError(f"Moteur de scraping inconnu: {engine}")
+    
+    # Traitement des annonces d'une page : dans les threads, ou parsing déporté dans des processus
+    parse_pool = None
+    page_processor = process_page_urls
+    if engine == "processes":
+        from fnaim_parse_pool import ParsePool
+        parse_pool = ParsePool(**(engine_options or {}))
+        page_processor = parse_pool.process_page_urls
+    
+    accumulator = CrawlAccumulator(save_interval, journal=checkpoint, output=output, crawl_state=crawl_state)
+    page_number, all_urls_processed = accumulator.start(resume)
+    crawl_complete = False
+    finished = False
+    if crawl_state is not None:
+        crawl_state.start_run()
+        crawl_state.mark_seen(all_urls_processed)
+    
+    # Création d'une session partagée avec retry optimisée
+    session = create_session_with_retry(
+        retries=max_retries, rate_limiter=rate_limiter, response_hooks=response_hooks, concurrency=concurrency,
+        metrics=metrics
+    )
+    
+    try:
+        while max_pages is None or page_number <= max_pages:
+            url_page = f"{base_url}&ip={page_number}"
+            
+            # 1. Extraire les URLs des annonces de la page courante
+            urls_annonces, status_code = scrapping_urls(url_page, session)
+            
+            # Vérifier si la page contient des annonces
+            if not urls_annonces or status_code != 200:
+                logger.info(f"Aucune annonce trouvée ou erreur à la page {page_number} (status: {status_code}). Fin du scraping.")
+                crawl_complete = status_code == 200
+                finished = crawl_complete
+                break
+            
+            if crawl_state is not None:
+                crawl_state.mark_seen(urls_annonces)
+            
+            # Filtrer les URLs déjà traitées
+            urls_to_process = [url for url in urls_annonces if url not in all_urls_processed]
+            if seen_urls is not None:
+                urls_to_process = seen_urls.claim(urls_to_process)
+            
+            if not urls_to_process:
+                logger.info(f"Toutes les annonces de la page {page_number} ont déjà été traitées.")
+                accumulator.add_page(page_number, [], [])
+                if metrics is not None:
+                    metrics.end_page(page_number)
+                page_number += 1
+                continue
+            
+            logger.info(f"Page {page_number}: {len(urls_to_process)}/{len(urls_annonces)} nouvelles annonces à traiter")
+            
+            # 2. Traiter les annonces en parallèle
+            annonces_page, agences_page = page_processor(
+                urls_to_process, session, max_workers, max_retries, agency_cache, crawl_state, metrics=metrics
+            )
+            
+            # 3. Mettre à jour les URLs traitées
+            all_urls_processed.update(urls_to_process)
+            
+            # 4. Combiner les résultats et sauvegarder périodiquement
+            accumulator.add_page(page_number, annonces_page, agences_page, urls_to_process)
+            if metrics is not None:
+                metrics.end_page(page_number)
+            
+            # 5. Passer à la page suivante
+            page_number += 1
+            
+            # 6. Pause aléatoire entre les pages pour éviter d'être détecté
+            sleep_time = random.uniform(1.5, 3.0)
+            logger.info(f"Attente de {sleep_time:.2f} secondes avant la page suivante")
+            time.sleep(sleep_time)
+        else:
+            # Nombre maximum de pages atteint
+            finished = True
+    
+    except KeyboardInterrupt:
+        logger.warning("Interruption utilisateur. Sauvegarde des données collectées...")
+        accumulator.save("interrupt")
+    
+    except Exception as e:
+        logger.error(f"Erreur lors du scraping: {e}")
+        accumulator.save("error")
+    
+    finally:
+        # Toujours sauvegarder à la fin
+        accumulator.finish(finished)
+        agency_cache.save()
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        if concurrency is not None:
+            logger.info(f"Concurrence adaptative: {concurrency.metrics()}")
+        if metrics is not None:
+            logger.info(f"Temps cumulé par étape: {metrics.report()}")
+        
+        logger.info(f"Cache agences: {agency_cache.stats()}")
+        if crawl_state is not None:
+            finish_crawl_state(crawl_state, crawl_complete)
+        logger.info(f"Scraping terminé. {len(accumulator.annonces)} annonces et {len(accumulator.agences)} agences récupérées.")
+        return accumulator.annonces_df, accumulator.agences_df